@@ -10,6 +10,8 @@ from django.dispatch import receiver
 from django_registration.signals import user_activated
 
 from accounts.models import UserProfile
+from visualizer import homepage
+from visualizer.models import JsonConfig
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -28,6 +30,18 @@ def create_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
+@receiver(post_save, sender=UserProfile)
+def update_public_visualizations(sender, instance, **kwargs):
+    """
+    Keeps JsonConfig.isPublic in sync with isPrivate: when a user becomes private,
+    their uploads are no longer listed on the homepage or in the sitemap, and vice versa.
+    """
+    numChanged = JsonConfig.objects.filter(owner=instance.user, isPublic=instance.isPrivate) \
+                                   .update(isPublic=not instance.isPrivate)
+    if numChanged:
+        homepage.invalidate_most_recent()
+
+
 @receiver(user_activated)
 def user_activated_slot(sender, user, request, **kwargs):
     """
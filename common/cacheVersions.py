@@ -0,0 +1,104 @@
+"""
+Per-path versions for the local cache, so a save only invalidates the pages it affects
+instead of clearing the whole cache.
+
+Each path has a version, stored in the cache itself. The cache middleware below includes
+the version of the requested path in its cache keys, so invalidating a path (giving it a
+new version) orphans every cached response for it: they are never read again, and expire
+on their own. Any other cache of a page's content should include the version too.
+
+Versions are random rather than counters: if a version is ever evicted from the cache,
+the path gets a new random version, and can't go back to serving an old response.
+
+With a TieredCache, versions are read from its shared tier on every request, never from the
+in-process tier: otherwise a process would keep serving the pages another process has just
+invalidated, until its copy of the version timed out.
+"""
+
+import contextvars
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.middleware.cache import FetchFromCacheMiddleware, UpdateCacheMiddleware
+
+from common.tieredCache import TieredCache
+
+# The cache key prefix of the request being handled, including its path's version
+_currentKeyPrefix = contextvars.ContextVar('currentKeyPrefix', default=None)
+
+
+def _get_version_key(path):
+    """ The cache key which stores the version of the path """
+    return 'path_version.' + hashlib.md5(path.encode('utf-8')).hexdigest()
+
+
+def _get_versions_cache():
+    """ The cache which stores the versions: see the module docstring """
+    cache = caches['default']
+    if isinstance(cache, TieredCache):
+        return cache.shared
+    return cache
+
+
+def get_path_version(path):
+    """ The current version of the path, e.g. /v/slug (without the query string) """
+    cache = _get_versions_cache()
+    key = _get_version_key(path)
+    version = cache.get(key)
+    if version is None:
+        # Never set or evicted: start a new version. add() so concurrent requests agree.
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_paths(paths):
+    """ Invalidates every cached response for each path, whatever its query string """
+    if not paths:
+        return
+    _get_versions_cache().set_many(
+        {_get_version_key(path): uuid.uuid4().hex for path in paths}, None)
+
+
+# pylint: disable=too-few-public-methods,invalid-name
+class _VersionedKeyPrefixMixin:
+    """ Uses the current request's versioned key prefix instead of the fixed one.
+        (key_prefix is the attribute django's cache middleware reads.) """
+
+    @property
+    def key_prefix(self):
+        """ The key prefix for the current request """
+        keyPrefix = _currentKeyPrefix.get()
+        if keyPrefix is None:
+            return self.baseKeyPrefix
+        return keyPrefix
+
+    @key_prefix.setter
+    def key_prefix(self, value):
+        self.baseKeyPrefix = value  # pylint: disable=attribute-defined-outside-init
+
+
+class VersionedUpdateCacheMiddleware(_VersionedKeyPrefixMixin, UpdateCacheMiddleware):
+    """
+    UpdateCacheMiddleware, with the version of the requested path in the cache key.
+    Replaces UpdateCacheMiddleware in settings, alongside VersionedFetchFromCacheMiddleware.
+    The version is read once when the request starts, so a page which is invalidated
+    while it is being generated is not cached under the new version.
+    """
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return super().__call__(request)
+
+        keyPrefix = f"{settings.CACHE_MIDDLEWARE_KEY_PREFIX}.{get_path_version(request.path)}"
+        token = _currentKeyPrefix.set(keyPrefix)
+        try:
+            return super().__call__(request)
+        finally:
+            _currentKeyPrefix.reset(token)
+
+
+class VersionedFetchFromCacheMiddleware(_VersionedKeyPrefixMixin, FetchFromCacheMiddleware):
+    """ FetchFromCacheMiddleware, with the version of the requested path in the cache key """
@@ -1,16 +1,26 @@
 """ Cloudflare API connection, used to clear cloudflare cache when a model updates """
 
+import contextlib
+import contextvars
 import logging
 import json
 import requests
 
 from django.conf import settings
-from django.core.cache import cache
 from django.contrib.sites.models import Site
 from django.urls import reverse
 
+from common.cacheVersions import invalidate_paths
+from visualizer.common import EMBED_VISTYPES
+
 logger = logging.getLogger(__name__)
 
+# Cloudflare purges at most this many URLs per request
+MAX_URLS_PER_PURGE = 30
+
+# Within CloudflareAPI.coalesce_purges: the (paths, callbacks) waiting for the purge
+_pendingPurge = contextvars.ContextVar('pendingPurge', default=None)
+
 
 # pylint: disable=too-few-public-methods
 class CloudflareAPI():
@@ -30,8 +40,8 @@ class CloudflareAPI():
         }
 
     @classmethod
-    def purge_vis_cache(cls, slug):
-        """ Purges most canonical URLs for the visualization with the given slug. """
+    def get_vis_paths(cls, slug):
+        """ Most canonical paths of the visualization with the given slug """
         paths = [
             reverse('visualize', args=(slug,)),
             reverse('visualizeEmbedded', args=(slug,)),
@@ -40,17 +50,57 @@ class CloudflareAPI():
             reverse('visualizeEmbedly', args=(slug, 'barchart-interactive')),
             reverse('visualizeEmbedly', args=(slug, 'sankey')),
             reverse('visualizeEmbedly', args=(slug, 'table')),
-            reverse('visualizeBallotpedia', args=(slug,))
+            reverse('visualizeBallotpedia', args=(slug,)),
+            reverse('visualizationData', args=(slug,))
         ]
-        cls.purge_paths_cache(paths)
+        paths += [reverse('visualizeEmbeddedVistype', args=(slug, vistype))
+                  for vistype in EMBED_VISTYPES]
+        return paths
+
+    @classmethod
+    def purge_vis_cache(cls, slug):
+        """ Purges most canonical URLs for the visualization with the given slug. """
+        cls.purge_paths_cache(cls.get_vis_paths(slug))
+
+    @classmethod
+    @contextlib.contextmanager
+    def coalesce_purges(cls):
+        """
+        Collects every purge made within this context, and purges them all at once when
+        it exits (even if with an exception), e.g. so a scrape of many elections makes
+        one purge rather than one per election
+        """
+        paths = []
+        callbacks = []
+        token = _pendingPurge.set((paths, callbacks))
+        try:
+            yield
+        finally:
+            _pendingPurge.reset(token)
+            if paths:
+                cls.purge_paths_cache(list(dict.fromkeys(paths)))
+            for callback in callbacks:
+                callback()
+
+    @classmethod
+    def after_purge(cls, callback):
+        """ Calls callback now or, within coalesce_purges, once the purge has been made """
+        pending = _pendingPurge.get()
+        if pending is None:
+            callback()
+        else:
+            pending[1].append(callback)
 
     @classmethod
     def purge_paths_cache(cls, paths):
         """ Purges the URLs (paths, not URLs) """
-        # We also want to purge the file-based cache, but unfortunately
-        # we don't have a way of doing this per-URL.
-        # It's overkill, but here we purge everything.
-        cache.clear()
+        pending = _pendingPurge.get()
+        if pending is not None:
+            pending[0].extend(paths)
+            return
+
+        # Also purge the local cache of just these paths
+        invalidate_paths(paths)
 
         # If we're on local/dev/staging/etc, we're done.
         if not cls._is_api_enabled():
@@ -61,18 +111,20 @@ class CloudflareAPI():
 
         # Absolute URLs
         domain = Site.objects.get_current().domain
-        rcvisUrls = [f'https://{domain}{path}' for path in paths]
-        data = {'files': rcvisUrls}
-
-        # Send it off
-        response = requests.post(
-            apiUrl,
-            headers=cls._get_auth_headers(),
-            data=json.dumps(data),
-            timeout=3)
-
-        info = f"{len(paths)} starting with {paths[0]}"
-        if response.status_code == 200:
-            logger.info("Cleared cloudflare cache for %s: %s", info, response.json())
-        else:
-            logger.error("Received bad response from cloudflare for %s: %s", info, response.json())
+
+        # Send it off, as many URLs at a time as cloudflare accepts
+        for i in range(0, len(paths), MAX_URLS_PER_PURGE):
+            batch = paths[i:i + MAX_URLS_PER_PURGE]
+            rcvisUrls = [f'https://{domain}{path}' for path in batch]
+            response = requests.post(
+                apiUrl,
+                headers=cls._get_auth_headers(),
+                data=json.dumps({'files': rcvisUrls}),
+                timeout=3)
+
+            info = f"{len(batch)} starting with {batch[0]}"
+            if response.status_code == 200:
+                logger.info("Cleared cloudflare cache for %s: %s", info, response.json())
+            else:
+                logger.error("Received bad response from cloudflare for %s: %s",
+                             info, response.json())
@@ -0,0 +1,144 @@
+"""
+Pre-renders elections, so the first visitor after a deploy or an update doesn't pay for
+the render: compiles each election if its compiled data is outdated, then handles a request
+for each of its pages with Django's own request handler and the middleware in settings,
+which store them in the cache exactly as an anonymous visitor's request would.
+
+Run by the prerender management command, or by a celery worker after a save
+(see visualizer.tasks): never in the web process.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import functools
+import logging
+
+from django.contrib.sites.models import Site
+from django.core.handlers.base import BaseHandler
+from django.db import connections
+from django.test.client import RequestFactory
+from django.urls import reverse
+
+from electionpage.models import ElectionPage, ScrapableElectionPage, SingleSourceElectionPage
+from visualizer.graph.compiledElection import is_compiled_election_current
+from visualizer.models import HomepageFeaturedElection, JsonConfig
+
+logger = logging.getLogger(__name__)
+
+# The pages rendered for each election
+ELECTION_URL_NAMES = ('visualize', 'visualizeEmbedded', 'visualizationData')
+
+
+def get_recent_slugs(num):
+    """ The slugs of the most recent uploads """
+    return list(JsonConfig.objects.order_by('-uploadedAt')
+                                  .values_list('slug', flat=True)[:num])
+
+
+def get_featured_slugs():
+    """ The slugs of the elections featured on the homepage """
+    return list(HomepageFeaturedElection.objects.values_list('jsonConfig__slug', flat=True)
+                                                .distinct())
+
+
+def get_election_page_targets(pageSlugs=None):
+    """
+    The paths of the election pages with the given slugs (or of every election page
+    if None), and the slugs of every election they list
+    """
+    pageTypes = (
+        (ElectionPage, 'electionPage', 'listOfElections__slug'),
+        (ScrapableElectionPage, 'electionPageScrapable', 'listOfScrapers__jsonConfig__slug'),
+        (SingleSourceElectionPage, 'electionPageSingleSource', 'scraper__listOfElections__slug'),
+    )
+
+    paths = []
+    slugs = []
+    for model, urlName, electionSlugField in pageTypes:
+        pages = model.objects.all()
+        if pageSlugs is not None:
+            pages = pages.filter(slug__in=pageSlugs)
+        for pageSlug, electionSlug in pages.values_list('slug', electionSlugField):
+            path = reverse(urlName, args=(pageSlug,))
+            if path not in paths:
+                paths.append(path)
+            if electionSlug is not None and electionSlug not in slugs:
+                slugs.append(electionSlug)
+    return paths, slugs
+
+
+def _compile_if_outdated(slug):
+    """ Compiles the election if its compiled data is missing or outdated """
+    jsonConfig = JsonConfig.objects.get(slug=slug)
+    if is_compiled_election_current(jsonConfig.compiledElection):
+        return
+    jsonConfig.compile()
+    if jsonConfig.compiledElection is not None:
+        # Don't trigger a cache purge
+        jsonConfig.save_compiled_election()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_handler():
+    """ A request handler with the middleware in settings, like the WSGI server's """
+    handler = BaseHandler()
+    handler.load_middleware()
+    return handler
+
+
+def _render(host, path):
+    """ Handles an anonymous request for the path, caching it. Returns the path if it failed. """
+    request = RequestFactory(HTTP_HOST=host).get(path, secure=True)
+    # Exceptions are turned into error responses, and logged, as for any request
+    response = _get_handler().get_response(request)
+    if response.status_code >= 400:
+        logger.warning("Could not pre-render %s: status %d", path, response.status_code)
+        return path
+    return None
+
+
+def _prerender_target(host, target, closeConnections):
+    """ Pre-renders an election (by slug) or a path. Returns the paths which failed. """
+    try:
+        if target.startswith('/'):
+            paths = [target]
+        else:
+            _compile_if_outdated(target)
+            paths = [reverse(urlName, args=(target,)) for urlName in ELECTION_URL_NAMES]
+        return [path for path in paths if _render(host, path) is not None]
+    except Exception:  # pylint: disable=broad-except
+        logger.warning("Could not pre-render %s", target, exc_info=True)
+        return [target]
+    finally:
+        if closeConnections:
+            # This is a worker thread: close its own database connection
+            connections.close_all()
+
+
+def prerender(slugs, paths=(), numWorkers=4, host=None, onProgress=None):
+    """
+    Pre-renders each election (by slug) and each other path (e.g. an election page),
+    with up to numWorkers at a time. Calls onProgress(numDone, numTotal, target, failures)
+    after each one. Returns the list of paths which failed.
+    """
+    if host is None:
+        host = Site.objects.get_current().domain
+    targets = list(slugs) + list(paths)
+
+    failures = []
+
+    def on_done(numDone, target, targetFailures):
+        failures.extend(targetFailures)
+        if onProgress:
+            onProgress(numDone, len(targets), target, targetFailures)
+
+    if numWorkers <= 1:
+        for i, target in enumerate(targets):
+            on_done(i + 1, target, _prerender_target(host, target, False))
+        return failures
+
+    with ThreadPoolExecutor(max_workers=numWorkers) as executor:
+        futures = {executor.submit(_prerender_target, host, target, True): target
+                   for target in targets}
+        for i, future in enumerate(as_completed(futures)):
+            on_done(i + 1, futures[future], future.result())
+    return failures
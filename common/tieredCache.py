@@ -0,0 +1,221 @@
+"""
+A two-tier django cache backend: a bounded in-process LRU in front of a shared cache.
+
+Reads check the in-process tier first, then the shared tier (another cache in
+settings.CACHES, e.g. redis or the file-based cache), copying shared hits into the
+in-process tier. Writes go to both. Entries are pickled and, above a threshold, compressed
+once, and both tiers store those bytes: the in-process tier is bounded by their size.
+
+Other processes don't invalidate this process's tier, so entries only stay in it for
+LOCAL_TIMEOUT seconds: that's how stale a value written by another dyno can be. Values which
+mustn't be stale at all, like the path versions of common.cacheVersions, use the shared tier.
+
+Configure it in settings.CACHES:
+
+    'default': {
+        'BACKEND': 'common.tieredCache.TieredCache',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',     # The alias of the shared cache
+            'MAX_LOCAL_BYTES': 32 << 20,  # The size of the in-process tier
+            'LOCAL_TIMEOUT': 10,          # The longest an entry stays in the in-process tier
+            'COMPRESS_MIN_BYTES': 1024,   # Compress entries at least this big
+        }
+    }
+"""
+
+from collections import OrderedDict
+import pickle
+import threading
+import time
+import zlib
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+# The first byte of each stored entry
+_RAW = b'r'
+_COMPRESSED = b'z'
+
+
+class TieredCacheError(Exception):
+    """ The tiered cache is misconfigured """
+
+
+class LocalLRU:
+    """
+    A thread-safe LRU of key to (expiry, bytes), bounded by the total size of the bytes.
+    Expired entries are dropped when they are read, or evicted like any other.
+    """
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.numBytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.numEvictions = 0
+
+    def get(self, key):
+        """ Returns the bytes for the key, or None if missing or expired """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expiry, blob = entry
+            if expiry is not None and expiry <= time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return blob
+
+    def set(self, key, blob, expiry):
+        """ Stores the bytes until the expiry time (or forever if None), evicting as needed """
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if len(blob) > self.maxBytes:
+                return
+            self.entries[key] = (expiry, blob)
+            self.numBytes += len(blob)
+            while self.numBytes > self.maxBytes:
+                oldestKey = next(iter(self.entries))
+                self._remove(oldestKey)
+                self.numEvictions += 1
+
+    def delete(self, key):
+        """ Removes the key, if present """
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def clear(self):
+        """ Removes everything """
+        with self.lock:
+            self.entries.clear()
+            self.numBytes = 0
+
+    def _remove(self, key):
+        """ Removes the key. The lock must be held. """
+        _, blob = self.entries.pop(key)
+        self.numBytes -= len(blob)
+
+
+class TieredCache(BaseCache):
+    """ The cache backend. See the module docstring for its options. """
+
+    def __init__(self, location, params):  # pylint: disable=unused-argument
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        if 'SHARED_CACHE' not in options:
+            raise TieredCacheError("TieredCache needs the SHARED_CACHE option")
+        self.sharedAlias = options['SHARED_CACHE']
+        self.localTimeout = options.get('LOCAL_TIMEOUT', 10)
+        self.compressMinBytes = options.get('COMPRESS_MIN_BYTES', 1024)
+        self.local = LocalLRU(options.get('MAX_LOCAL_BYTES', 32 << 20))
+
+        self.statsLock = threading.Lock()
+        self.stats = {}
+        self._reset_counters()
+
+    @property
+    def shared(self):
+        """ The shared tier """
+        return caches[self.sharedAlias]
+
+    def _count(self, name):
+        with self.statsLock:
+            self.stats[name] += 1
+
+    def _reset_counters(self):
+        with self.statsLock:
+            self.stats = {'localHits': 0, 'sharedHits': 0, 'misses': 0, 'sets': 0}
+        self.local.numEvictions = 0
+
+    def get_stats(self):
+        """ The hit, miss, set and eviction counters, and the size of the in-process tier """
+        with self.statsLock:
+            stats = dict(self.stats)
+        stats['localEvictions'] = self.local.numEvictions
+        stats['localBytes'] = self.local.numBytes
+        stats['localEntries'] = len(self.local.entries)
+        return stats
+
+    def reset_stats(self):
+        """ Resets the counters to zero """
+        self._reset_counters()
+
+    def _encode(self, value):
+        """ Pickles and maybe compresses the value """
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) >= self.compressMinBytes:
+            return _COMPRESSED + zlib.compress(pickled, 1)
+        return _RAW + pickled
+
+    @classmethod
+    def _decode(cls, blob):
+        """ The inverse of _encode """
+        if blob[:1] == _COMPRESSED:
+            return pickle.loads(zlib.decompress(blob[1:]))
+        return pickle.loads(blob[1:])
+
+    def _get_shared_timeout(self, timeout):
+        """ The timeout to pass on to the shared cache, in seconds or None """
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def _get_local_expiry(self, timeout):
+        """ When the entry leaves the in-process tier: at most LOCAL_TIMEOUT from now """
+        expiry = self.get_backend_timeout(timeout)
+        return min(expiry or float('inf'), time.time() + self.localTimeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        blob = self.local.get(key)
+        if blob is not None:
+            self._count('localHits')
+            return self._decode(blob)
+
+        blob = self.shared.get(key)
+        if blob is None:
+            self._count('misses')
+            return default
+        self._count('sharedHits')
+        # We don't know the shared entry's expiry: keep it for LOCAL_TIMEOUT at most
+        self.local.set(key, blob, time.time() + self.localTimeout)
+        return self._decode(blob)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        blob = self._encode(value)
+        self._count('sets')
+        self.shared.set(key, blob, self._get_shared_timeout(timeout))
+        self.local.set(key, blob, self._get_local_expiry(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        blob = self._encode(value)
+        if not self.shared.add(key, blob, self._get_shared_timeout(timeout)):
+            return False
+        self._count('sets')
+        self.local.set(key, blob, self._get_local_expiry(timeout))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.local.delete(key)
+        return self.shared.touch(key, self._get_shared_timeout(timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.local.delete(key)
+        return self.shared.delete(key)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self._missingKey, version=version) is not self._missingKey
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    # A default which can't be a cached value
+    _missingKey = object()
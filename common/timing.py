@@ -0,0 +1,158 @@
+"""
+Lightweight timing of the stages of a request (reading the file, migrating, building the
+graph, each visualization, rendering the template...), so we can tell which one is slow.
+
+Wrap a stage in time_stage(name). During a request handled by ServerTimingMiddleware,
+the durations are collected for that request: they are sent to staff in a Server-Timing
+header and logged as one structured line. Every stage, in or out of a request, is also
+added to per-process counters which the timing metrics endpoint reports.
+"""
+
+from contextlib import contextmanager
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+
+logger = logging.getLogger(__name__)
+
+# The RequestTimings of the request being handled, if any
+_currentTimings = contextvars.ContextVar('currentTimings', default=None)
+
+
+class RequestTimings:
+    """ The total duration of each stage during a single request, in the order they started """
+
+    def __init__(self):
+        self.secondsPerStage = {}
+
+    def add(self, stageName, seconds):
+        """ Adds the duration to the stage: stages which run several times are summed """
+        self.secondsPerStage[stageName] = self.secondsPerStage.get(stageName, 0) + seconds
+
+    def to_server_timing_header(self):
+        """ Formats the timings as a Server-Timing header, with durations in milliseconds """
+        return ', '.join(f"{stageName};dur={seconds * 1000:.1f}"
+                         for stageName, seconds in self.secondsPerStage.items())
+
+
+class TimingCounters:
+    """ Thread-safe totals of the durations of each stage, since the process started """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def add(self, stageName, seconds):
+        """ Counts one run of the stage """
+        with self.lock:
+            counter = self.counters.get(stageName)
+            if counter is None:
+                counter = {'count': 0, 'totalSeconds': 0, 'maxSeconds': 0}
+                self.counters[stageName] = counter
+            counter['count'] += 1
+            counter['totalSeconds'] += seconds
+            counter['maxSeconds'] = max(counter['maxSeconds'], seconds)
+
+    def snapshot(self):
+        """ A copy of the counters, with the mean duration of each stage """
+        with self.lock:
+            return {stageName: dict(counter,
+                                    meanSeconds=counter['totalSeconds'] / counter['count'])
+                    for stageName, counter in self.counters.items()}
+
+    def reset(self):
+        """ Clears every counter """
+        with self.lock:
+            self.counters = {}
+
+
+COUNTERS = TimingCounters()
+
+
+@contextmanager
+def time_stage(stageName):
+    """ Times the code in this block, adding it to the current request and to COUNTERS """
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - startTime
+        timings = _currentTimings.get()
+        if timings is not None:
+            timings.add(stageName, seconds)
+        COUNTERS.add(stageName, seconds)
+
+
+def timed(stageName, function):
+    """ Returns a function which calls function() and times it as the given stage """
+    def timed_function(*args, **kwargs):
+        with time_stage(stageName):
+            return function(*args, **kwargs)
+    return timed_function
+
+
+def get_current_timings():
+    """ Returns the RequestTimings of the current request, or None outside of a request """
+    return _currentTimings.get()
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the stage timings of each request. If any stage was timed, logs them,
+    and adds a Server-Timing header if the user is staff.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, getResponse):
+        self.getResponse = getResponse
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _currentTimings.set(timings)
+        startTime = time.perf_counter()
+        try:
+            response = self.getResponse(request)
+        finally:
+            _currentTimings.reset(token)
+        totalSeconds = time.perf_counter() - startTime
+
+        if not timings.secondsPerStage:
+            return response
+
+        timings.add('total', totalSeconds)
+        logger.info("request_timing %s", json.dumps({
+            'path': request.path,
+            'status': response.status_code,
+            'ms': {stageName: round(seconds * 1000, 1)
+                   for stageName, seconds in timings.secondsPerStage.items()},
+        }))
+
+        # Without a session there's no staff user: don't load the session, which would
+        # make every cached page vary by cookie
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return response
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = timings.to_server_timing_header()
+            # Don't let a cache serve these timings to anyone else
+            patch_cache_control(response, private=True)
+        return response
+
+    def process_template_response(self, request, response):  # pylint: disable=unused-argument
+        """ Times the template rendering, which happens after the view returns """
+        timings = _currentTimings.get()
+        startTime = time.perf_counter()
+
+        def record_render_time(_):
+            seconds = time.perf_counter() - startTime
+            COUNTERS.add('render', seconds)
+            if timings is not None:
+                timings.add('render', seconds)
+
+        response.add_post_render_callback(record_render_time)
+        return response
@@ -1,12 +1,19 @@
 """ Utility functions shared across views, in either movie or visualizer apps """
 
+import hashlib
 import json
 from urllib.parse import urlparse
 
 from django.conf import settings
+from django.utils.http import quote_etag
+from common.timing import time_stage, timed
 from visualizer.bargraph.graphToD3 import D3Bargraph
 from visualizer.descriptors.faq import FAQGenerator
 from visualizer.descriptors.roundDescriber import Describer
+from visualizer.graph.compiledElection import COMPILED_FORMAT_VERSION,\
+    is_compiled_election_current,\
+    load_graph_from_compiled_election
+from visualizer.common import make_complete_url
 from visualizer.graph.graphCreator import make_graph_with_file
 from visualizer.models import TextForWinner
 from visualizer.sankey.graphToD3 import D3Sankey
@@ -16,6 +23,20 @@ from visualizer.tabular.tabular import TabulateByRoundInteractive,\
     TabulateByCandidate,\
     SingleTableSummary
 
+# Bump whenever the format of the data returned by get_json_data_for_view changes
+VIEW_DATA_FORMAT_VERSION = 1
+
+# The name of each field returned by get_json_data_for_view,
+# and the key of its already-serialized value in the view data
+JSON_DATA_KEYS = {
+    'bargraph': 'bargraphjson',
+    'sankey': 'sankeyjson',
+    'humanFriendlyEventsPerRound': 'humanFriendlyEventsPerRound',
+    'humanFriendlySummary': 'humanFriendlySummary',
+    'faqsPerRound': 'faqsPerRound',
+    'candidateSidecarData': 'candidateSidecarData',
+}
+
 
 class DefaultConfig():  # pylint: disable=too-few-public-methods
     """
@@ -43,65 +64,147 @@ def get_embed_html(embedlyUrl, maxwidth, maxheight):
     return html
 
 
+class LazyValue:  # pylint: disable=too-few-public-methods
+    """
+    A value which is computed the first time it is needed, then remembered.
+    Django templates call callables when they look them up, so a LazyValue
+    can be put directly in a template context.
+    """
+    __slots__ = ('function', 'isComputed', 'value')
+
+    def __init__(self, function):
+        self.function = function
+        self.isComputed = False
+        self.value = None
+
+    def __call__(self):
+        if not self.isComputed:
+            self.value = self.function()
+            self.isComputed = True
+        return self.value
+
+
+class LazyViewData(dict):
+    """
+    The data for a view, where the expensive values (each visualization, the descriptions...)
+    are only computed when a template or a view first uses them.
+    Reading a value from Python computes it as needed; Django templates compute only the
+    values they use, because copying this dict into a template Context copies the LazyValues
+    themselves.
+    """
+
+    def set_lazy(self, key, function):
+        """ Sets the key to the result of calling function(), when it is first used """
+        super().__setitem__(key, LazyValue(function))
+
+    def is_computed(self, key):
+        """ Has the value for this key been computed? """
+        value = super().__getitem__(key)
+        return not isinstance(value, LazyValue) or value.isComputed
+
+    def compute_all(self):
+        """ Computes every value now, e.g. to check that they can all be computed """
+        for value in super().values():
+            if isinstance(value, LazyValue):
+                value()
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, LazyValue):
+            return value()
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
 def get_data_for_graph(graph, config):
     """
     Helper function for get_data_for_view:
     convert the graph to data to be passed on to JS.
+    Returns a LazyViewData: each visualization is only computed if it is used.
     """
-    d3Bargraph = D3Bargraph(graph)
-    d3Sankey = D3Sankey(graph)
-    tabularByCandidate = TabulateByCandidate(graph, config)
-    singleTableSummary = SingleTableSummary(graph)
-    tabularByRound = TabulateByRound(graph)
-    tabularByRoundInteractive = TabulateByRoundInteractive(graph, config)
-    graphData = {
+    graphData = LazyViewData({
         'title': graph.title,
         'date': graph.dateString,
-        'bargraphjs': d3Bargraph.js,
-        'sankeyjs': d3Sankey.js,
-        'tabularByCandidate': tabularByCandidate,
-        'singleTableSummary': singleTableSummary,
-        'tabularByRound': tabularByRound,
-        'tabularByRoundInteractive': tabularByRoundInteractive,
+        'numRounds': graph.numRounds,
         'graph': graph
-    }
-    roundDescriberData = get_data_for_round_describer(graph, config)
-    graphData.update(roundDescriberData)
+    })
+    graphData.set_lazy('bargraphjson', timed('bargraph', lambda: D3Bargraph(graph).json))
+    graphData.set_lazy('sankeyjson', timed('sankey', lambda: D3Sankey(graph).json))
+    graphData.set_lazy('tabularByCandidate',
+                       timed('tabular', lambda: TabulateByCandidate(graph, config)))
+    graphData.set_lazy('singleTableSummary',
+                       timed('tabular', lambda: SingleTableSummary(graph)))
+    graphData.set_lazy('tabularByRound',
+                       timed('tabular', lambda: TabulateByRound(graph)))
+    graphData.set_lazy('tabularByRoundInteractive',
+                       timed('tabular', lambda: TabulateByRoundInteractive(graph, config)))
+    add_data_for_round_describer(graphData, graph, config)
     return graphData
 
 
-def get_data_for_round_describer(graph, config):
+def add_data_for_round_describer(graphData, graph, config):
     """
     Helper function for get_data_for_view:
-    convert the round describer to data to be passed on to JS
+    adds the (lazy) round describer data, to be passed on to JS, to the LazyViewData
     """
-    roundDescriber = Describer(graph, config, summarizeAsParagraph=False)
-    humanFriendlyEventsPerRound = roundDescriber.describe_all_rounds()
-    humanFriendlySummary = roundDescriber.describe_initial_summary(isForVideo=False)
-    faqsPerRound = json.dumps(FAQGenerator(graph, config).describe_all_rounds())
+    def describe():
+        roundDescriber = Describer(graph, config, summarizeAsParagraph=False)
+        return {
+            'humanFriendlyEventsPerRound': json.dumps(roundDescriber.describe_all_rounds()),
+            'humanFriendlySummary': json.dumps(
+                roundDescriber.describe_initial_summary(isForVideo=False)),
+        }
+    description = LazyValue(timed('describer', describe))
 
-    return {
-        'humanFriendlyEventsPerRound': json.dumps(humanFriendlyEventsPerRound),
-        'humanFriendlySummary': json.dumps(humanFriendlySummary),
-        'faqsPerRound': faqsPerRound
-    }
+    graphData.set_lazy('humanFriendlyEventsPerRound',
+                       lambda: description()['humanFriendlyEventsPerRound'])
+    graphData.set_lazy('humanFriendlySummary',
+                       lambda: description()['humanFriendlySummary'])
+    graphData.set_lazy('faqsPerRound', timed(
+        'faq', lambda: json.dumps(FAQGenerator(graph, config).describe_all_rounds())))
 
 
-def get_data_for_view(config):
-    """ All data needed to pass on to the visualize or visualizeembedded view """
+def load_graph_and_sidecar_data(config):
+    """
+    Loads the graph and the candidate sidecar data (or None) for the config:
+    from the compiled election if it is current, or else from the files themselves.
+    """
+    if is_compiled_election_current(config.compiledElection):
+        with time_stage('compiled'):
+            graph = load_graph_from_compiled_election(
+                config.compiledElection,
+                config.excludeFinalWinnerAndEliminatedCandidate)
+        return graph, config.compiledElection['sidecar']
+
     graph = make_graph_with_file(config.jsonFile,
                                  config.excludeFinalWinnerAndEliminatedCandidate)
-    if config.candidateSidecarFile:
+    if not config.candidateSidecarFile:
+        return graph, None
+
+    with time_stage('sidecar'):
         candidateSidecarDataPyObj = SidecarReader(config.candidateSidecarFile)
 
         # TODO this doesn't feel good - the graph should load this natively,
         # not have it snuck here.
         orderedItems = graph.get_items_for_names(candidateSidecarDataPyObj.data['order'])
         graph.set_elimination_order(orderedItems)
-        candidateSidecarData = json.dumps(candidateSidecarDataPyObj.data)
-    else:
-        candidateSidecarDataPyObj = None
-        candidateSidecarData = json.dumps(None)
+    return graph, candidateSidecarDataPyObj.data
+
+
+def get_data_for_view(config):
+    """ All data needed to pass on to the visualize or visualizeembedded view """
+    graph, sidecarData = load_graph_and_sidecar_data(config)
+    candidateSidecarData = json.dumps(sidecarData)
 
     offlineMode = settings.OFFLINE_MODE
 
@@ -121,6 +224,54 @@ def get_data_for_view(config):
     return graphData
 
 
+def get_data_version(config):
+    """
+    A tag which changes whenever the data for this config may change:
+    when the config is saved, or when the format of the data changes.
+    """
+    version = f"{VIEW_DATA_FORMAT_VERSION}:{COMPILED_FORMAT_VERSION}:" \
+              f"{config.pk}:{config.updatedAt.isoformat()}"
+    return hashlib.sha256(version.encode('utf-8')).hexdigest()[:32]
+
+
+def make_etag(*parts):
+    """ A strong, quoted ETag for a response which depends only on the given parts """
+    tag = ':'.join(str(part) for part in parts)
+    return quote_etag(hashlib.sha256(tag.encode('utf-8')).hexdigest()[:32])
+
+
+def get_page_etag(request, config):
+    """
+    The ETag of a page showing this config, computed without loading the election:
+    it changes when the config is saved, on each release, with the URL,
+    and with any header the page varies on.
+    """
+    owner = config.owner
+    isPrivate = owner is not None and hasattr(owner, 'userprofile') and owner.userprofile.isPrivate
+    return make_etag(get_data_version(config),
+                     isPrivate,
+                     settings.RELEASE_VERSION,
+                     make_complete_url(request, request.get_full_path()),
+                     request.headers.get('increment'))
+
+
+def get_json_data_for_view(config):
+    """
+    The data for every visualization of the config as a JSON string,
+    for the visualization data endpoint. The visualizations are already serialized,
+    so this stitches them together rather than serializing them again.
+    """
+    data = get_data_for_view(config)
+    fields = [
+        ('version', json.dumps(get_data_version(config))),
+        ('slug', json.dumps(config.slug)),
+        ('title', json.dumps(data['title'])),
+        ('date', json.dumps(data['date'])),
+    ]
+    fields += [(name, data[key]) for name, key in JSON_DATA_KEYS.items()]
+    return '{' + ','.join(f'"{name}":{value}' for name, value in fields) + '}'
+
+
 def get_script_to_disable_animations():
     """ Disables transitions on the current page """
     return "var animDisabler = document.createElement('style');\
@@ -0,0 +1,15 @@
+""" electionpage app to connect signal """
+
+from django.apps import AppConfig
+
+
+class ElectionPageAppConfig(AppConfig):
+    """
+    Use this instead of just "electionpage" in rcvis/settings to
+    ensure the signal is created once and only once.
+    """
+    name = 'electionpage'
+
+    def ready(self):
+        # pylint: disable=unused-import,import-outside-toplevel
+        import electionpage.signal
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electionpage', '0002_singlesourceelectionpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapableelectionpage',
+            name='currentPollInterval',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapableelectionpage',
+            name='nextScheduledScrape',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapableelectionpage',
+            name='pollInterval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -7,7 +7,7 @@ from sortedm2m.fields import SortedManyToManyField
 
 from common.cloudflare import CloudflareAPI
 from visualizer.models import JsonConfig
-from scraper.models import MultiScraper, Scraper
+from scraper.models import MultiScraper, Scraper, ScrapeSchedule
 
 
 class BaseElectionPage(models.Model):
@@ -48,12 +48,13 @@ class ElectionPage(BaseElectionPage):
         return reverse('electionPage', args=(self.slug,))
 
 
-class ScrapableElectionPage(BaseElectionPage):
+class ScrapableElectionPage(BaseElectionPage, ScrapeSchedule):
     """
     An election page consisting of several Scrapers.
     Unlike an ElectionPage, the scrapers might NOT have an actual
     visualization associated with them - these can be used as placeholders
     leading up to an election.
+    When scheduled, every scraper on the page is scraped together.
     """
     # The list of all elections in this election page
     listOfScrapers = SortedManyToManyField(Scraper)
@@ -0,0 +1,89 @@
+"""
+Signals that invalidate the cached election pages listing a JsonConfig,
+when the JsonConfig changes or is added to a page by a scraper,
+and that optionally pre-render a JsonConfig when it's saved
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from common.cacheVersions import invalidate_paths
+from electionpage.models import ElectionPage, ScrapableElectionPage, SingleSourceElectionPage
+from scraper.models import MultiScraper, Scraper
+from visualizer.models import JsonConfig, jsonConfigPurged
+from visualizer.tasks import prerender_task
+
+logger = logging.getLogger(__name__)
+
+
+def _get_page_paths(urlName, pages):
+    """ The path of each election page in the queryset """
+    return [reverse(urlName, args=(slug,)) for slug in pages.values_list('slug', flat=True)]
+
+
+def _invalidate_pages(urlName, pages):
+    """ Invalidates the local cache of each election page in the queryset """
+    invalidate_paths(_get_page_paths(urlName, pages))
+
+
+def _get_pages_with_election(jsonConfig):
+    """ The paths of every election page which lists the JsonConfig """
+    return \
+        _get_page_paths('electionPage', ElectionPage.objects.filter(
+            listOfElections=jsonConfig)) + \
+        _get_page_paths('electionPageScrapable', ScrapableElectionPage.objects.filter(
+            listOfScrapers__jsonConfig=jsonConfig)) + \
+        _get_page_paths('electionPageSingleSource', SingleSourceElectionPage.objects.filter(
+            scraper__listOfElections=jsonConfig))
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=JsonConfig)
+def invalidate_pages_with_election(sender, instance, created, **kwargs):
+    """
+    When a JsonConfig is updated, invalidates the local cache of every election page
+    which lists it, and only those.
+    """
+    if created:
+        return
+    invalidate_paths(_get_pages_with_election(instance))
+
+
+@receiver(jsonConfigPurged, sender=JsonConfig)
+def prerender_saved_election(sender, instance, created, **kwargs):
+    """
+    If settings.PRERENDER_ON_SAVE, has a celery worker pre-render the JsonConfig and the
+    election pages listing it once the save is committed, so their next visitor doesn't
+    wait for it. The worker's cache must be the web processes' too.
+    """
+    if not settings.PRERENDER_ON_SAVE:
+        return
+    if not settings.IS_CACHE_SHARED:
+        logger.warning("Not pre-rendering %s: the cache isn't shared with the worker",
+                       instance.slug)
+        return
+    slug = instance.slug
+    pagePaths = [] if created else _get_pages_with_election(instance)
+    # pylint: disable=no-member
+    transaction.on_commit(lambda: prerender_task.delay([slug], pagePaths))
+
+
+@receiver(post_save, sender=Scraper)
+def invalidate_pages_with_scraper(sender, instance, **kwargs):
+    """ A scraper may have just created its JsonConfig: invalidate the pages listing it """
+    _invalidate_pages('electionPageScrapable',
+                      ScrapableElectionPage.objects.filter(listOfScrapers=instance))
+
+
+@receiver(m2m_changed, sender=MultiScraper.listOfElections.through)
+def invalidate_pages_with_multi_scraper(sender, instance, action, **kwargs):
+    """ A multi-scraper added or removed JsonConfigs: invalidate its page """
+    if not action.startswith('post_') or not isinstance(instance, MultiScraper):
+        return
+    _invalidate_pages('electionPageSingleSource',
+                      SingleSourceElectionPage.objects.filter(scraper=instance))
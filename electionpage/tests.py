@@ -21,6 +21,7 @@ import datetime
 from urllib.parse import urlparse
 
 from django.core.files import File
+from django.test import override_settings
 from django.urls import reverse
 from requests_mock import Mocker
 from selenium.common.exceptions import NoSuchElementException
@@ -33,6 +34,8 @@ from visualizer.tests import filenames
 from visualizer.tests import liveServerTestBaseClass
 
 
+# Run each scrape job within the request, so the status page shows its results right away
+@override_settings(SCRAPE_JOBS_IN_BACKGROUND=False)
 class ElectionPageTests(liveServerTestBaseClass.LiveServerTestBaseClass):
     """ Tests for the electionpage app - using a live browser """
     @classmethod
@@ -133,7 +136,7 @@ class ElectionPageTests(liveServerTestBaseClass.LiveServerTestBaseClass):
         badScraper.save()
         TestHelpers.mock_scraper_url_with_file(requestMock, "mock://bad-url", filenames.BAD_DATA)
 
-        # Results page shows one error, one success
+        # The job's status page shows one error, one success
         self.open(reverse('scrapeAll', args=(epModel.slug,)), expectedErrorCount=0)
         self.assertEqual(len(self.browser.find_elements(By.CLASS_NAME, "alert-primary")), 1)
         self.assertEqual(len(self.browser.find_elements(By.CLASS_NAME, "alert-warning")), 1)
@@ -8,6 +8,7 @@ created in an admin page I suppose - though eventually we want to give that acce
 so they can aggregate any of their uploads into a single page.
 """
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.shortcuts import redirect
 from django.urls import reverse
 from django.views.generic.base import TemplateView
 from django.views.generic.detail import DetailView
@@ -15,12 +16,11 @@ from django.views.generic.edit import FormView
 from extra_views import ModelFormSetView
 
 from common import viewUtils
-from common.cloudflare import CloudflareAPI
 from electionpage.forms import ScrapableElectionPageForm
 from electionpage.models import ElectionPage, ScrapableElectionPage, SingleSourceElectionPage
 from scraper.forms import ScraperForm
 from scraper.models import Scraper
-from scraper.scrapeWorker import ScrapeWorker
+from scraper.tasks import start_scrape_job
 
 
 def populate_election_context_data(context, jsonConfigs):
@@ -82,33 +82,22 @@ class SingleSourceElectionPageView(DetailView):
 
 class ScrapeAll(PermissionRequiredMixin, DetailView):
     """
-    Scrapes everything we can in this election
+    Scrapes everything we can in this election, in the background,
+    and redirects to the job's status page
     """
     model = ScrapableElectionPage
-    template_name = 'electionpage/scrapeAllResults.html'
     permission_required = ['scraper.add_scraper', 'scraper.change_scraper']
 
-    def get_context_data(self, **kwargs):
-        results = []
-        for scraper in self.object.listOfScrapers.all():
-            try:
-                ScrapeWorker.scrape(scraper, self.request.user)
-                succeeded = True
-            except BaseException:  # pylint: disable=broad-except
-                succeeded = False
-
-            results.append({'scraper': scraper, 'succeeded': succeeded})
-
-        context = super().get_context_data(**kwargs)
-        context['title'] = self.object.title
-        context['slug'] = self.object.slug
-        context['results'] = results
-
-        # Purge all local cache and the specific cloudflare cache
-        urlToPurge = reverse('electionPageScrapable', args=(self.object.slug,))
-        CloudflareAPI.purge_paths_cache([urlToPurge])
+    def get(self, *args, **kwargs):
+        electionPage = self.get_object()
+        pageUrl = reverse('electionPageScrapable', args=(electionPage.slug,))
 
-        return context
+        # The page is purged once, with every election, when the job finishes
+        job = start_scrape_job(electionPage.title, self.request.user,
+                               electionPage.listOfScrapers.all(),
+                               returnURL=pageUrl,
+                               pathsToPurge=[pageUrl])
+        return redirect(job)
 
 
 # pylint: disable=too-many-ancestors
@@ -1,9 +1,13 @@
 """ Models for storing data about a movie """
 from django.conf import settings
-from django.core.cache import cache
 from django.core.files.storage import DefaultStorage
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Q
+
+from common.cacheVersions import invalidate_paths
+from common.cloudflare import CloudflareAPI
+from visualizer.models import JsonConfig
 
 
 # pylint:disable=abstract-method,too-few-public-methods
@@ -28,9 +32,11 @@ class Movie(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
 
-        # Clear the cache. Otherwise, you'll continue to get the cached result
-        # of the old model.
-        cache.clear()
+        # Invalidate the cached pages of the visualizations with this movie.
+        # Otherwise, you'll continue to get the cached result of the old model.
+        jsonConfigs = JsonConfig.objects.filter(Q(movieHorizontal=self) | Q(movieVertical=self))
+        for slug in jsonConfigs.values_list('slug', flat=True):
+            invalidate_paths(CloudflareAPI.get_vis_paths(slug))
 
 
 class TextToSpeechCachedFile(models.Model):
@@ -6,7 +6,7 @@ import os
 broker_url = 'sqs://'  # pylint: disable=invalid-name
 
 # List of modules to import when the Celery worker starts.
-imports = ('movie.tasks',)
+imports = ('movie.tasks', 'visualizer.tasks', 'scraper.tasks')
 
 # No backend - we don't care about the results, we'll update the database
 result_backend = None  # pylint: disable=invalid-name
@@ -15,6 +15,13 @@ task_annotations = {
     'tasks.create_movie_task': {'rate_limit': '1/s'}
 }
 
+# Short background tasks go to their own queue, for the worker process in the Procfile:
+# the default queue is only consumed by the dynos launched to make movies
+task_routes = {
+    'visualizer.tasks.*': {'queue': 'background'},
+    'scraper.tasks.*': {'queue': 'background'},
+}
+
 sqs_queue_name = os.environ.get('SQS_QUEUE_NAME')
 if not sqs_queue_name:
     # Otherwise we get a cryptic error message
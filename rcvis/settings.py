@@ -29,6 +29,11 @@ DEBUG = os.environ['RCVIS_DEBUG'] == "True"
 # Only useful to disable in tests
 RATE_LIMIT_AJAX = True
 
+# Validating the data entry table costs each user the seconds it takes, from a budget of this
+# many seconds, which refills over DATA_ENTRY_VALIDATION_BUDGET_WINDOW seconds
+DATA_ENTRY_VALIDATION_BUDGET = float(os.environ.get('RCVIS_DATA_ENTRY_VALIDATION_BUDGET', 5))
+DATA_ENTRY_VALIDATION_BUDGET_WINDOW = 60
+
 # I'm not proud of this. Add hosts - one per environment variable
 ALLOWED_HOSTS = [os.environ['RCVIS_HOST']]
 if 'RCVIS_HOST_ALIAS' in os.environ:
@@ -52,10 +57,10 @@ INSTALLED_APPS = [
     'django.contrib.sitemaps',
     'django.contrib.sites',
 
-    'visualizer',
+    'visualizer.apps.VisualizerAppConfig',
     'movie',
     'scraper',
-    'electionpage',
+    'electionpage.apps.ElectionPageAppConfig',
 
     'admin_cursor_paginator',
     'accounts.apps.AccountsAppConfig',
@@ -77,17 +82,24 @@ MIDDLEWARE = [
     # This should be after SecurityMiddleware
     'whitenoise.middleware.WhiteNoiseMiddleware',
 
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Answers If-None-Match and If-Modified-Since for cached pages too:
+    # must come before VersionedUpdateCacheMiddleware so the full response is what's cached
+    'django.middleware.http.ConditionalGetMiddleware',
 
-    # Order of the next 3 is important
-    'django.middleware.cache.UpdateCacheMiddleware',
+    # Order of the next 4 is important. SessionMiddleware adds "Vary: Cookie" to pages
+    # which use the session, and must do so before UpdateCacheMiddleware caches them.
+    'common.cacheVersions.VersionedUpdateCacheMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.cache.FetchFromCacheMiddleware',
+    'common.cacheVersions.VersionedFetchFromCacheMiddleware',
 
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    # This must be after AuthenticationMiddleware
+    'common.timing.ServerTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'rcvis.urls'
@@ -270,6 +282,9 @@ HEROKU_API_KEY = os.environ.get('HEROKU_API_KEY')
 HEROKU_APP_NAME = os.environ.get('HEROKU_APP_NAME')
 HEROKU_WORKER_DYNO_TYPE = os.environ.get('HEROKU_WORKER_DYNO_TYPE')
 
+# Changes on each deploy (set by heroku's dyno metadata), so cached pages are revalidated
+RELEASE_VERSION = os.environ.get('HEROKU_RELEASE_VERSION', '')
+
 # Movie creation
 AWS_POLLY_STORAGE_BUCKET_NAME = os.environ.get('AWS_POLLY_STORAGE_BUCKET_NAME')
 
@@ -280,11 +295,31 @@ CLOUDFLARE_AUTH_TOKEN = os.environ.get('CLOUDFLARE_AUTH_TOKEN')
 AWS_DEFAULT_ACL = None
 
 if os.environ.get('DISABLE_CACHE') != 'True':
-    CACHES = {
-        'default': {
+    # A bounded in-process LRU in front of a cache shared by every dyno: redis if
+    # REDIS_URL is set, or else the local file-based cache. See common.tieredCache.
+    if os.environ.get('REDIS_URL'):
+        SHARED_CACHE = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+        IS_CACHE_SHARED = True
+    else:
+        SHARED_CACHE = {
             'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
             'LOCATION': '/tmp/django_rcvis_cache/',
         }
+        # Every process on this machine shares the files, but each dyno has its own
+        IS_CACHE_SHARED = 'DYNO' not in os.environ
+    CACHES = {
+        'default': {
+            'BACKEND': 'common.tieredCache.TieredCache',
+            'OPTIONS': {
+                'SHARED_CACHE': 'shared',
+                'MAX_LOCAL_BYTES': int(os.environ.get('RCVIS_LOCAL_CACHE_BYTES', 32 << 20)),
+                'LOCAL_TIMEOUT': 10,
+            }
+        },
+        'shared': SHARED_CACHE,
     }
 else:
     assert DEBUG
@@ -293,6 +328,31 @@ else:
             'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
         }
     }
+    IS_CACHE_SHARED = True
+
+# Pre-render each election on a celery worker when it's saved, if the cache is shared
+# with the worker (see IS_CACHE_SHARED): see common.prerender
+PRERENDER_ON_SAVE = os.environ.get('RCVIS_PRERENDER_ON_SAVE') == 'True'
+
+# Run scrapes on a celery worker rather than within the request: see scraper.tasks
+SCRAPE_JOBS_IN_BACKGROUND = True
+
+# How long a scrape job may take, in seconds, before it's assumed to have been lost with
+# its process (e.g. on a deploy) and is marked failed: see scraper.scrapeJobs
+SCRAPE_JOB_TIMEOUT = int(os.environ.get('RCVIS_SCRAPE_JOB_TIMEOUT', 1800))
+
+# How many sources each scrape job downloads from at once
+SCRAPE_CONCURRENCY = int(os.environ.get('RCVIS_SCRAPE_CONCURRENCY', 8))
+
+# How many of those downloads may be from the same server, so we don't overload
+# a county's server on election night
+SCRAPE_CONCURRENCY_PER_HOST = int(os.environ.get('RCVIS_SCRAPE_CONCURRENCY_PER_HOST', 2))
+
+# The user the scrape scheduler scrapes as, or None to not run it: see scraper.scrapeScheduler
+SCRAPE_SCHEDULER_USER = os.environ.get('RCVIS_SCRAPE_SCHEDULER_USER')
+
+# The longest a scheduled scrape backs off to, in seconds: see scraper.scrapeScheduler
+SCRAPE_SCHEDULER_MAX_INTERVAL = int(os.environ.get('RCVIS_SCRAPE_SCHEDULER_MAX_INTERVAL', 3600))
 
 REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
@@ -0,0 +1,73 @@
+"""
+Management script to scrape every scheduled Scraper, MultiScraper and ScrapableElectionPage
+when it's due: see scraper.scrapeScheduler. Runs until stopped, or once with --once.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from scraper.scrapeScheduler import run_due_scrapes
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Runs the management script
+    """
+    help = 'Scrapes each scheduled source when it is due, backing off while it is unchanged'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str,
+                            help='Scrape as this user, who needs permission to change scrapers '
+                                 '(default: RCVIS_SCRAPE_SCHEDULER_USER)')
+        parser.add_argument('--once', action='store_true',
+                            help='Scrape whatever is due now, then exit')
+        parser.add_argument('--tick', type=float, default=10,
+                            help='How often to check for due scrapes, in seconds')
+
+    def handle(self, *args, **options):
+        username = options['user'] or settings.SCRAPE_SCHEDULER_USER
+        if not username:
+            logger.warning("No RCVIS_SCRAPE_SCHEDULER_USER: not scraping on a schedule")
+            return
+        if not settings.IS_CACHE_SHARED:
+            raise CommandError("The cache isn't shared with the web processes, "
+                               "so they wouldn't see what's scraped: set REDIS_URL")
+
+        try:
+            user = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist as exc:
+            raise CommandError(f"No user named {username}") from exc
+        if not user.has_perm('scraper.change_scraper'):
+            raise CommandError(f"{user.username} does not have permission to scrape")
+
+        while True:
+            # This process runs for a long time: don't keep using a connection that's gone
+            close_old_connections()
+            try:
+                job = run_due_scrapes(user, timezone.now())
+                if job is not None:
+                    self._write_summary(job)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Scheduled scrapes failed")
+                if options['once']:
+                    raise
+
+            if options['once']:
+                return
+            time.sleep(options['tick'])
+
+    def _write_summary(self, job):
+        """ One line for each job """
+        numChanged = sum(e['status'] == 'succeeded' and not e['isUnchanged']
+                         for e in job.progress)
+        numFailed = sum(e['status'] != 'succeeded' for e in job.progress)
+        self.stdout.write(f"Scraped {len(job.progress)} sources: {numChanged} changed, "
+                          f"{len(job.progress) - numChanged - numFailed} unchanged, "
+                          f"{numFailed} failed")
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0003_alter_multiscraper_listofelections'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='multiscraper',
+            name='fileFormat',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='scraper',
+            name='fileFormat',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
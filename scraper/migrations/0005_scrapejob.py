@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('scraper', '0004_scraper_fileformat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=256)),
+                ('status', models.IntegerField(choices=[(0, 'Queued'), (1, 'Running'), (2, 'Complete'), (3, 'Failed')], default=0)),
+                ('progress', models.JSONField(default=list)),
+                ('pathsToPurge', models.JSONField(default=list)),
+                ('returnURL', models.CharField(max_length=256)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('finishedAt', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0006_scraper_conditional_fetch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='multiscraper',
+            name='currentPollInterval',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='multiscraper',
+            name='nextScheduledScrape',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='multiscraper',
+            name='pollInterval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='scraper',
+            name='currentPollInterval',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='scraper',
+            name='nextScheduledScrape',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='scraper',
+            name='pollInterval',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
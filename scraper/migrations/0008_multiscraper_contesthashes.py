@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0007_scrape_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='multiscraper',
+            name='contestHashes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
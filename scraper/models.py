@@ -4,15 +4,37 @@ Models for a Scraper, which has:
     2. The human-readable URL, to display
     3. After the parsing succeeds, jsonConfig will be non-null
 """
+from django.contrib.auth import get_user_model
 from django.db import models
 from django.urls import reverse
+from django.utils.translation import gettext as _
 
 from sortedm2m.fields import SortedManyToManyField
 
 from visualizer.models import JsonConfig
 
 
-class BaseScraper(models.Model):
+class ScrapeSchedule(models.Model):
+    """
+    When to scrape automatically: see scraper.scrapeScheduler.
+    The interval adapts to the results: it grows while they're unchanged or failing,
+    and returns to pollInterval when they change.
+    """
+    class Meta:
+        abstract = True
+
+    # Scrape automatically this often, in seconds, or never if empty.
+    # Cleared once certified results have been scraped.
+    pollInterval = models.PositiveIntegerField(null=True, blank=True)
+
+    # The current interval, after backing off
+    currentPollInterval = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    # When the next scheduled scrape is due, or empty if it's due now
+    nextScheduledScrape = models.DateTimeField(null=True, blank=True, editable=False)
+
+
+class BaseScraper(ScrapeSchedule):
     """
     A model representing URLs that can be scraped to populate
     either a single visualization or an electionpage
@@ -36,6 +58,15 @@ class BaseScraper(models.Model):
     # Are the results certified at this URL?
     areResultsCertified = models.BooleanField(default=False)
 
+    # The file format found on the last successful scrape, so we don't need to detect it again
+    fileFormat = models.CharField(max_length=32, blank=True, default='', editable=False)
+
+    # From the last successful scrape: the validators to send in a conditional request,
+    # and the hash of the content, so an unchanged source isn't validated and saved again
+    etag = models.CharField(max_length=256, blank=True, default='', editable=False)
+    lastModified = models.CharField(max_length=64, blank=True, default='', editable=False)
+    contentHash = models.CharField(max_length=64, blank=True, default='', editable=False)
+
     # This is only optional because it may have failed to generate
     jsonConfig = models.OneToOneField(
         JsonConfig,
@@ -63,6 +94,54 @@ class MultiScraper(BaseScraper):
     """ A one-to-many scraper: the source generates several visualizations """
     listOfElections = SortedManyToManyField(JsonConfig, related_name='+', blank=True)
 
+    # For each contest in the last successful scrape: the hash of its file (see
+    # ScrapeWorker._hash_contest) and its visualization's pk, so unchanged contests are skipped
+    contestHashes = models.JSONField(default=dict, blank=True, editable=False)
+
     def get_absolute_url(self):
         """ Used in the admin panel to have a "Visit Site" link """
         return reverse('viewMultiScraper', args=(self.pk,))
+
+
+class ScrapeJobStatuses(models.IntegerChoices):
+    """ Describes the status of a ScrapeJob """
+    QUEUED = 0, _('Queued')
+    RUNNING = 1, _('Running')
+    COMPLETE = 2, _('Complete')
+    FAILED = 3, _('Failed')
+
+
+class ScrapeJob(models.Model):
+    """
+    A background run of one or more scrapers: see scraper.scrapeJobs.
+    Its progress is stored here, so any request (on any dyno) can report on it.
+    """
+    # Describes what is being scraped, e.g. the title of the election page
+    title = models.CharField(max_length=256)
+
+    # Who requested it: the scrapes are made as this user
+    owner = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+
+    status = models.IntegerField(choices=ScrapeJobStatuses.choices,
+                                 default=ScrapeJobStatuses.QUEUED)
+
+    # A list with a dict for each scraper: its 'kind' ('scraper' or 'multiScraper'), 'pk',
+    # 'url', 'status' ('pending', 'succeeded' or 'failed'), 'isUnchanged' if it succeeded
+    # without anything to update, and 'error' if it failed
+    progress = models.JSONField(default=list)
+
+    # Paths to purge from the cache once every scraper has run, e.g. the election page
+    pathsToPurge = models.JSONField(default=list)
+
+    # Where to go when it's done
+    returnURL = models.CharField(max_length=256)
+
+    createdAt = models.DateTimeField(auto_now_add=True)
+    finishedAt = models.DateTimeField(null=True, blank=True)
+
+    def get_absolute_url(self):
+        """ The status page """
+        return reverse('viewScrapeJob', args=(self.pk,))
+
+    def __str__(self):
+        return str(self.title)
@@ -0,0 +1,185 @@
+"""
+Runs scrapers in the background, so a page with dozens of scrapers doesn't hold a request
+open (and hit the router's timeout) while each source is downloaded in turn.
+
+A ScrapeJob records what to scrape and each scraper's progress, which the status page
+reads. Each job downloads from up to SCRAPE_CONCURRENCY sources at once, sharing one pool
+of connections but at most SCRAPE_CONCURRENCY_PER_HOST from any one server, then validates
+and saves each file as it arrives. The cache is purged once, for every election and page the
+job updated, when the job finishes.
+
+The jobs run on a celery worker (see scraper.tasks.start_scrape_job), so a deploy or a
+restart of the web process doesn't lose them, and a job whose worker stops is run again.
+A job lost anyway is marked failed once it's older than SCRAPE_JOB_TIMEOUT: see
+fail_if_abandoned.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import datetime
+import logging
+import threading
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.utils import timezone
+
+from common.cloudflare import CloudflareAPI
+from scraper.models import MultiScraper, ScrapeJob, ScrapeJobStatuses, Scraper
+from scraper.scrapeWorker import ScrapeWorker
+
+logger = logging.getLogger(__name__)
+
+# A semaphore for each server, bounding the downloads from it across every job in this process
+_hostSemaphores = {}
+_hostSemaphoresLock = threading.Lock()
+
+
+def _make_progress_entry(scraperObject):
+    """ The initial progress of one scraper: see ScrapeJob.progress """
+    kind = 'multiScraper' if isinstance(scraperObject, MultiScraper) else 'scraper'
+    return {'kind': kind,
+            'pk': scraperObject.pk,
+            'url': scraperObject.scrapableURL,
+            'title': None,
+            'status': 'pending',
+            'isUnchanged': False,
+            'error': None}
+
+
+def _get_title(scraperObject):
+    """ What was scraped, to show on the status page """
+    if isinstance(scraperObject, MultiScraper):
+        return f"{scraperObject.listOfElections.count()} elections"
+    if scraperObject.jsonConfig is None:
+        return None
+    return scraperObject.jsonConfig.title
+
+
+def create_scrape_job(title, user, scrapers, returnURL, pathsToPurge=()):
+    """
+    Creates a job to run each of the scrapers (Scrapers or MultiScrapers) as the user,
+    then purge the elections it updated, and pathsToPurge if anything changed.
+    Run it with run_job, or on a celery worker with scraper.tasks.start_scrape_job.
+    """
+    return ScrapeJob.objects.create(title=title,
+                                    owner=user,
+                                    progress=[_make_progress_entry(s) for s in scrapers],
+                                    pathsToPurge=list(pathsToPurge),
+                                    returnURL=returnURL)
+
+
+def run_job(jobPk):
+    """
+    Runs each scraper in the job, saving the progress after each one.
+    A scraper's failure is recorded in its progress; the job only fails if it can't run.
+    """
+    job = ScrapeJob.objects.select_related('owner').get(pk=jobPk)
+    if job.finishedAt is not None:
+        # It waited so long it was given up on
+        return
+    job.status = ScrapeJobStatuses.RUNNING
+    job.save(update_fields=['status'])
+
+    try:
+        _run_scrapers(job)
+        job.status = ScrapeJobStatuses.COMPLETE
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Scrape job %d failed", job.pk)
+        job.status = ScrapeJobStatuses.FAILED
+
+    job.finishedAt = timezone.now()
+    job.save(update_fields=['status', 'progress', 'finishedAt'])
+
+
+def fail_if_abandoned(job):
+    """
+    Marks the job failed if it still hasn't finished SCRAPE_JOB_TIMEOUT seconds after it was
+    created: the process running it must have stopped, so nothing else will finish it.
+    Returns whether it was abandoned.
+    """
+    if job.finishedAt is not None:
+        return False
+    timeout = datetime.timedelta(seconds=settings.SCRAPE_JOB_TIMEOUT)
+    if timezone.now() - job.createdAt < timeout:
+        return False
+
+    logger.warning("Scrape job %d was abandoned", job.pk)
+    for entry in job.progress:
+        if entry['status'] == 'pending':
+            entry['status'] = 'failed'
+            entry['error'] = "The scrape was interrupted: please try again"
+    job.status = ScrapeJobStatuses.FAILED
+    job.finishedAt = timezone.now()
+    job.save(update_fields=['status', 'progress', 'finishedAt'])
+    return True
+
+
+def _run_scrapers(job):
+    """
+    Downloads concurrently, but validates and saves each file on this thread,
+    so the database is only used from here. Unchanged sources are neither validated nor saved.
+    """
+    scrapers = {s.pk: s for s in Scraper.objects.select_related('jsonConfig').filter(
+        pk__in=[e['pk'] for e in job.progress if e['kind'] == 'scraper'])}
+    multiScrapers = {s.pk: s for s in MultiScraper.objects.filter(
+        pk__in=[e['pk'] for e in job.progress if e['kind'] == 'multiScraper'])}
+
+    numWorkers = settings.SCRAPE_CONCURRENCY
+    session = ScrapeWorker.make_session(numWorkers)
+    with session, \
+            ThreadPoolExecutor(max_workers=numWorkers, thread_name_prefix='scrape') as executor, \
+            CloudflareAPI.coalesce_purges():
+        futures = {}
+        for entry in job.progress:
+            if entry['kind'] == 'multiScraper':
+                scraperObject = multiScrapers.get(entry['pk'])
+            else:
+                scraperObject = scrapers.get(entry['pk'])
+            if scraperObject is None:
+                entry['status'] = 'failed'
+                entry['error'] = "This scraper no longer exists"
+                continue
+            # This needs the database, so is checked here rather than on the download's thread
+            isCurrent = ScrapeWorker.are_visualizations_current(scraperObject)
+            future = executor.submit(_download, scraperObject, session, isCurrent)
+            futures[future] = (entry, scraperObject)
+
+        for future in as_completed(futures):
+            entry, scraperObject = futures[future]
+            _scrape_downloaded(job.owner, entry, scraperObject, future.result)
+            job.save(update_fields=['progress'])
+
+        if any(e['status'] == 'succeeded' and not e['isUnchanged'] for e in job.progress):
+            CloudflareAPI.purge_paths_cache(job.pathsToPurge)
+
+
+def _get_host_semaphore(url):
+    """ The semaphore bounding the concurrent downloads from url's server """
+    host = urlparse(url).netloc
+    with _hostSemaphoresLock:
+        if host not in _hostSemaphores:
+            _hostSemaphores[host] = threading.BoundedSemaphore(
+                settings.SCRAPE_CONCURRENCY_PER_HOST)
+        return _hostSemaphores[host]
+
+
+def _download(scraperObject, session, isCurrent):
+    """ Downloads, waiting while too many other downloads are from the same server """
+    with _get_host_semaphore(scraperObject.scrapableURL):
+        return ScrapeWorker.download(scraperObject, session, isCurrent)
+
+
+def _scrape_downloaded(user, entry, scraperObject, getDownload):
+    """ Validates and saves one downloaded file, recording the result in the progress entry """
+    try:
+        if isinstance(scraperObject, MultiScraper):
+            wasChanged = ScrapeWorker.multi_scrape(scraperObject, user, getDownload)
+        else:
+            wasChanged = ScrapeWorker.scrape(scraperObject, user, getDownload)
+        entry['status'] = 'succeeded'
+        entry['isUnchanged'] = not wasChanged
+    except Exception as exc:  # pylint: disable=broad-except
+        # ScrapeWorker has logged it
+        entry['status'] = 'failed'
+        entry['error'] = f"{type(exc).__name__}: {exc}"
+    entry['title'] = _get_title(scraperObject)
@@ -0,0 +1,119 @@
+"""
+Scrapes on a schedule, e.g. every minute on election night, so nobody needs to keep clicking
+Scrape Now. Run by the runScrapeScheduler management command: looping in its own process
+(e.g. a clock dyno), or once each time an external scheduler runs it, with --once.
+It purges the cache for the web processes, so it only runs if they share the cache with it
+(see IS_CACHE_SHARED): otherwise they'd keep serving the pages from before each scrape.
+
+Each Scraper, MultiScraper and ScrapableElectionPage with a pollInterval is scraped when it's
+due, all in one ScrapeJob, which bounds the downloads from each server. The interval backs off
+while the results are unchanged or the source fails, up to SCRAPE_SCHEDULER_MAX_INTERVAL,
+and returns to pollInterval as soon as the results change. Once certified results have
+been scraped, the source is no longer scheduled.
+"""
+
+import datetime
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+
+from electionpage.models import ScrapableElectionPage
+from scraper.models import MultiScraper, Scraper
+from scraper.scrapeJobs import create_scrape_job, run_job
+
+logger = logging.getLogger(__name__)
+
+# The outcomes of scraping a source
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+# How much longer to wait after a scrape which found nothing new, or which failed
+BACKOFF_WHEN_UNCHANGED = 1.5
+BACKOFF_WHEN_FAILED = 2
+
+
+def get_next_interval(source, outcome):
+    """ The seconds until the source (a ScrapeSchedule) is next scraped, after this outcome """
+    if outcome == CHANGED:
+        return source.pollInterval
+    backoff = BACKOFF_WHEN_FAILED if outcome == FAILED else BACKOFF_WHEN_UNCHANGED
+    currentInterval = source.currentPollInterval or source.pollInterval
+    maxInterval = max(settings.SCRAPE_SCHEDULER_MAX_INTERVAL, source.pollInterval)
+    return min(round(currentInterval * backoff), maxInterval)
+
+
+def _get_due(model, now):
+    """ The sources of this model which are scheduled, and due """
+    return model.objects.filter(pollInterval__isnull=False) \
+                        .filter(Q(nextScheduledScrape__isnull=True) |
+                                Q(nextScheduledScrape__lte=now))
+
+
+def _get_outcome(entries):
+    """ The outcome of a source, from the progress entries of its scrapers """
+    if any(e['status'] == 'succeeded' and not e['isUnchanged'] for e in entries):
+        return CHANGED
+    if any(e['status'] != 'succeeded' for e in entries):
+        return FAILED
+    return UNCHANGED
+
+
+def _reschedule(source, outcome, finishedAt):
+    """
+    Schedules the source's next scrape, or unschedules it if it has certified results.
+    Only updates the schedule's fields: the scrape has saved the rest.
+    """
+    if outcome != FAILED and source.areResultsCertified:
+        logger.info("Scraped certified results from %s: no longer scheduled", source)
+        source.pollInterval = None
+        source.currentPollInterval = None
+        source.nextScheduledScrape = None
+    else:
+        source.currentPollInterval = get_next_interval(source, outcome)
+        source.nextScheduledScrape = finishedAt + \
+            datetime.timedelta(seconds=source.currentPollInterval)
+
+    type(source).objects.filter(pk=source.pk).update(
+        pollInterval=source.pollInterval,
+        currentPollInterval=source.currentPollInterval,
+        nextScheduledScrape=source.nextScheduledScrape)
+
+
+def run_due_scrapes(user, now):
+    """
+    Scrapes every source which is due at now, as the user, then reschedules each.
+    Returns the ScrapeJob, or None if nothing was due.
+    """
+    scrapers = list(_get_due(Scraper, now))
+    multiScrapers = list(_get_due(MultiScraper, now))
+    pages = list(_get_due(ScrapableElectionPage, now).prefetch_related('listOfScrapers'))
+    if not scrapers and not multiScrapers and not pages:
+        return None
+
+    # Each scraper once, even if it's also on a scheduled page
+    toScrape = {('scraper', s.pk): s for s in scrapers}
+    toScrape.update({('multiScraper', s.pk): s for s in multiScrapers})
+    for page in pages:
+        for scraper in page.listOfScrapers.all():
+            toScrape.setdefault(('scraper', scraper.pk), scraper)
+
+    job = create_scrape_job("Scheduled scrape", user, toScrape.values(),
+                            returnURL=reverse('electionPageHome'),
+                            pathsToPurge=[reverse('electionPageScrapable', args=(page.slug,))
+                                          for page in pages])
+    run_job(job.pk)
+    job.refresh_from_db()
+
+    entries = {(e['kind'], e['pk']): e for e in job.progress}
+    for scraper in scrapers:
+        _reschedule(scraper, _get_outcome([entries[('scraper', scraper.pk)]]), job.finishedAt)
+    for scraper in multiScrapers:
+        _reschedule(scraper, _get_outcome([entries[('multiScraper', scraper.pk)]]),
+                    job.finishedAt)
+    for page in pages:
+        pageEntries = [entries[('scraper', s.pk)] for s in page.listOfScrapers.all()]
+        _reschedule(page, _get_outcome(pageEntries), job.finishedAt)
+    return job
@@ -4,67 +4,176 @@ to create or update a JsonConfig.
 
 Be warned: only admins or highly trusted users should be able to access this.
 There are both security issues (we can't trust the external source), and
-DOS issues (this could take a while to run, and we haven't made this async.)
-
-TODO - make it async.
+DOS issues (this could take a while to run: the views run it in the background,
+see scraper.scrapeJobs.)
 """
+import hashlib
 import logging
 import os
 import tempfile
 import traceback
 
 from django.core.files import File
-from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
+from django.core.exceptions import PermissionDenied
 from django.utils import timezone
 from django.utils.text import slugify
 from rcvformats.conversions.dominion_multi_converter import DominionMultiConverter as DMC
 import requests
+from requests.adapters import HTTPAdapter
 
+from scraper.models import MultiScraper
 from visualizer import validators
 from visualizer.models import JsonConfig
 from visualizer.serializers import BaseVisualizationSerializer
 
 logger = logging.getLogger(__name__)
 
+# The largest file we'll download for a Scraper, and for a MultiScraper
+MAX_SCRAPE_BYTES = 1024 * 1024
+MAX_MULTI_SCRAPE_BYTES = 1024 * 1024 * 5
+
 
 class FileTooLargeException(Exception):
     """ We don't present friendly error messages to the user, we just 500 here and die """
 
 
+# pylint: disable=too-few-public-methods
+class ScrapedFile():
+    """
+    The result of a download: the file (None if the server said it's not modified),
+    the validators to send with the next request, and the hash of the content
+    """
+
+    def __init__(self, fileObject, etag, lastModified, contentHash):
+        self.fileObject = fileObject
+        self.etag = etag
+        self.lastModified = lastModified
+        self.contentHash = contentHash
+
+        # Set by ScrapeWorker.download: nothing needs to be updated
+        self.isUnchanged = False
+
+
 class ScrapeWorker():
     """
     Helper class which takes a Scraper model and downloads the file,
     then uploads the scraped data if it's valid and updates the jsonConfig appropriately.
     """
     @classmethod
-    def download_limited_size(cls, url, maxSizeBytes):
+    def make_session(cls, poolSize):
         """
-        Downloads URL, limited to maxSizeBytes, and returns a tempfile
-        file object of the resulting data
+        A requests session which keeps up to poolSize connections open to each host,
+        to share between that many concurrent downloads
         """
-        r = requests.get(url, stream=True, timeout=3)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
 
-        # Safety: check the headers
-        contentLengthFromHeader = int(r.headers.get('Content-Length', 0))
-        if contentLengthFromHeader > maxSizeBytes:
-            logger.error("Content length was too large: %d", contentLengthFromHeader)
-            raise FileTooLargeException("Headers say it's too large")
+    @classmethod
+    def download_limited_size(cls, url, maxSizeBytes, session=None, headers=None):
+        """
+        Downloads URL, limited to maxSizeBytes, and returns a ScrapedFile with a tempfile
+        file object of the resulting data, or with None if the server responds 304 Not Modified
+        to the conditional headers (If-None-Match, If-Modified-Since) given.
+        Uses the session (see make_session) if given, so its connections are reused.
+        """
+        # Closing the response returns its connection to the session's pool
+        with (session or requests).get(url, stream=True, timeout=3, headers=headers) as r:
+            etag = r.headers.get('ETag', '')
+            lastModified = r.headers.get('Last-Modified', '')
+            if r.status_code == requests.codes.not_modified:
+                return ScrapedFile(None, etag, lastModified, None)
+
+            # Safety: check the headers
+            contentLengthFromHeader = int(r.headers.get('Content-Length', 0))
+            if contentLengthFromHeader > maxSizeBytes:
+                logger.error("Content length was too large: %d", contentLengthFromHeader)
+                raise FileTooLargeException("Headers say it's too large")
+
+            length = 0
+            contentHash = hashlib.sha256()
+
+            tf = tempfile.NamedTemporaryFile(delete=True)  # pylint: disable=consider-using-with
+
+            for chunk in r.iter_content(64 * 1024):
+                tf.write(chunk)
+                contentHash.update(chunk)
+                length += len(chunk)
+                # In case the headers lied
+                if length > maxSizeBytes:
+                    logger.error("Headers were fine, but we've now pulled %d", length)
+                    raise FileTooLargeException("Actual data too large")
 
-        length = 0
+        tf.seek(0)
+        tf.flush()
+        return ScrapedFile(tf, etag, lastModified, contentHash.hexdigest())
 
-        tf = tempfile.NamedTemporaryFile(delete=True)
+    @classmethod
+    def are_visualizations_current(cls, scraperObject):
+        """
+        Whether the visualizations were made by the last successful scrape, and still match
+        the scraper's settings: if so, and the source is unchanged, there's nothing to update
+        """
+        if not scraperObject.contentHash:
+            return False
+        expected = {'dataSourceURL': scraperObject.sourceURL,
+                    'areResultsCertified': scraperObject.areResultsCertified}
+        if isinstance(scraperObject, MultiScraper):
+            elections = scraperObject.listOfElections.all()
+            return elections.exists() and not elections.exclude(**expected).exists()
+        jsonConfig = scraperObject.jsonConfig
+        return jsonConfig is not None and \
+            all(getattr(jsonConfig, field) == value for field, value in expected.items())
 
-        for chunk in r.iter_content(1024):
-            tf.write(chunk)
-            length += len(chunk)
-            # In case the headers lied
-            if length > maxSizeBytes:
-                logger.error("Headers were fine, but we've now pulled %d", length)
-                raise FileTooLargeException("Actual data too large")
+    @classmethod
+    def download(cls, scraperObject, session=None, areVisualizationsCurrent=None):
+        """
+        Downloads the file for a Scraper or MultiScraper, marking it unchanged if the source
+        hasn't changed since the last successful scrape. Only makes the request, so it's safe
+        to call from another thread if given areVisualizationsCurrent: see scraper.scrapeJobs.
+        """
+        if areVisualizationsCurrent is None:
+            areVisualizationsCurrent = cls.are_visualizations_current(scraperObject)
+
+        if isinstance(scraperObject, MultiScraper):
+            maxSizeBytes = MAX_MULTI_SCRAPE_BYTES
+        else:
+            maxSizeBytes = MAX_SCRAPE_BYTES
+
+        # Without current visualizations, we need the file even if it's unchanged
+        headers = {}
+        if areVisualizationsCurrent:
+            if scraperObject.etag:
+                headers['If-None-Match'] = scraperObject.etag
+            if scraperObject.lastModified:
+                headers['If-Modified-Since'] = scraperObject.lastModified
+
+        scrapedFile = cls.download_limited_size(scraperObject.scrapableURL, maxSizeBytes,
+                                                session, headers)
+        if scrapedFile.contentHash is None:
+            # A 304 often leaves out the validators: they're still the ones we sent
+            scrapedFile.etag = scrapedFile.etag or scraperObject.etag
+            scrapedFile.lastModified = scrapedFile.lastModified or scraperObject.lastModified
+        scrapedFile.isUnchanged = areVisualizationsCurrent and \
+            scrapedFile.contentHash in (None, scraperObject.contentHash)
+        return scrapedFile
 
-        tf.seek(0)
-        tf.flush()
-        return tf
+    @classmethod
+    def _save_scraped(cls, scraperObject, scrapedFile):
+        """
+        Records a successful scrape. If the file is unchanged, only its time (and the
+        validators) are updated, so nothing else is saved or purged.
+        """
+        scraperObject.lastSuccessfulScrape = timezone.now()
+        scraperObject.etag = scrapedFile.etag
+        scraperObject.lastModified = scrapedFile.lastModified
+        if scrapedFile.isUnchanged:
+            scraperObject.save(update_fields=['lastSuccessfulScrape', 'etag', 'lastModified'])
+        else:
+            scraperObject.contentHash = scrapedFile.contentHash
+            scraperObject.save()
 
     @classmethod
     def _log_and_rethrow_exception(cls, scraperObject, exc):
@@ -89,20 +198,32 @@ class ScrapeWorker():
         BaseVisualizationSerializer.populate_model_with_json_data(jsonConfig, graph)
 
     @classmethod
-    def scrape(cls, scraperObject, user):
+    def scrape(cls, scraperObject, user, getDownload=None):
         """
         Scrape for a single election
         May throw errors - be ready to handle them.
+        getDownload, if given, returns the ScrapedFile already downloaded (or raises why it
+        couldn't be), e.g. the result of a future which called download.
+        Returns False if the source was unchanged, so nothing was updated.
         """
         cls._assert_permissions(user)
 
         try:
             fromUrl = scraperObject.scrapableURL
 
-            fileObject = cls.download_limited_size(fromUrl, 1024 * 1024)
+            if getDownload is None:
+                scrapedFile = cls.download(scraperObject)
+            else:
+                scrapedFile = getDownload()
+            if scrapedFile.isUnchanged:
+                cls._save_scraped(scraperObject, scrapedFile)
+                return False
+            fileObject = scrapedFile.fileObject
             assert fileObject is not None
 
-            graph = validators.try_to_load_jsons(fileObject, None)
+            validatedElection = validators.validate_election(fileObject, None,
+                                                             scraperObject.fileFormat or None)
+            graph = validatedElection.graph
 
             fileObject.seek(0)
             desiredFilename = os.path.basename(fromUrl)
@@ -113,60 +234,119 @@ class ScrapeWorker():
                 jsonConfig = scraperObject.jsonConfig
                 jsonConfig.jsonFile = File(fileObject, desiredFilename)
 
+            jsonConfig.validatedElection = validatedElection
             cls._populate_jsonconfig(scraperObject, jsonConfig, graph)
             jsonConfig.save()
 
             scraperObject.jsonConfig = jsonConfig
-            scraperObject.lastSuccessfulScrape = timezone.now()
-            scraperObject.save()
+            scraperObject.fileFormat = graph.fileFormat or ''
+            cls._save_scraped(scraperObject, scrapedFile)
         except Exception as exc:  # pylint: disable=broad-except
             cls._log_and_rethrow_exception(scraperObject, exc)
+        return True
 
     @classmethod
-    def multi_scrape(cls, multiScraperObject, user):
+    def _hash_contest(cls, multiScraperObject, contestFile):
+        """
+        Hashes one contest's file, along with the scraper's settings which are copied to its
+        visualization, so a change to either means the visualization must be updated
+        """
+        contestHash = hashlib.sha256(contestFile.read())
+        contestFile.seek(0)
+        contestHash.update(f"{multiScraperObject.sourceURL}\n"
+                           f"{multiScraperObject.areResultsCertified}".encode('utf-8'))
+        return contestHash.hexdigest()
+
+    @classmethod
+    def _scrape_contest(cls, multiScraperObject, user, contestFile, title,  # pylint: disable=too-many-arguments
+                        electionsByTitle):
+        """
+        Validates one contest's file and creates or updates its visualization.
+        Returns the visualization.
+        """
+        desiredFilename = \
+            f'{os.path.basename(multiScraperObject.scrapableURL)}-{slugify(title)}.json'
+        validatedElection = validators.validate_election(contestFile, None,
+                                                         multiScraperObject.fileFormat or None)
+        graph = validatedElection.graph
+
+        # Note: make sure you use graph.title, as it trims, to find the visualization
+        jsonConfig = electionsByTitle.get(graph.title)
+        if jsonConfig is None:
+            jsonConfig = JsonConfig(jsonFile=File(contestFile, desiredFilename))
+            jsonConfig.owner = user
+        else:
+            jsonConfig.jsonFile = File(contestFile, desiredFilename)
+
+        jsonConfig.validatedElection = validatedElection
+        cls._populate_jsonconfig(multiScraperObject, jsonConfig, graph)
+        jsonConfig.save()
+
+        if graph.title not in electionsByTitle:
+            multiScraperObject.listOfElections.add(jsonConfig)
+            electionsByTitle[graph.title] = jsonConfig
+
+        multiScraperObject.fileFormat = graph.fileFormat or ''
+        return jsonConfig
+
+    @classmethod
+    def _scrape_contests(cls, multiScraperObject, user, titlesToNamedTempFiles):
+        """
+        Scrapes each contest which changed since the last scrape, updating contestHashes.
+        Returns the number of contests scraped.
+        """
+        # One query for every visualization, rather than one per contest
+        electionsByTitle = {jsonConfig.title: jsonConfig
+                            for jsonConfig in multiScraperObject.listOfElections.all()}
+        electionPks = {jsonConfig.pk for jsonConfig in electionsByTitle.values()}
+
+        # Each contest's [hash, visualization pk] as of the last scrape
+        oldContestHashes = multiScraperObject.contestHashes
+        contestHashes = {}
+        numChanged = 0
+        for title, namedTempFile in titlesToNamedTempFiles.items():
+            # boto forces us to open this as rb, and it won't fail local tests
+            # since locally we don't use boto :(
+            with namedTempFile, open(namedTempFile.name, 'rb') as f:
+                contestHash = cls._hash_contest(multiScraperObject, f)
+                old = oldContestHashes.get(title)
+                if old is not None and old[0] == contestHash and old[1] in electionPks:
+                    contestHashes[title] = old
+                    continue
+
+                jsonConfig = cls._scrape_contest(multiScraperObject, user, f, title,
+                                                 electionsByTitle)
+                contestHashes[title] = [contestHash, jsonConfig.pk]
+                numChanged += 1
+
+        multiScraperObject.contestHashes = contestHashes
+        return numChanged
+
+    @classmethod
+    def multi_scrape(cls, multiScraperObject, user, getDownload=None):
         """
         May throw errors - be ready to handle them.
         Scrapes the source for a list of elections, then updates and creates any visualization
         that doesn't match the list. Will not delete outdated visualizations, in case there's
         a parsing error - we don't want to release those URLs.
+        Contests which are unchanged since the last scrape are not validated or saved again.
+        getDownload and the return value are as in scrape.
         """
         cls._assert_permissions(user)
         try:
-            fromUrl = multiScraperObject.scrapableURL
-            multiFileObject = cls.download_limited_size(fromUrl, 1024 * 1024 * 5)
-            assert multiFileObject is not None
-
-            titlesToNamedTempFiles = DMC.explode_to_files(multiFileObject)
-
-            for title, namedTempFile in titlesToNamedTempFiles.items():
-                # boto forces us to open this as rb, and it won't fail local tests
-                # since locally we don't use boto :(
-                with open(namedTempFile.name, 'rb') as f:
-                    graph = validators.try_to_load_jsons(namedTempFile, None)
-
-                    desiredFilename = f'{os.path.basename(fromUrl)}-{slugify(title)}.json'
-
-                    try:
-                        # Note: make sure you use graph.title, as it trims, to find in the db
-                        jsonConfig = multiScraperObject.listOfElections.get(title=graph.title)
-                        jsonConfig.jsonFile = File(f, desiredFilename)
-                        wasAdded = False
-                    except ObjectDoesNotExist:
-                        jsonConfig = JsonConfig(jsonFile=File(f, desiredFilename))
-                        jsonConfig.owner = user
-                        wasAdded = True
-
-                    jsonConfig.dataSourceURL = multiScraperObject.sourceURL
-                    jsonConfig.areResultsCertified = multiScraperObject.areResultsCertified
-
-                    BaseVisualizationSerializer.populate_model_with_json_data(jsonConfig, graph)
-                    cls._populate_jsonconfig(multiScraperObject, jsonConfig, graph)
-                    jsonConfig.save()
-
-                    if wasAdded:
-                        multiScraperObject.listOfElections.add(jsonConfig)
-
-            multiScraperObject.lastSuccessfulScrape = timezone.now()
-            multiScraperObject.save()
+            if getDownload is None:
+                scrapedFile = cls.download(multiScraperObject)
+            else:
+                scrapedFile = getDownload()
+            if scrapedFile.isUnchanged:
+                cls._save_scraped(multiScraperObject, scrapedFile)
+                return False
+            assert scrapedFile.fileObject is not None
+
+            titlesToNamedTempFiles = DMC.explode_to_files(scrapedFile.fileObject)
+
+            numChanged = cls._scrape_contests(multiScraperObject, user, titlesToNamedTempFiles)
+            cls._save_scraped(multiScraperObject, scrapedFile)
         except Exception as exc:  # pylint: disable=broad-except
             cls._log_and_rethrow_exception(multiScraperObject, exc)
+        return numChanged > 0
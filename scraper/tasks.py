@@ -0,0 +1,40 @@
+"""
+Long-running tasks, to be run asynchronously on a celery worker (see rcvis.celeryconfig)
+rather than in the web process, so a deploy or a restart doesn't lose them
+"""
+
+import os
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+
+from scraper.scrapeJobs import create_scrape_job, run_job
+
+
+def start_scrape_job(title, user, scrapers, returnURL, pathsToPurge=()):
+    """
+    Creates a job with scrapeJobs.create_scrape_job, and has a celery worker run it once the
+    current transaction commits, or runs it now if SCRAPE_JOBS_IN_BACKGROUND is off.
+    Returns the job.
+    """
+    job = create_scrape_job(title, user, scrapers, returnURL, pathsToPurge)
+
+    if settings.SCRAPE_JOBS_IN_BACKGROUND:
+        # pylint: disable=no-member
+        transaction.on_commit(lambda: run_scrape_job_task.delay(job.pk))
+    else:
+        run_job(job.pk)
+    return job
+
+
+def run_scrape_job_task(jobPk):
+    """ Runs the scrape job with the given primary key.
+        Turned into a @shared_task below, but doesn't work in readthedocs so it's conditional.
+        It's only acknowledged once it's done, so a job whose worker stops is run again. """
+    run_job(jobPk)
+
+
+is_read_the_docs_env = os.environ.get('READTHEDOCS') == 'True'
+if not is_read_the_docs_env:
+    run_scrape_job_task = shared_task(acks_late=True)(run_scrape_job_task)
@@ -5,22 +5,34 @@ and if somehow ScrapeWorker.scrape is called without hitting a permission check,
 an error is raised (to future-proof that dangerous function).
 """
 
+from io import StringIO
+from mock import ANY, patch
+
 from django.core.exceptions import PermissionDenied
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from requests_mock import Mocker
 from rest_framework import status
 
 from common.testUtils import TestHelpers
-from scraper.models import MultiScraper, Scraper
-from scraper.scrapeWorker import ScrapeWorker, FileTooLargeException
-from visualizer.graph.graphCreator import BadJSONError
+from electionpage.models import ScrapableElectionPage
+from scraper.models import MultiScraper, ScrapeJob, ScrapeJobStatuses, Scraper
+from scraper.scrapeJobs import run_job
+from scraper.scrapeScheduler import UNCHANGED, get_next_interval, run_due_scrapes
+from scraper.scrapeWorker import ScrapeWorker
+from visualizer import validators
+from visualizer.graph import formatSniffer
 from visualizer.models import JsonConfig
 from visualizer.tests import filenames
 
 TestHelpers.silence_logging_spam()
 
 
+# Run each scrape job within the request, so its results can be checked right away
+@override_settings(SCRAPE_JOBS_IN_BACKGROUND=False)
 class ScraperTests(TestCase):
     """ Tests for the scraper app """
 
@@ -77,10 +89,12 @@ class ScraperTests(TestCase):
         response = self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
         self.assertEqual(1, len(requestMock.request_history))
 
-        # The status must redirect us to the sucess page.
+        # The status must redirect us to the job's status page.
+        job = ScrapeJob.objects.get()
         self.assertEqual(response.status_code, status.HTTP_302_FOUND)
-        expectedRedirect = f'/viewScraper/{scraper.pk}'
-        self.assertEqual(response['location'], expectedRedirect)
+        self.assertEqual(response['location'], f'/scrapeJob/{job.pk}')
+        self.assertEqual(job.status, ScrapeJobStatuses.COMPLETE)
+        self.assertEqual(job.returnURL, f'/viewScraper/{scraper.pk}')
 
         # And the jsonconfig is filled out now
         scraper = Scraper.objects.get(pk=scraper.pk)  # refresh
@@ -115,12 +129,17 @@ class ScraperTests(TestCase):
 
         # We make the request. Assert it's called, and that lastFailedScrape is updated
         self.assertIsNone(scraper.lastFailedScrape)
-        with self.assertRaises(BadJSONError):
-            self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
 
         scraper = Scraper.objects.get(pk=scraper.pk)
         self.assertIsNotNone(scraper.lastFailedScrape)
 
+        # The job finished, recording the failure
+        job = ScrapeJob.objects.get()
+        self.assertEqual(job.status, ScrapeJobStatuses.COMPLETE)
+        self.assertEqual(job.progress[0]['status'], 'failed')
+        self.assertIn('BadJSONError', job.progress[0]['error'])
+
     @Mocker()
     def test_circumvented_scrapenow(self, requestMock):
         """ Should not be possible, but to futureproof, auth is rechecked just before scraping """
@@ -157,6 +176,82 @@ class ScraperTests(TestCase):
         self.assertNotEqual(lastSuccessfulScrape, scraper.lastSuccessfulScrape)
         self.assertEqual(3, scraper.jsonConfig.numRounds)
 
+    @Mocker()
+    def test_file_format_remembered(self, requestMock):
+        """ The file format is detected on the first scrape, and reused afterwards """
+        TestHelpers.login_with_scrape_permissions(self.client)
+        scraper = TestHelpers.make_scraper()
+        TestHelpers.mock_scraper_url_with_file(requestMock, filename=filenames.ELECTIONBUDDY)
+
+        self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        scraper = Scraper.objects.get(pk=scraper.pk)
+        self.assertEqual(scraper.fileFormat, formatSniffer.ELECTIONBUDDY)
+
+        # The file is unchanged: forget its hash, so it's validated again
+        Scraper.objects.filter(pk=scraper.pk).update(contentHash='')
+        with patch('visualizer.validators.validate_election',
+                   wraps=validators.validate_election) as mockLoad:
+            self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+            mockLoad.assert_called_once_with(ANY, None, formatSniffer.ELECTIONBUDDY)
+        scraper = Scraper.objects.get(pk=scraper.pk)
+        self.assertEqual(scraper.fileFormat, formatSniffer.ELECTIONBUDDY)
+
+        # If the format changes, the scrape still succeeds and the new format is remembered
+        TestHelpers.mock_scraper_url_with_file(requestMock, filename=filenames.THREE_ROUND)
+        self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        scraper = Scraper.objects.get(pk=scraper.pk)
+        self.assertEqual(3, scraper.jsonConfig.numRounds)
+        self.assertEqual(scraper.fileFormat, '')
+
+    @Mocker()
+    def test_unchanged_source(self, requestMock):
+        """ An unchanged source is not validated or saved again: only the scrape time changes """
+        TestHelpers.login_with_scrape_permissions(self.client)
+        scraper = TestHelpers.make_scraper()
+        with open(filenames.ONE_ROUND, 'r', encoding='utf-8') as f:
+            data = f.read()
+        requestMock.get('mock://scrape', text=data, headers={'ETag': '"v1"'})
+        self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        scraper = Scraper.objects.get(pk=scraper.pk)
+        self.assertEqual(scraper.etag, '"v1"')
+        self.assertNotEqual(scraper.contentHash, '')
+
+        def scrape_and_assert_unchanged():
+            lastSuccessfulScrape = Scraper.objects.get(pk=scraper.pk).lastSuccessfulScrape
+            with patch('visualizer.validators.validate_election') as mockLoad, \
+                    patch('common.cloudflare.invalidate_paths') as mockInvalidate:
+                self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+                mockLoad.assert_not_called()
+                mockInvalidate.assert_not_called()
+            self.assertTrue(ScrapeJob.objects.latest('pk').progress[0]['isUnchanged'])
+            self.assertGreater(Scraper.objects.get(pk=scraper.pk).lastSuccessfulScrape,
+                               lastSuccessfulScrape)
+
+        # The server says it's not modified
+        requestMock.get('mock://scrape', status_code=304, headers={'ETag': '"v1"'},
+                        request_headers={'If-None-Match': '"v1"'})
+        scrape_and_assert_unchanged()
+
+        # ...without repeating the validators, which are kept for the next scrape
+        requestMock.get('mock://scrape', status_code=304,
+                        request_headers={'If-None-Match': '"v1"'})
+        scrape_and_assert_unchanged()
+        self.assertEqual(Scraper.objects.get(pk=scraper.pk).etag, '"v1"')
+
+        # The server ignores the conditional request, but the content's hash is the same
+        requestMock.get('mock://scrape', text=data)
+        scrape_and_assert_unchanged()
+        self.assertEqual(requestMock.last_request.headers['If-None-Match'], '"v1"')
+
+        # When the scraper's settings change, the election is updated without a condition
+        scraper = Scraper.objects.get(pk=scraper.pk)
+        scraper.areResultsCertified = True
+        scraper.save()
+        self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        self.assertNotIn('If-None-Match', requestMock.last_request.headers)
+        self.assertTrue(TestHelpers.get_latest_upload().areResultsCertified)
+        self.assertFalse(ScrapeJob.objects.latest('pk').progress[0]['isUnchanged'])
+
     @Mocker()
     def test_fails_when_file_too_large(self, requestMock):
         """ Don't allow streaming giant files """
@@ -166,11 +261,12 @@ class ScraperTests(TestCase):
         tooLargeJson = TestHelpers.generate_random_valid_json_of_size(1024 * 1024 * 2)  # 2 MB
         TestHelpers.mock_scraper_url_with_file(requestMock, filename=tooLargeJson)
 
-        # We should have better handling than just exceptions, but this is
-        # limited to admins, so...it's fine for now.
-        # (Let's be real, it'll probably be "fine" forever. Sorry, future traveler.)
-        with self.assertRaises(FileTooLargeException):
-            self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        # The job records the failure
+        self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        job = ScrapeJob.objects.get()
+        self.assertEqual(job.progress[0]['status'], 'failed')
+        self.assertIn('FileTooLargeException', job.progress[0]['error'])
+        self.assertIsNotNone(Scraper.objects.get(pk=scraper.pk).lastFailedScrape)
 
     @Mocker()
     def test_multi_scraper(self, requestMock):
@@ -198,3 +294,205 @@ class ScraperTests(TestCase):
         # When scraping again, it updates instead of adding
         self.client.get(reverse('multiScrapeNow', args=(scraper.pk,)))
         self.assertEqual(JsonConfig.objects.count(), 25)
+
+    @Mocker()
+    def test_multi_scraper_skips_unchanged_contests(self, requestMock):
+        """ Only the contests which changed since the last scrape are validated and saved """
+        TestHelpers.login_with_scrape_permissions(self.client)
+        scraper = TestHelpers.make_multi_scraper()
+        TestHelpers.mock_scraper_url_with_file(
+            requestMock,
+            url=scraper.scrapableURL,
+            filename=filenames.MULTI_SCRAPE)
+        self.client.get(reverse('multiScrapeNow', args=(scraper.pk,)))
+        scraper = MultiScraper.objects.get(pk=scraper.pk)
+        self.assertEqual(len(scraper.contestHashes), 25)
+
+        def scrape_and_count_validations():
+            # Forget the whole file's hash, so each contest's is checked
+            MultiScraper.objects.filter(pk=scraper.pk).update(contentHash='')
+            with patch('visualizer.validators.validate_election',
+                       wraps=validators.validate_election) as mockLoad:
+                self.client.get(reverse('multiScrapeNow', args=(scraper.pk,)))
+            return mockLoad.call_count
+
+        # Nothing changed
+        self.assertEqual(scrape_and_count_validations(), 0)
+        self.assertTrue(ScrapeJob.objects.latest('pk').progress[0]['isUnchanged'])
+
+        # A contest whose visualization is gone is scraped again
+        removed = scraper.listOfElections.first()
+        scraper.listOfElections.remove(removed)
+        self.assertEqual(scrape_and_count_validations(), 1)
+        self.assertEqual(scraper.listOfElections.count(), 25)
+        self.assertFalse(scraper.listOfElections.filter(pk=removed.pk).exists())
+
+        # Changing the scraper's settings updates every contest
+        scraper = MultiScraper.objects.get(pk=scraper.pk)
+        scraper.areResultsCertified = True
+        scraper.save()
+        self.assertEqual(scrape_and_count_validations(), 25)
+        self.assertFalse(scraper.listOfElections.filter(areResultsCertified=False).exists())
+
+    @Mocker()
+    def test_scrape_job(self, requestMock):
+        """ Scrape jobs report their progress, and purge the cache once when they finish """
+        user = TestHelpers.login_with_scrape_permissions(self.client)
+        TestHelpers.give_auth(user, 'view_scraper')
+        TestHelpers.mock_scraper_url_with_file(requestMock)
+        TestHelpers.mock_scraper_url_with_file(requestMock, "mock://bad-url", filenames.BAD_DATA)
+        electionPage = ScrapableElectionPage.objects.create(title="Page", slug="page",
+                                                            date="2020-01-01")
+        for _ in range(3):
+            electionPage.listOfScrapers.add(TestHelpers.make_scraper())
+        badScraper = electionPage.listOfScrapers.all()[0]
+        badScraper.scrapableURL = "mock://bad-url"
+        badScraper.save()
+
+        response = self.client.get(reverse('scrapeAll', args=(electionPage.slug,)))
+        job = ScrapeJob.objects.get()
+        self.assertEqual(response['location'], f'/scrapeJob/{job.pk}')
+        self.assertEqual(len(requestMock.request_history), 3)
+
+        # Scraping new data updates both elections: one purge, with the page and both elections
+        TestHelpers.mock_scraper_url_with_file(requestMock, filename=filenames.THREE_ROUND)
+        with patch('common.cloudflare.invalidate_paths') as mockInvalidate:
+            self.client.get(reverse('scrapeAll', args=(electionPage.slug,)))
+        job = ScrapeJob.objects.latest('pk')
+        mockInvalidate.assert_called_once()
+        purgedPaths = mockInvalidate.call_args[0][0]
+        self.assertIn('/pv/page', purgedPaths)
+        for jsonConfig in JsonConfig.objects.all():
+            self.assertIn(f'/v/{jsonConfig.slug}', purgedPaths)
+
+        # The progress, as JSON and on the status page
+        progress = self.client.get(reverse('scrapeJobProgress', args=(job.pk,))).json()
+        self.assertEqual(progress['status'], 'Complete')
+        self.assertTrue(progress['isFinished'])
+        self.assertEqual(progress['numSucceeded'], 2)
+        self.assertEqual(progress['numFailed'], 1)
+        response = self.client.get(reverse('viewScrapeJob', args=(job.pk,)))
+        self.assertContains(response, 'alert-primary', count=2)
+        self.assertContains(response, 'alert-warning', count=1)
+        self.assertNotContains(response, 'http-equiv="refresh"')
+
+        # In the background, the job is queued until the request's transaction commits
+        with self.settings(SCRAPE_JOBS_IN_BACKGROUND=True), \
+                self.captureOnCommitCallbacks() as callbacks:
+            self.client.get(reverse('scrapeAll', args=(electionPage.slug,)))
+        self.assertEqual(len(callbacks), 1)
+        job = ScrapeJob.objects.latest('pk')
+        self.assertEqual(job.status, ScrapeJobStatuses.QUEUED)
+        self.assertContains(self.client.get(reverse('viewScrapeJob', args=(job.pk,))),
+                            'http-equiv="refresh"')
+
+        # ...then sent to a celery worker, which runs it
+        with patch('scraper.tasks.run_scrape_job_task.delay') as mockDelay:
+            callbacks[0]()
+        mockDelay.assert_called_once_with(job.pk)
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScrapeJobStatuses.COMPLETE)
+        self.assertIsNotNone(job.finishedAt)
+
+    @Mocker()
+    def test_abandoned_scrape_job(self, requestMock):
+        """ A job lost with its process fails once it's too old, and then stops refreshing """
+        user = TestHelpers.login_with_scrape_permissions(self.client)
+        TestHelpers.give_auth(user, 'view_scraper')
+        TestHelpers.mock_scraper_url_with_file(requestMock)
+        scraper = TestHelpers.make_scraper()
+
+        with self.settings(SCRAPE_JOBS_IN_BACKGROUND=True), self.captureOnCommitCallbacks():
+            self.client.get(reverse('scrapeNow', args=(scraper.pk,)))
+        job = ScrapeJob.objects.get()
+        self.assertFalse(self.client.get(reverse('scrapeJobProgress', args=(job.pk,)))
+                         .json()['isFinished'])
+
+        with self.settings(SCRAPE_JOB_TIMEOUT=0):
+            progress = self.client.get(reverse('scrapeJobProgress', args=(job.pk,))).json()
+        self.assertEqual(progress['status'], 'Failed')
+        self.assertTrue(progress['isFinished'])
+        self.assertEqual(progress['numFailed'], 1)
+        self.assertNotContains(self.client.get(reverse('viewScrapeJob', args=(job.pk,))),
+                               'http-equiv="refresh"')
+
+        # Nothing runs it later
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScrapeJobStatuses.FAILED)
+        self.assertEqual(len(requestMock.request_history), 0)
+
+    @Mocker()
+    def test_scrape_scheduler(self, requestMock):
+        """ Scheduled scrapers back off until the results change, and stop once certified """
+        user = TestHelpers.login_with_scrape_permissions(self.client)
+        TestHelpers.mock_scraper_url_with_file(requestMock)
+        scraper = TestHelpers.make_scraper()
+        scraper.pollInterval = 60
+        scraper.save()
+        scraperPk = scraper.pk
+        unscheduledScraper = TestHelpers.make_scraper()
+
+        def scrape_when_due_and_get_interval():
+            # Make it due now
+            Scraper.objects.filter(pk=scraperPk).update(nextScheduledScrape=timezone.now())
+            self.assertIsNotNone(run_due_scrapes(user, timezone.now()))
+            # Nothing more is due until the next interval has passed
+            self.assertIsNone(run_due_scrapes(user, timezone.now()))
+            return Scraper.objects.get(pk=scraperPk).currentPollInterval
+
+        # New results, then unchanged results back off, failures back off further
+        self.assertEqual(scrape_when_due_and_get_interval(), 60)
+        self.assertEqual(scrape_when_due_and_get_interval(), 90)
+        self.assertEqual(scrape_when_due_and_get_interval(), 135)
+        requestMock.get('mock://scrape', status_code=500, text='Server error')
+        self.assertEqual(scrape_when_due_and_get_interval(), 270)
+
+        # Changing results are polled quickly again
+        TestHelpers.mock_scraper_url_with_file(requestMock, filename=filenames.THREE_ROUND)
+        self.assertEqual(scrape_when_due_and_get_interval(), 60)
+
+        # The interval is capped
+        scraper = Scraper.objects.get(pk=scraper.pk)
+        scraper.currentPollInterval = 3000
+        with self.settings(SCRAPE_SCHEDULER_MAX_INTERVAL=3600):
+            self.assertEqual(get_next_interval(scraper, UNCHANGED), 3600)
+
+        # Once certified results have been scraped, it's no longer scheduled
+        scraper.areResultsCertified = True
+        scraper.save()
+        scrape_when_due_and_get_interval()
+        scraper = Scraper.objects.get(pk=scraper.pk)
+        self.assertIsNone(scraper.pollInterval)
+        self.assertTrue(scraper.jsonConfig.areResultsCertified)
+
+        self.assertIsNone(Scraper.objects.get(pk=unscheduledScraper.pk).lastSuccessfulScrape)
+
+    @Mocker()
+    def test_scrape_scheduler_command(self, requestMock):
+        """ The command scrapes scheduled election pages """
+        user = TestHelpers.login_with_scrape_permissions(self.client)
+        TestHelpers.mock_scraper_url_with_file(requestMock)
+        electionPage = ScrapableElectionPage.objects.create(title="Page", slug="page",
+                                                            date="2020-01-01", pollInterval=30)
+        for _ in range(2):
+            electionPage.listOfScrapers.add(TestHelpers.make_scraper())
+
+        with self.assertRaises(CommandError):
+            call_command('runScrapeScheduler', '--user', 'nobody', '--once')
+
+        # Without a user, or a cache shared with the web processes, it doesn't run
+        with self.settings(SCRAPE_SCHEDULER_USER=None):
+            call_command('runScrapeScheduler', '--once')
+        with self.settings(IS_CACHE_SHARED=False), self.assertRaises(CommandError):
+            call_command('runScrapeScheduler', '--user', user.username, '--once')
+        self.assertEqual(len(requestMock.request_history), 0)
+
+        out = StringIO()
+        with self.settings(SCRAPE_SCHEDULER_USER=user.username):
+            call_command('runScrapeScheduler', '--once', stdout=out)
+        self.assertIn("Scraped 2 sources: 2 changed, 0 unchanged, 0 failed", out.getvalue())
+        electionPage = ScrapableElectionPage.objects.get(pk=electionPage.pk)
+        self.assertEqual(electionPage.currentPollInterval, 30)
+        self.assertGreater(electionPage.nextScheduledScrape, timezone.now())
@@ -26,4 +26,14 @@ urlpatterns = [
         never_cache(
             views.MultiScrapeNow.as_view()),
         name='multiScrapeNow'),
+    path(
+        'scrapeJob/<pk>',
+        never_cache(
+            views.ViewScrapeJob.as_view()),
+        name='viewScrapeJob'),
+    path(
+        'scrapeJob/<pk>/progress',
+        never_cache(
+            views.ScrapeJobProgress.as_view()),
+        name='scrapeJobProgress'),
 ]
@@ -5,12 +5,14 @@ Scraper views:
 All of these are limited to authorized users.
 """
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.views.generic.detail import DetailView
 
-from scraper.models import MultiScraper, Scraper
-from scraper.scrapeWorker import ScrapeWorker
+from scraper.models import MultiScraper, ScrapeJob, Scraper
+from scraper.scrapeJobs import fail_if_abandoned
+from scraper.tasks import start_scrape_job
 
 
 class ViewScraper(PermissionRequiredMixin, DetailView):
@@ -28,34 +30,60 @@ class ViewMultiScraper(PermissionRequiredMixin, DetailView):
 
 
 class ScrapeNow(PermissionRequiredMixin, DetailView):
-    """ Runs the single scraper """
+    """ Runs the single scraper, in the background """
     model = Scraper
-    template_name = 'scraper/scrapeNow.html'
     permission_required = ['scraper.add_scraper', 'scraper.change_scraper']
 
     def get(self, *args, **kwargs):
         scraperObject = self.get_object()
-        user = self.request.user
-
-        # This may fail - that's okay, we want to hear all the errors
-        # in our logging. Eventually, come up with nicer error handling.
-        ScrapeWorker.scrape(scraperObject, user)
-
-        return redirect(reverse('viewScraper', kwargs=kwargs))
+        job = start_scrape_job(scraperObject.scrapableURL, self.request.user, [scraperObject],
+                               returnURL=reverse('viewScraper', kwargs=kwargs))
+        return redirect(job)
 
 
 class MultiScrapeNow(PermissionRequiredMixin, DetailView):
-    """ Runs the single scraper """
+    """ Runs the multi scraper, in the background """
     model = MultiScraper
-    template_name = 'scraper/scrapeNow.html'
     permission_required = ['scraper.add_scraper', 'scraper.change_scraper']
 
     def get(self, *args, **kwargs):
         scraperObject = self.get_object()
-        user = self.request.user
+        job = start_scrape_job(scraperObject.scrapableURL, self.request.user, [scraperObject],
+                               returnURL=reverse('viewMultiScraper', kwargs=kwargs))
+        return redirect(job)
+
+
+class ScrapeJobMixin(PermissionRequiredMixin):  # pylint: disable=too-few-public-methods
+    """ Reads a scrape job, failing it first if it was abandoned """
+    model = ScrapeJob
+    permission_required = 'scraper.view_scraper'
+
+    def get_object(self, queryset=None):
+        """ The job, failed if it was abandoned """
+        job = super().get_object(queryset)
+        fail_if_abandoned(job)
+        return job
 
-        # This may fail - that's okay, we want to hear all the errors
-        # in our logging. Eventually, come up with nicer error handling.
-        ScrapeWorker.multi_scrape(scraperObject, user)
 
-        return redirect(reverse('viewMultiScraper', kwargs=kwargs))
+class ViewScrapeJob(ScrapeJobMixin, DetailView):
+    """ The progress of a scrape job, refreshing until it's finished """
+    template_name = 'scraper/scrapeJob.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['isFinished'] = self.object.finishedAt is not None
+        return context
+
+
+class ScrapeJobProgress(ScrapeJobMixin, DetailView):
+    """ The progress of a scrape job, as JSON """
+
+    def get(self, *args, **kwargs):
+        job = self.get_object()
+        return JsonResponse({
+            'status': job.get_status_display(),
+            'isFinished': job.finishedAt is not None,
+            'numSucceeded': sum(e['status'] == 'succeeded' for e in job.progress),
+            'numFailed': sum(e['status'] == 'failed' for e in job.progress),
+            'progress': job.progress,
+        })
@@ -42,6 +42,8 @@ elif [ "$CI_NODE_TOTAL" -eq 3 ]; then
 
     echo "Starting tests"
     $RUN test visualizer.tests.testBallotpediaRestApi\
+              visualizer.tests.testBenchmark\
+              visualizer.tests.testCache\
               visualizer.tests.testDataTables\
               visualizer.tests.testDataTablesHeadlessBrowser\
               visualizer.tests.testFaq\
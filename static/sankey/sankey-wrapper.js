@@ -1,4 +1,11 @@
-function makeSankey(graph, numRounds, numCandidates, longestLabelApxWidth, totalVotesPerRound, colorThemeIndex) {
+function makeSankey(sankeyData, colorThemeIndex) {
+  // sankeyData is the JSON from D3Sankey
+  const graph = sankeyData.graph;
+  const numRounds = sankeyData.numRounds;
+  const numCandidates = sankeyData.numCandidates;
+  const longestLabelApxWidth = sankeyData.longestLabelApxWidth;
+  const totalVotesPerRound = sankeyData.totalVotesPerRound;
+
   // Below are crazy heuristics to try to get the graph to look good
   // on a variety of sizes.
   const units = "Votes";
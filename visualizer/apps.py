@@ -0,0 +1,15 @@
+""" visualizer app to connect signal """
+
+from django.apps import AppConfig
+
+
+class VisualizerAppConfig(AppConfig):
+    """
+    Use this instead of just "visualizer" in rcvis/settings to
+    ensure the signal is created once and only once.
+    """
+    name = 'visualizer'
+
+    def ready(self):
+        # pylint: disable=unused-import,import-outside-toplevel
+        import visualizer.signal
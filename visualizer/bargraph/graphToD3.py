@@ -1,19 +1,22 @@
-import json
+""" Creates the data for the d3 bar graph """
 
-from visualizer.jsUtils import approx_length
+from visualizer.jsUtils import approx_length, to_inline_json
 
 
-class D3Bargraph:
-    js: str  # We just...throw all the javascript into here
+class D3Bargraph:  # pylint: disable=too-few-public-methods
+    """
+    The arguments for makeBarGraph in barchart.js: data is a JSON-serializable dict,
+    and json is that dict serialized once, ready to embed in the page.
+    """
 
-    def __init__(self, graph):
+    def __init__(self, graph):  # pylint: disable=too-many-locals
         numRounds = len(graph.nodesPerRound)
 
         # Summarize the graph into rounds and candidate sums
         summary = graph.summarize()
         candidates = summary.candidates
         rounds = summary.rounds
-        assert (len(rounds) == numRounds)
+        assert len(rounds) == numRounds
 
         # Convert the candidates structure to one for the javascript:
         # A list of dictionaries, each dict mapping a label to a vote count
@@ -36,37 +39,39 @@ class D3Bargraph:
             for winner in r.winnerNames:
                 numRoundsTilWin[winner] = r.round_i
 
-        longestLabelApxWidth = max([approx_length(n.label)
-                                    for n in graph.nodesPerRound[0].values()])
+        longestLabelApxWidth = max(approx_length(n.label)
+                                   for n in graph.nodesPerRound[0].values())
 
-        js = f'var candidateVoteCounts = {candidatesJs};'
-        js += f'\nvar humanFriendlyRoundNames = {json.dumps(list(roundLabels))};'
-        js += f'\nvar threshold = {json.dumps(graph.threshold)};'
-        js += f'\nvar longestLabelApxWidth = {json.dumps(longestLabelApxWidth)};'
-        js += f'\nvar totalVotesPerRound = {json.dumps(totalVotesPerRound)};'
-        js += f'\nvar numRoundsTilWin = {json.dumps(numRoundsTilWin)};'
-        self.js = js
+        self.data = {
+            'candidateVoteCounts': candidatesJs,
+            'humanFriendlyRoundNames': roundLabels,
+            'threshold': graph.threshold,
+            'longestLabelApxWidth': longestLabelApxWidth,
+            'totalVotesPerRound': totalVotesPerRound,
+            'numRoundsTilWin': numRoundsTilWin,
+        }
+        self.json = to_inline_json(self.data)
 
 
 def get_label_for(rounds, i):
+    """ The label for round i in the legend, listing who won and who was eliminated """
     roundInfo = rounds[i]
 
-    def getStringFor(nameList):
+    def get_string_for(nameList):
         if len(nameList) == 0:
             return ''
-        elif len(nameList) <= 3:
+        if len(nameList) <= 3:
             return ' & '.join(nameList)
-        else:
-            return f' ({len(nameList)} candidates)'
+        return f' ({len(nameList)} candidates)'
 
-    winStr = getStringFor(roundInfo.winnerNames)
+    winStr = get_string_for(roundInfo.winnerNames)
 
     if i < len(rounds) - 1:
         # Note: candidates eliminated on the next round are
         # visualized on this round, so match the legend to that
         # (Do you hate this? I hate this)
         nextRound = rounds[i + 1]
-        elimStr = getStringFor(nextRound.eliminatedNames)
+        elimStr = get_string_for(nextRound.eliminatedNames)
     else:
         elimStr = ''
 
@@ -0,0 +1,159 @@
+"""
+Times each stage of turning an election file into the data for the visualize view
+(the same work as get_data_for_view), and measures the peak memory of each stage.
+
+Results can be saved as a baseline and later runs compared against it,
+so changes which make page generation slower show up as regressions.
+"""
+
+from io import StringIO
+import json
+import time
+import tracemalloc
+
+from common.viewUtils import DefaultConfig, LazyViewData, add_data_for_round_describer
+from visualizer.bargraph.graphToD3 import D3Bargraph
+from visualizer.benchmark.syntheticElection import generate_election
+from visualizer.graph import readRCVRCJSON
+from visualizer.graph.graphCreator import load_reader_with_file, make_graph_with_reader
+from visualizer.sankey.graphToD3 import D3Sankey
+from visualizer.tabular.tabular import TabulateByRoundInteractive,\
+    TabulateByRound,\
+    TabulateByCandidate,\
+    SingleTableSummary
+
+# The elections to benchmark by default: the arguments to generate_election
+SCENARIOS = {
+    'small': {'numCandidates': 10},
+    'multiwinner': {'numCandidates': 30, 'numWinners': 5},
+    'batch': {'numCandidates': 200, 'numWinners': 3, 'numRounds': 10},
+    'manyRounds': {'numCandidates': 150},
+    'large': {'numCandidates': 1000, 'numRounds': 30},
+}
+
+# Slowdowns smaller than this are noise, no matter the percentage
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def _stages(jsonText, config):
+    """
+    Returns a list of (stageName, function) for each stage, in order.
+    Each function takes the output of the previous one (the first takes nothing).
+    Parsing includes migrating the data and creating the graph; summarizing includes
+    setting the elimination order.
+    """
+    def parse(_):
+        return load_reader_with_file(StringIO(jsonText))
+
+    def summarize(readerAndData):
+        jsonReader, jsonData = readerAndData
+        return make_graph_with_reader(jsonReader, jsonData,
+                                      config.excludeFinalWinnerAndEliminatedCandidate)
+
+    def bargraph(graph):
+        D3Bargraph(graph)
+        return graph
+
+    def sankey(graph):
+        D3Sankey(graph)
+        return graph
+
+    def tabular(graph):
+        TabulateByCandidate(graph, config)
+        SingleTableSummary(graph)
+        TabulateByRound(graph)
+        TabulateByRoundInteractive(graph, config)
+        return graph
+
+    def describer(graph):
+        add_data_for_round_describer(LazyViewData(), graph, config)
+        return graph
+
+    return [('parse', parse), ('summarize', summarize), ('bargraph', bargraph),
+            ('sankey', sankey), ('tabular', tabular), ('describer', describer)]
+
+
+def measure_stage(function, stageInput, measureMemory):
+    """
+    Runs function(stageInput). Returns its output and the seconds it took or, if
+    measureMemory, its peak memory in bytes (tracemalloc must have been started).
+    """
+    if measureMemory:
+        tracemalloc.reset_peak()
+        startMemory = tracemalloc.get_traced_memory()[0]
+        output = function(stageInput)
+        return output, tracemalloc.get_traced_memory()[1] - startMemory
+
+    startTime = time.perf_counter()
+    output = function(stageInput)
+    return output, time.perf_counter() - startTime
+
+
+def _run_once(jsonText, config, measureMemory):
+    """ Runs every stage once. Returns a dict of stageName to seconds or to peak bytes. """
+    # Don't let the migration fingerprints from the previous run skip the migrations
+    readRCVRCJSON.clear_clean_fingerprints()
+
+    results = {}
+    output = None
+    for stageName, function in _stages(jsonText, config):
+        output, results[stageName] = measure_stage(function, output, measureMemory)
+    return results
+
+
+def benchmark_json(jsonText, numRepeats=3, config=None):
+    """
+    Benchmarks the election in jsonText. Returns a dict mapping each stage (and 'total')
+    to a dict with the fastest 'seconds' over numRepeats runs and the 'peakMemory' in bytes.
+    """
+    if config is None:
+        config = DefaultConfig()
+
+    timings = [_run_once(jsonText, config, measureMemory=False) for _ in range(numRepeats)]
+
+    # Measure memory separately: tracing slows everything down
+    tracemalloc.start()
+    try:
+        memory = _run_once(jsonText, config, measureMemory=True)
+    finally:
+        tracemalloc.stop()
+
+    results = {}
+    for stageName, peakMemory in memory.items():
+        results[stageName] = {
+            'seconds': min(t[stageName] for t in timings),
+            'peakMemory': peakMemory,
+        }
+    results['total'] = {
+        'seconds': min(sum(t.values()) for t in timings),
+        'peakMemory': max(memory.values()),
+    }
+    return results
+
+
+def benchmark_scenario(scenario, numRepeats=3, seed=0):
+    """ Generates the election for the scenario (a dict of arguments to generate_election)
+        and benchmarks it. See benchmark_json. """
+    jsonText = json.dumps(generate_election(seed=seed, **scenario))
+    return benchmark_json(jsonText, numRepeats)
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compares results against the baseline: both map scenario names to benchmark results.
+    Returns a list of (scenarioName, stageName, baselineSeconds, seconds) for each stage
+    that is more than tolerance (e.g. 0.25 for 25%) slower than its baseline.
+    Scenarios or stages missing from the baseline are skipped.
+    """
+    regressions = []
+    for scenarioName, stages in results.items():
+        baselineStages = baseline.get(scenarioName, {})
+        for stageName, result in stages.items():
+            if stageName not in baselineStages:
+                continue
+            baselineSeconds = baselineStages[stageName]['seconds']
+            seconds = result['seconds']
+            if seconds > baselineSeconds * (1 + tolerance) and \
+                    seconds - baselineSeconds > MIN_REGRESSION_SECONDS:
+                regressions.append((scenarioName, stageName, baselineSeconds, seconds))
+    return regressions
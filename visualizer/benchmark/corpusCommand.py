@@ -0,0 +1,102 @@
+"""
+The shared parts of the management commands which check a corpus of election files:
+see corpusRunner.
+"""
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from visualizer.benchmark.corpusRunner import diff_reports, make_report, run_corpus
+
+
+class CorpusCommand(BaseCommand):  # pylint: disable=abstract-method
+    """
+    A management command which checks a corpus. Subclasses add their own arguments
+    (calling super), and call check_corpus from handle.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='How many processes to load files with. Default: one per CPU')
+        parser.add_argument('--report', type=str, default=None,
+                            help='Save a JSON report of the timings and failures to this file')
+        parser.add_argument('--compare', type=str, default=None,
+                            help='A report from an earlier run: list the files which now '
+                                 'fail or got slower')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='With --compare, list files this much slower (0.25 = 25%%)')
+        parser.add_argument('--slowest', type=int, default=20,
+                            help='How many of the slowest files to include in the report')
+
+    def check_corpus(self, items, options, successMessage):
+        """
+        Checks every item, printing each result as it finishes, then the report,
+        and fails if any file failed or, with --compare, got slower
+        """
+        if options['compare'] and not os.path.exists(options['compare']):
+            raise CommandError(f"No report at {options['compare']}")
+
+        results = run_corpus(items, options['workers'], self._write_result)
+        report = make_report(results, options['slowest'])
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved report to {options['report']}")
+
+        self._write_slowest(report)
+
+        numRegressions = 0
+        if options['compare']:
+            with open(options['compare'], 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            numRegressions = self._write_diff(diff_reports(baseline, report,
+                                                           options['tolerance']))
+
+        if report['numFailures']:
+            for exceptionType, failures in report['failuresByType'].items():
+                self.stdout.write(self.style.ERROR(f"{len(failures)} failed with {exceptionType}"))
+            raise CommandError(f"Could not load {report['numFailures']} "
+                               f"of {report['numFiles']} files")
+        if numRegressions:
+            raise CommandError(f"{numRegressions} files got slower")
+        self.stdout.write(self.style.SUCCESS(successMessage))
+
+    def _write_result(self, result):
+        """ Prints one line for each file """
+        prefix = '' if result['index'] is None else f"{result['index']}: "
+        if result['success']:
+            megabytes = result['peakMemory'] / 1024 / 1024
+            self.stdout.write(self.style.SUCCESS(
+                f"{prefix}Successfully loaded {result['name']} "
+                f"({result['seconds'] * 1000:.0f} ms, {megabytes:.1f} MB)"))
+        else:
+            error = result['error']
+            self.stdout.write(self.style.ERROR(
+                f"{prefix}Could not load {result['name']} while in {error['stage']}: "
+                f"{error['type']}: {error['message']}"))
+
+    def _write_slowest(self, report):
+        """ Prints the slowest files """
+        if not report['slowest']:
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest files"))
+        for result in report['slowest']:
+            self.stdout.write(f"  {result['seconds'] * 1000:10.1f} ms"
+                              f" {result['peakMemory'] / 1024 / 1024:8.1f} MB  {result['name']}")
+
+    def _write_diff(self, diff):
+        """ Prints the differences from the earlier report. Returns the number of regressions. """
+        for name in diff['newFailures']:
+            self.stdout.write(self.style.ERROR(f"Newly failing: {name}"))
+        for name in diff['fixed']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed: {name}"))
+        for name, baselineSeconds, seconds in diff['slower']:
+            self.stdout.write(self.style.ERROR(
+                f"Slower: {name}: {baselineSeconds * 1000:.1f} ms -> {seconds * 1000:.1f} ms"))
+        if diff['added'] or diff['removed']:
+            self.stdout.write(f"{len(diff['added'])} files are new since the earlier report, "
+                              f"{len(diff['removed'])} are missing")
+        return len(diff['newFailures']) + len(diff['slower'])
@@ -0,0 +1,226 @@
+"""
+Loads a corpus of election files (uploads, or a local directory) in parallel, to check
+they can all still be visualized and to find the slow ones. Used by the checkUploads and
+checkLocalFiles management commands.
+
+Each file is parsed, turned into a graph, and rendered (every visualization computed),
+timing and measuring the peak memory of each of those stages. Failures are recorded and
+the run continues. The results make a JSON report, which can be compared with the report
+of an earlier run to find new failures and slowdowns.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+import tracemalloc
+
+import django
+from django.db import connections
+
+from common.viewUtils import get_data_for_graph
+from visualizer.benchmark.benchmarkRunner import MIN_REGRESSION_SECONDS, measure_stage
+from visualizer.graph import readRCVRCJSON
+from visualizer.graph.graphCreator import load_reader_with_file, make_graph_with_reader
+from visualizer.sidecar.reader import SidecarReader
+
+# The stages of loading each file, in order
+STAGES = ('parse', 'graph', 'render')
+
+# Every report has this format version
+REPORT_VERSION = 1
+
+
+def make_item(name, content, config, sidecarContent=None, index=None):
+    """
+    An item of the corpus: the file's content (bytes), the config to render it with
+    (e.g. a DefaultConfig: it is sent to another process, so not a model),
+    and the content of its candidate sidecar file, if any
+    """
+    return {'name': name, 'index': index, 'content': content,
+            'sidecarContent': sidecarContent, 'config': config}
+
+
+def make_unreadable_item(name, exc, index=None):
+    """ An item whose file could not even be read: it fails in the 'read' stage """
+    return {'name': name, 'index': index,
+            'readError': {'type': type(exc).__name__, 'message': str(exc), 'stage': 'read'}}
+
+
+class StageError(Exception):
+    """ A stage of loading a file failed: its cause is the exception it raised """
+
+    def __init__(self, stageName):
+        super().__init__(stageName)
+        self.stageName = stageName
+
+
+def _stages(item):
+    """ Returns a list of (stageName, function) like benchmarkRunner._stages """
+    config = item['config']
+
+    def parse(_):
+        return load_reader_with_file(BytesIO(item['content']))
+
+    def make_graph(readerAndData):
+        jsonReader, jsonData = readerAndData
+        graph = make_graph_with_reader(jsonReader, jsonData,
+                                       config.excludeFinalWinnerAndEliminatedCandidate)
+        if item['sidecarContent'] is not None:
+            sidecar = SidecarReader(BytesIO(item['sidecarContent']))
+            graph.set_elimination_order(graph.get_items_for_names(sidecar.data['order']))
+        return graph
+
+    def render(graph):
+        get_data_for_graph(graph, config).compute_all()
+
+    return [('parse', parse), ('graph', make_graph), ('render', render)]
+
+
+def _run_once(item, measureMemory):
+    """
+    Runs every stage once. Returns a dict of stageName to seconds or to peak bytes.
+    Raises a StageError if a stage fails.
+    """
+    # Don't let the migration fingerprints of an earlier run skip the migrations
+    readRCVRCJSON.clear_clean_fingerprints()
+
+    results = {}
+    output = None
+    for stageName, function in _stages(item):
+        try:
+            output, results[stageName] = measure_stage(function, output, measureMemory)
+        except Exception as exc:
+            raise StageError(stageName) from exc
+    return results
+
+
+def check_item(item):
+    """
+    Loads one item of the corpus, once timed and once measuring memory.
+    Returns its result: a dict with the 'seconds' and 'peakMemory' of each stage
+    and in total, or the 'error' (type, message and stage) which stopped it.
+    """
+    result = {'name': item['name'], 'index': item['index'], 'success': False, 'error': None}
+    if 'readError' in item:
+        result['error'] = item['readError']
+        return result
+
+    try:
+        timings = _run_once(item, measureMemory=False)
+
+        # Measure memory separately: tracing slows everything down
+        tracemalloc.start()
+        try:
+            memory = _run_once(item, measureMemory=True)
+        finally:
+            tracemalloc.stop()
+    except StageError as exc:
+        cause = exc.__cause__
+        result['error'] = {'type': type(cause).__name__,
+                           'message': str(cause),
+                           'stage': exc.stageName}
+        return result
+
+    result['success'] = True
+    result['stages'] = {name: {'seconds': timings[name], 'peakMemory': memory[name]}
+                        for name in STAGES}
+    result['seconds'] = sum(timings.values())
+    result['peakMemory'] = max(memory.values())
+    return result
+
+
+def run_corpus(items, numWorkers=1, onResult=None):
+    """
+    Checks each item with check_item, with numWorkers processes (or in this process if 1).
+    items may be a generator: only a few items per worker are read ahead.
+    Calls onResult(result) as each finishes. Returns the list of results.
+    """
+    results = []
+
+    def on_done(result):
+        results.append(result)
+        if onResult:
+            onResult(result)
+
+    if numWorkers <= 1:
+        for item in items:
+            on_done(check_item(item))
+        return results
+
+    # Don't share this process's database connections with the workers. Start every
+    # worker now, before anything (such as reading the items) opens a new connection.
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=numWorkers, initializer=django.setup) as executor:
+        executor.submit(int).result()
+
+        pending = set()
+        for item in items:
+            if len(pending) >= numWorkers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    on_done(future.result())
+            pending.add(executor.submit(check_item, item))
+
+        for future in wait(pending).done:
+            on_done(future.result())
+    return results
+
+
+def make_report(results, numSlowest=20):
+    """
+    Summarizes the results: the numSlowest slowest files, the failures grouped by the type of
+    their exception, and every file's result by name. It can be saved as JSON.
+    """
+    successes = [r for r in results if r['success']]
+    failures = [r for r in results if not r['success']]
+
+    failuresByType = {}
+    for result in sorted(failures, key=lambda r: r['name']):
+        failuresByType.setdefault(result['error']['type'], []).append(
+            {'name': result['name'],
+             'stage': result['error']['stage'],
+             'message': result['error']['message']})
+
+    slowest = sorted(successes, key=lambda r: r['seconds'], reverse=True)[:numSlowest]
+    return {
+        'version': REPORT_VERSION,
+        'numFiles': len(results),
+        'numFailures': len(failures),
+        'totalSeconds': sum(r['seconds'] for r in successes),
+        'slowest': [{'name': r['name'], 'seconds': r['seconds'], 'peakMemory': r['peakMemory']}
+                    for r in slowest],
+        'failuresByType': failuresByType,
+        'files': {r['name']: {key: value for key, value in r.items() if key != 'index'}
+                  for r in results},
+    }
+
+
+def diff_reports(baseline, report, tolerance):
+    """
+    Compares the report against the report of an earlier run. Returns a dict with:
+    newFailures and fixed: the names of files which now fail, or no longer fail,
+    slower: (name, baselineSeconds, seconds) for each file more than tolerance
+    (e.g. 0.25 for 25%) slower than before,
+    added and removed: the names of files in only one of the reports.
+    """
+    baselineFiles = baseline['files']
+    files = report['files']
+
+    diff = {
+        'newFailures': [],
+        'fixed': [],
+        'slower': [],
+        'added': sorted(set(files) - set(baselineFiles)),
+        'removed': sorted(set(baselineFiles) - set(files)),
+    }
+    for name in sorted(set(files) & set(baselineFiles)):
+        before = baselineFiles[name]
+        after = files[name]
+        if before['success'] and not after['success']:
+            diff['newFailures'].append(name)
+        elif after['success'] and not before['success']:
+            diff['fixed'].append(name)
+        elif after['success'] and \
+                after['seconds'] > before['seconds'] * (1 + tolerance) and \
+                after['seconds'] - before['seconds'] > MIN_REGRESSION_SECONDS:
+            diff['slower'].append((name, before['seconds'], after['seconds']))
+    return diff
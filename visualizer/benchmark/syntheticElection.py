@@ -0,0 +1,175 @@
+"""
+Generates synthetic elections in the universal tabulator format, so we can measure
+how the pipeline behaves on elections much larger than the ones in testData.
+
+Elections are generated from a seed, so the same parameters always produce the same file.
+The tallies are consistent from round to round: each round's tally is the previous tally
+plus the transfers listed in the previous round.
+"""
+
+import math
+import random
+
+# Eliminated candidates spread their votes across at most this many candidates
+MAX_TRANSFER_TARGETS = 5
+
+
+class SyntheticElectionError(Exception):
+    """ The requested election is impossible, e.g. more winners than candidates """
+
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class SyntheticElection:
+    """
+    Builds the universal tabulator JSON for an election.
+
+    :param numCandidates: The number of candidates
+    :param numWinners: The number of seats. Winners are elected as soon as they reach the
+                       threshold, or once there are only as many candidates left as seats.
+    :param numRounds: The number of rounds to aim for. If None, one candidate is eliminated
+                      each round. Otherwise candidates are batch-eliminated to finish in about
+                      this many rounds (elections may take a couple more if winners are
+                      elected early).
+    :param withSurplus: If true, winners who exceed the threshold transfer their surplus
+    :param inactiveFraction: The fraction of each transfer which becomes inactive ballots
+    :param numVotes: The number of first-round ballots
+    :param seed: The random seed
+    """
+
+    def __init__(self, numCandidates, numWinners=1, numRounds=None, withSurplus=True,
+                 inactiveFraction=0.1, numVotes=1000000, seed=0):
+        # pylint: disable=too-many-arguments
+        if numCandidates < 1 or numWinners < 1:
+            raise SyntheticElectionError("There must be at least one candidate and one winner")
+        if numWinners > numCandidates:
+            raise SyntheticElectionError("There cannot be more winners than candidates")
+        if numRounds is not None and numRounds < 1:
+            raise SyntheticElectionError("There must be at least one round")
+        if not 0 <= inactiveFraction <= 1:
+            raise SyntheticElectionError("The inactive fraction must be between 0 and 1")
+
+        self.numCandidates = numCandidates
+        self.numWinners = numWinners
+        self.numRounds = numRounds
+        self.withSurplus = withSurplus
+        self.inactiveFraction = inactiveFraction
+        self.numVotes = numVotes
+        self.rng = random.Random(seed)
+        self.threshold = numVotes // (numWinners + 1) + 1
+
+    def _initial_tally(self):
+        """ Splits the ballots between the candidates, with a long tail of weak candidates """
+        names = [f"Candidate {i + 1}" for i in range(self.numCandidates)]
+        weights = [self.rng.paretovariate(1.5) for _ in names]
+        totalWeight = sum(weights)
+        tally = {name: int(self.numVotes * w / totalWeight) for name, w in zip(names, weights)}
+
+        # Give the rounding error to the strongest candidate
+        strongest = max(tally, key=tally.get)
+        tally[strongest] += self.numVotes - sum(tally.values())
+        return tally
+
+    def _split_transfer(self, numVotes, continuing):
+        """ Returns the transfers dict for numVotes moving to the continuing candidates """
+        numInactive = int(numVotes * self.inactiveFraction)
+        numToTransfer = numVotes - numInactive
+
+        transfers = {}
+        if continuing and numToTransfer > 0:
+            targets = self.rng.sample(continuing, min(MAX_TRANSFER_TARGETS, len(continuing)))
+            weights = [self.rng.random() + 0.01 for _ in targets]
+            totalWeight = sum(weights)
+            for target, weight in zip(targets, weights):
+                transfers[target] = int(numToTransfer * weight / totalWeight)
+            # Give the rounding error to the first target
+            transfers[targets[0]] += numToTransfer - sum(transfers.values())
+        else:
+            numInactive = numVotes
+
+        if numInactive > 0:
+            transfers['exhausted'] = numInactive
+        return {name: votes for name, votes in transfers.items() if votes > 0}
+
+    def _num_to_eliminate(self, numContinuing, seatsLeft, roundNum):
+        """ How many candidates to eliminate this round """
+        numToEliminate = numContinuing - seatsLeft
+        if self.numRounds is None:
+            return 1
+        roundsLeft = max(1, self.numRounds - roundNum - 1)
+        return max(1, math.ceil(numToEliminate / roundsLeft))
+
+    def _elect(self, tally, continuing, seatsLeft):
+        """ Returns the names elected this round, in order of votes """
+        if len(continuing) <= seatsLeft:
+            return sorted(continuing, key=lambda name: -tally[name])
+        reachedThreshold = [name for name in continuing if tally[name] >= self.threshold]
+        return sorted(reachedThreshold, key=lambda name: -tally[name])[:seatsLeft]
+
+    def _eliminate(self, result, tally, continuing, seatsLeft):
+        """ Eliminates the weakest candidates, adding the eliminations to the round's result.
+            Returns the continuing candidates. """
+        numToEliminate = self._num_to_eliminate(len(continuing), seatsLeft, result['round'] - 1)
+        eliminated = continuing[-numToEliminate:]
+        continuing = continuing[:-numToEliminate]
+        for name in eliminated:
+            transfers = self._split_transfer(tally[name], continuing)
+            result['tallyResults'].append({'eliminated': name, 'transfers': transfers})
+        return continuing
+
+    def generate(self):
+        """ Returns the election as universal tabulator JSON data """
+        tally = self._initial_tally()
+        continuing = sorted(tally, key=lambda name: -tally[name])
+        seatsLeft = self.numWinners
+        results = []
+
+        while seatsLeft > 0:
+            roundNum = len(results)
+            result = {'round': roundNum + 1,
+                      'tally': {name: str(votes) for name, votes in tally.items()},
+                      'tallyResults': []}
+            results.append(result)
+            nextTally = dict(tally)
+
+            elected = self._elect(tally, continuing, seatsLeft)
+            if elected:
+                seatsLeft -= len(elected)
+                electedNames = set(elected)
+                continuing = [name for name in continuing if name not in electedNames]
+                for name in elected:
+                    transfers = {}
+                    surplus = tally[name] - self.threshold
+                    if self.withSurplus and seatsLeft > 0 and surplus > 0:
+                        transfers = self._split_transfer(surplus, continuing)
+                        nextTally[name] = self.threshold
+                    result['tallyResults'].append({'elected': name, 'transfers': transfers})
+            else:
+                continuing = self._eliminate(result, tally, continuing, seatsLeft)
+
+            # Apply the transfers to get the next round's tally
+            for tallyResult in result['tallyResults']:
+                if 'eliminated' in tallyResult:
+                    del nextTally[tallyResult['eliminated']]
+                for name, votes in tallyResult['transfers'].items():
+                    if name != 'exhausted':
+                        nextTally[name] += votes
+            tally = nextTally
+            continuing.sort(key=lambda name, tally=tally: -tally[name])
+
+        return {
+            'config': {
+                'contest': f"Synthetic election: {self.numCandidates} candidates, "
+                           f"{self.numWinners} winners",
+                'date': '2020-01-01',
+                'jurisdiction': 'Synthetic',
+                'office': 'Benchmark',
+                'threshold': str(self.threshold),
+            },
+            'results': results,
+        }
+
+
+def generate_election(numCandidates, **kwargs):
+    """ Returns the universal tabulator JSON data for a synthetic election.
+        See SyntheticElection for the arguments. """
+    return SyntheticElection(numCandidates, **kwargs).generate()
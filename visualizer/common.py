@@ -3,6 +3,18 @@
 INACTIVE_TEXT = "Inactive Ballots"
 RESIDUAL_SURPLUS_TEXT = "Residual Surplus"
 
+# The short vistypes used in embed URLs (/vo/slug/bar, /ve/slug/bar), and the vistypes they
+# stand for in ?vistype=
+EMBED_VISTYPES = {
+    'bar': 'barchart-interactive',
+    'bar-static': 'barchart-fixed',
+    'sankey': 'sankey',
+    'table': 'tabular-candidate-by-round',
+    'table-by-round': 'tabular-by-round-interactive',
+    'table-by-round-static': 'tabular-by-round',
+    'table-by-candidate': 'tabular-by-candidate',
+}
+
 
 def get_host(request):
     """ Returns the HTTP_HOST, split for easy mocking """
@@ -0,0 +1,350 @@
+""" A Graph for large elections, which stores its data in flat arrays rather than
+    one object per node and per link.
+
+    Votes and winner/eliminated flags are stored in rounds-by-candidates matrices,
+    indexed by [round * numCandidates + candidateId], and the links (transfers) are stored
+    as parallel arrays of source node, target node and value.
+
+    The public API is the same as Graph's. Nodes and links are only created as objects if a
+    visualization asks for them (e.g. the sankey), and the summary is computed from the
+    arrays directly.
+
+    Large elections (see is_large_election) are loaded into a CompactGraph automatically.
+    Loading, summarizing, ordering and tabulating an election are all O(R * C) or
+    O(C log C), for R rounds and C candidates: nothing looks up a candidate by scanning
+    a list, so a 1,000-candidate contest is as fast per node as a 10-candidate one.
+    Keep it that way: use dicts and sets for lookups (see graph.index_of_each),
+    never list.index() or "in someList" inside a loop over candidates. """
+
+from array import array
+
+from visualizer.graph import rcvResult
+from visualizer.graph.graph import Graph, LinkData
+from visualizer.graph.graphSummary import GraphSummary, CandidateInfo, RoundInfo
+
+# Use a CompactGraph when an election has at least this many rounds * candidates
+LARGE_ELECTION_NUM_NODES = 1000
+
+
+def is_large_election(numRounds, numCandidates):
+    """ Should an election of this size use a CompactGraph? """
+    return numRounds * numCandidates >= LARGE_ELECTION_NUM_NODES
+
+
+class CompactNode:
+    """ Behaves like a NodeData, but reads and writes its data from the CompactGraph """
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    @property
+    def item(self):
+        """ The Item this node represents """
+        return self.graph.itemList[self.index % self.graph.numCandidates]
+
+    @property
+    def label(self):
+        """ The label for this node """
+        return str(self.item.name)
+
+    @property
+    def count(self):
+        """ The number of votes this candidate had this round """
+        return self.graph.votes[self.index]
+
+    @property
+    def roundNum(self):
+        """ The round number of this node """
+        return self.index // self.graph.numCandidates
+
+    @property
+    def isWinner(self):
+        """ Has this candidate won, on this round or any before it? """
+        return bool(self.graph.winnerFlags[self.index])
+
+    @isWinner.setter
+    def isWinner(self, value):
+        self.graph.winnerFlags[self.index] = int(value)
+
+    @property
+    def isEliminated(self):
+        """ Was this candidate eliminated this round? """
+        return bool(self.graph.eliminatedFlags[self.index])
+
+    @isEliminated.setter
+    def isEliminated(self, value):
+        self.graph.eliminatedFlags[self.index] = int(value)
+
+    def mark_eliminated(self):
+        """ Marks the given node as the node in which this candidate was eliminated """
+        self.isEliminated = True
+
+    def mark_winner(self):
+        """ Marks the given node as the node in which this candidate won """
+        self.isWinner = True
+
+
+# pylint: disable=too-many-instance-attributes
+class CompactGraph(Graph):
+    """ A Graph which stores its nodes and links in arrays. See the module docstring. """
+
+    def __init__(self, title):
+        super().__init__(title)
+
+        # Candidate IDs are indices into itemList
+        self.itemList = []
+        self.itemIds = {}
+        self.numCandidates = 0
+        self._numRounds = 0
+
+        # Rounds-by-candidates matrices
+        self.votes = array('d')
+        self.isPresent = bytearray()
+        self.winnerFlags = bytearray()
+        self.eliminatedFlags = bytearray()
+
+        # The candidate IDs in each round, in the order they were listed
+        self.candidateIdsPerRound = []
+
+        # One entry per link: the source and target node indices, and the number of votes
+        self.linkSources = array('l')
+        self.linkTargets = array('l')
+        self.linkValues = array('d')
+
+        # The order of self.nodes, as node indices
+        self.nodeOrder = array('l')
+
+        # Objects only created on request: Graph.__init__ set these to empty lists
+        self._nodesByIndex = {}
+        self._nodes = None
+        self._links = None
+        self._nodesPerRound = None
+
+    @property
+    def numRounds(self):
+        """ Returns the number of rounds """
+        return self._numRounds
+
+    @property
+    def items(self):
+        """ Returns all items present in this graph """
+        return [self.itemList[c] for c in self.candidateIdsPerRound[0]]
+
+    @property
+    def nodes(self):
+        """ All nodes, sorted by the elimination order once it is set """
+        if self._nodes is None:
+            self._nodes = [self.node_at(i) for i in self.nodeOrder]
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self._nodes = nodes
+
+    @property
+    def links(self):
+        """ All links, created on first request """
+        if self._links is None:
+            self._links = [LinkData(self.node_at(source), self.node_at(target), value)
+                           for source, target, value
+                           in zip(self.linkSources, self.linkTargets, self.linkValues)]
+        return self._links
+
+    @links.setter
+    def links(self, links):
+        self._links = links
+
+    @property
+    def nodesPerRound(self):
+        """ A list with a dict for each round, mapping Items to their nodes """
+        if self._nodesPerRound is None:
+            self._nodesPerRound = []
+            for round_i, candidateIds in enumerate(self.candidateIdsPerRound):
+                offset = round_i * self.numCandidates
+                self._nodesPerRound.append({self.itemList[c]: self.node_at(offset + c)
+                                            for c in candidateIds})
+        return self._nodesPerRound
+
+    @nodesPerRound.setter
+    def nodesPerRound(self, nodesPerRound):
+        self._nodesPerRound = nodesPerRound
+
+    def node_at(self, index):
+        """ Returns the node at the given index, creating it on first request """
+        node = self._nodesByIndex.get(index)
+        if node is None:
+            node = CompactNode(self, index)
+            self._nodesByIndex[index] = node
+        return node
+
+    def summarize(self):
+        """ Returns the graph summary - or creates it if it hasn't been requested yet """
+        if self.summary is None:
+            self.summary = CompactGraphSummary(self)
+        return self.summary
+
+    def set_elimination_order(self, orderedItems):
+        """
+        Given a list of Items, sets the elimination erder.
+        Does no validation that the given order is complete, but will likely throw
+        several errors here or elsewhere if you pass bad data.
+        """
+        nodeOrder = array('l')
+        for item in reversed(orderedItems):
+            candidateId = self.itemIds[item]
+            for round_i in range(self.numRounds):
+                index = round_i * self.numCandidates + candidateId
+                if self.isPresent[index]:
+                    nodeOrder.append(index)
+        if len(nodeOrder) != len(self.nodeOrder):
+            raise ValueError("The elimination order must include every candidate")
+
+        self.eliminationOrder = orderedItems
+        self.nodeOrder = nodeOrder
+        self._nodes = None
+
+        # Reset summary: it's no longer accurate
+        self.summary = None
+
+    def _add_link(self, source, target, value):
+        """ Adds a link between two node indices """
+        self.linkSources.append(source)
+        self.linkTargets.append(target)
+        self.linkValues.append(value)
+
+    def _compute_transfers(self):
+        """ Second pass: after all nodes are created, compute the edges """
+        # No transfers allowed on last round
+        self._ensure_no_last_round_transfers()
+
+        # For every other round:
+        for i in range(self.numRounds - 1):
+            offsetThisRound = i * self.numCandidates
+            offsetNextRound = offsetThisRound + self.numCandidates
+
+            # Compute transfers to other candidates on each round
+            totalVotesTransferredFrom = {}
+            for transfer in self.transfersPerRound[i]:
+                sourceId = self.itemIds[transfer.item]
+                assert self.isPresent[offsetThisRound + sourceId]
+                totalVotesTransferredFrom[sourceId] = 0
+
+                # All of the transfers from this candidate to other candidates
+                for targetItem, count in transfer.transfersByItem.items():
+                    targetId = self.itemIds[targetItem]
+                    assert self.isPresent[offsetNextRound + targetId]
+                    self._add_link(offsetThisRound + sourceId, offsetNextRound + targetId, count)
+                    totalVotesTransferredFrom[sourceId] += count
+
+            # Compute transfers to same candidate by computing untransferred votes
+            for candidateId in self.candidateIdsPerRound[i]:
+                if not self.isPresent[offsetNextRound + candidateId]:
+                    continue
+                votesTransferredToOthers = totalVotesTransferredFrom.get(candidateId, 0)
+                votesTransferredToSelf = self.votes[offsetThisRound + candidateId] - \
+                    votesTransferredToOthers
+                self._add_link(offsetThisRound + candidateId,
+                               offsetNextRound + candidateId,
+                               votesTransferredToSelf)
+
+    def create_graph_from_rounds(self, rounds):
+        """ Fills in the arrays, where each element is a single Item at a specific Round,
+            and the links are Transfers """
+        for rnd in rounds:
+            for item in rnd.itemsToVotes:
+                if item not in self.itemIds:
+                    self.itemIds[item] = len(self.itemList)
+                    self.itemList.append(item)
+
+        self._numRounds = len(rounds)
+        self.numCandidates = len(self.itemList)
+        size = self.numRounds * self.numCandidates
+        self.votes = array('d', bytes(self.votes.itemsize * size))
+        self.isPresent = bytearray(size)
+        self.winnerFlags = bytearray(size)
+        self.eliminatedFlags = bytearray(size)
+
+        for round_i, rnd in enumerate(rounds):
+            self.winnersSoFar.update(rnd.winners)
+
+            eliminatedThisRound = {e.item for e in rnd.transfers
+                                   if isinstance(e, rcvResult.Elimination)}
+
+            candidateIds = array('l')
+            offset = round_i * self.numCandidates
+            for item, votes in rnd.itemsToVotes.items():
+                candidateId = self.itemIds[item]
+                index = offset + candidateId
+                self.votes[index] = votes
+                self.isPresent[index] = 1
+                self.winnerFlags[index] = item in self.winnersSoFar
+                self.eliminatedFlags[index] = item in eliminatedThisRound
+                candidateIds.append(candidateId)
+                self.nodeOrder.append(index)
+
+            self.candidateIdsPerRound.append(candidateIds)
+            self.transfersPerRound.append(rnd.transfers)
+
+        self._compute_transfers()
+
+
+# pylint: disable=too-few-public-methods
+class CompactCandidateInfo(CandidateInfo):
+    """ A CandidateInfo which stores its votes in arrays """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.votesAddedPerRound = array('d')
+        self.totalVotesPerRound = array('d')
+
+
+class CompactGraphSummary(GraphSummary):
+    """ The GraphSummary of a CompactGraph, computed from its arrays """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, graph):
+        rounds = [RoundInfo(i) for i in range(graph.numRounds)]
+
+        # Accumulate the votes gained by each candidate in each node (into candidates dict)
+        # and what happened in each round (into rounds list)
+        candidates = {}
+        winnerItems = []
+        alreadyWonInPreviousRound = set()
+        for index in graph.nodeOrder:
+            item = graph.itemList[index % graph.numCandidates]
+            if item not in candidates:
+                candidates[item] = CompactCandidateInfo(item.name)
+
+            count = graph.votes[index]
+            currRound = len(candidates[item].votesAddedPerRound)
+            candidates[item].add_votes(count)
+            rounds[currRound].add_votes(item, count)
+
+            if graph.winnerFlags[index]:
+                # Only count winner the first time they win
+                if item not in alreadyWonInPreviousRound:
+                    rounds[currRound].add_winner(item)
+                    alreadyWonInPreviousRound.add(item)
+                    winnerItems.append(item)
+            if graph.eliminatedFlags[index]:
+                # Eliminate the next round, as in GraphSummary
+                rounds[currRound + 1].add_eliminated(item)
+
+        self.graph = graph
+        self.rounds = rounds
+        self.candidates = candidates
+        self._linksByTargetNode = None
+        self.winnerNames = [i.name for i in winnerItems]
+        self.numWinners = len(self.winnerNames)
+        self.numEliminated = sum(len(r.eliminatedNames) for r in rounds)
+
+    @property
+    def linksByTargetNode(self):
+        """ Map: node to list of links where link.target == node. Created on first request. """
+        if self._linksByTargetNode is None:
+            self._linksByTargetNode = {}
+            for link in self.graph.links:
+                self._linksByTargetNode.setdefault(link.target, []).append(link)
+        return self._linksByTargetNode
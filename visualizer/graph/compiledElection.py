@@ -0,0 +1,80 @@
+"""
+A compiled election: the normalized results (after conversion and migrations),
+the elimination order, a short summary, and the sidecar data.
+
+Compiling is done once, when a JsonConfig is saved, so that views can rebuild the graph
+without re-reading the source file from storage, re-converting it, or re-migrating it.
+The compiled data is a JSON-serializable dict.
+
+Bump COMPILED_FORMAT_VERSION whenever the format changes or whenever the migrations
+in readRCVRCJSON change what they output: older compiled data is then ignored
+and views fall back to the source files until the election is recompiled.
+"""
+
+from visualizer.graph.graphCreator import initialize_graph,\
+    load_reader_with_file,\
+    make_graph_with_reader
+from visualizer.graph.readRCVRCJSON import JSONReader
+from visualizer.sidecar.reader import SidecarReader
+
+COMPILED_FORMAT_VERSION = 1
+
+
+def compile_election(jsonFileObj, sidecarJsonFileObj):
+    """
+    Reads the source files and returns the compiled election.
+    Raises the same errors as make_graph_with_file and SidecarReader.
+    """
+    jsonReader, jsonData = load_reader_with_file(jsonFileObj)
+    graph = make_graph_with_reader(jsonReader, jsonData, False)
+    sidecarData = SidecarReader(sidecarJsonFileObj).data if sidecarJsonFileObj else None
+    return compile_graph(graph, jsonData, sidecarData)
+
+
+def compile_graph(graph, jsonData, sidecarData):
+    """
+    Returns the compiled election of a graph already made from the source files, without
+    excluding the final winner: jsonData is its normalized data (see load_reader_with_file),
+    and sidecarData is the candidate sidecar's data, or None.
+    Applies the sidecar's elimination order to the graph.
+    """
+    if sidecarData is not None:
+        graph.set_elimination_order(graph.get_items_for_names(sidecarData['order']))
+
+    summary = graph.summarize()
+    return {
+        'version': COMPILED_FORMAT_VERSION,
+        'data': jsonData,
+        'eliminationOrder': [item.name for item in graph.eliminationOrder],
+        'summary': {
+            'title': graph.title,
+            'numRounds': len(summary.rounds),
+            'numCandidates': len(summary.candidates),
+            'winnerNames': summary.winnerNames,
+        },
+        'sidecar': sidecarData,
+    }
+
+
+def is_compiled_election_current(compiledElection):
+    """ Is this compiled election present and compiled with the current format version? """
+    if not compiledElection:
+        return False
+    return compiledElection.get('version') == COMPILED_FORMAT_VERSION
+
+
+def load_graph_from_compiled_election(compiledElection, excludeFinalWinnerAndEliminatedCandidate):
+    """
+    Creates the graph from a compiled election. Equivalent to make_graph_with_file,
+    followed by applying the sidecar elimination order, if there is a sidecar.
+    """
+    jsonReader = JSONReader(compiledElection['data'], applyMigrations=False)
+    graph = initialize_graph(jsonReader, excludeFinalWinnerAndEliminatedCandidate)
+
+    if compiledElection['sidecar'] is not None:
+        itemsByName = {item.name: item for item in graph.items}
+        graph.set_elimination_order([itemsByName[name]
+                                     for name in compiledElection['eliminationOrder']])
+        graph.summarize()
+
+    return graph
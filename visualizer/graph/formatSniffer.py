@@ -0,0 +1,91 @@
+""" Cheaply detects the format of an uploaded or scraped file from its first few bytes,
+    so we can pick the right converter directly instead of trying each converter in turn.
+    Detection is only a guess: if the guessed converter fails, callers should fall back
+    to trying every converter. """
+
+from rcvformats.conversions.dominion_txt import DominionTxtConverter
+from rcvformats.conversions.dominion_xlsx import DominionXlsxConverter
+from rcvformats.conversions.electionbuddy import ElectionBuddyConverter
+from rcvformats.conversions.opavote import OpavoteConverter
+from rcvformats.conversions.ut_without_transfers import UTWithoutTransfersConverter
+
+UNIVERSAL_TABULATOR = 'ut'
+DOMINION_XLSX = 'dominion-xlsx'
+DOMINION_TXT = 'dominion-txt'
+ELECTIONBUDDY = 'electionbuddy'
+OPAVOTE = 'opavote'
+
+CONVERTERS = {
+    DOMINION_XLSX: DominionXlsxConverter,
+    DOMINION_TXT: DominionTxtConverter,
+    ELECTIONBUDDY: ElectionBuddyConverter,
+    OPAVOTE: OpavoteConverter,
+}
+
+# How many bytes to read to guess the format
+SNIFF_SIZE = 4096
+
+
+def _read_head(fileObject):
+    """ Reads the next SNIFF_SIZE bytes, then goes back to where the file was """
+    position = fileObject.tell()
+    head = fileObject.read(SNIFF_SIZE)
+    fileObject.seek(position)
+    if isinstance(head, str):
+        head = head.encode('utf-8')
+    return head
+
+
+def _sniff_json(head):
+    """ Tells apart the JSON formats by their top-level keys """
+    if b'"results"' in head or b'"config"' in head:
+        return UNIVERSAL_TABULATOR
+    if b'"n_seats"' in head or b'"candidates"' in head:
+        return OPAVOTE
+    return UNIVERSAL_TABULATOR
+
+
+def _sniff_text(text):
+    """ ElectionBuddy CSVs start with a title, a position, a row of stars, then rounds """
+    lines = [line.strip() for line in text.splitlines()]
+    if len(lines) > 5 and lines[3].startswith('***') and lines[5].startswith('Round'):
+        return ELECTIONBUDDY
+    return None
+
+
+def sniff_format(fileObject):
+    """
+    Guesses the format of the file without parsing it, leaving the file where it was.
+    Returns one of the format constants, or None if it doesn't look like any of them.
+    """
+    position = fileObject.tell()
+    try:
+        head = _read_head(fileObject)
+    except UnicodeDecodeError:
+        # A binary file opened in text mode
+        fileObject.seek(position)
+        return None
+
+    # xlsx files are zip files
+    if head.startswith(b'PK\x03\x04'):
+        return DOMINION_XLSX
+
+    # Dominion txt files are UTF-16, which puts null bytes between ASCII characters
+    if head.startswith(b'\xff\xfe') or head[1:40:2].count(b'\x00') > 10:
+        return DOMINION_TXT
+
+    text = head.decode('utf-8', errors='ignore').lstrip('\ufeff \t\r\n')
+    if text.startswith('{'):
+        return _sniff_json(head)
+    return _sniff_text(text)
+
+
+def convert_with_format(fileObject, fileFormat):
+    """
+    Converts the file with the converter for the given (non-UT) format,
+    the same way AutomaticConverter would have if it had found that converter.
+    Raises CouldNotConvertException on failure.
+    """
+    fileObject.seek(0)
+    data = CONVERTERS[fileFormat]().convert_to_ut(fileObject)
+    return UTWithoutTransfersConverter(allow_guessing=False).fill_in_tally_data(data)
@@ -9,6 +9,15 @@ from visualizer.graph import rcvResult
 from visualizer.graph.graphSummary import GraphSummary
 
 
+def index_of_each(elements):
+    """ Maps each element to the index of its first appearance in the list.
+        Use this instead of calling list.index() in a loop. """
+    indices = {}
+    for i, element in enumerate(elements):
+        indices.setdefault(element, i)
+    return indices
+
+
 # pylint: disable=too-few-public-methods
 class LinkData:
     """ Data about a single "link": a transfer from the source to target """
@@ -53,6 +62,9 @@ class Graph:
         self.dateString = ""
         self.threshold = None
 
+        # The format of the file this graph was loaded from, if known (see formatSniffer)
+        self.fileFormat = None
+
         # This must be set manually by calling set_elimination_order
         self.eliminationOrder = None
 
@@ -82,8 +94,11 @@ class Graph:
 
     def get_items_for_names(self, listOfNames):
         """ Given a list of all names, returns the corresponding Item for each naem """
-        allItems = list(set(n.item for n in self.nodes))
-        return sorted(allItems, key=lambda item: -listOfNames.index(item.name))
+        indexOfName = index_of_each(listOfNames)
+        for item in self.items:
+            if item.name not in indexOfName:
+                raise ValueError(f"{item.name} is not in list")
+        return sorted(self.items, key=lambda item: -indexOfName[item.name])
 
     def set_elimination_order(self, orderedItems):
         """
@@ -91,8 +106,9 @@ class Graph:
         Does no validation that the given order is complete, but will likely throw
         several errors here or elsewhere if you pass bad data.
         """
+        indexOfItem = index_of_each(orderedItems)
         self.eliminationOrder = orderedItems
-        self.nodes = sorted(self.nodes, key=lambda x: -orderedItems.index(x.item))
+        self.nodes = sorted(self.nodes, key=lambda x: -indexOfItem[x.item])
 
         # Reset summary: it's no longer accurate
         self.summary = None
@@ -7,6 +7,8 @@ from rcvformats.schemas.universaltabulator import SchemaV0
 from rcvformats.conversions.automatic import AutomaticConverter
 from rcvformats.conversions.base import CouldNotConvertException
 
+from common.timing import time_stage
+from visualizer.graph import formatSniffer
 from visualizer.graph.rcvResult import Elimination
 import visualizer.graph.readRCVRCJSON as rcvrcJson
 
@@ -63,24 +65,56 @@ def initialize_graph(jsonReader, excludeFinalWinnerAndEliminatedCandidate):
     if excludeFinalWinnerAndEliminatedCandidate:
         remove_last_winner_and_eliminated(graph, rounds)
 
-    graph.summarize()
+    with time_stage('summary'):
+        graph.summarize()
 
     return graph
 
 
-def make_graph_with_file(fileObject, excludeFinalWinnerAndEliminatedCandidate):
-    """ Load the given fileObject, create and return a graph """
-    try:
-        # First, try to load it directly, assuming it is a valid format
-        # This circumvents jsonschema validation needlessly
-        jsonData = json.load(fileObject)
-        jsonReader = rcvrcJson.JSONReader(jsonData)
-    except Exception:  # pylint: disable=broad-except
-        # If the loading failed, then attempt to convert it
-        fileObject.seek(0)
+def load_reader_with_file(fileObject, fileFormat=None):
+    """
+    Load the given fileObject, converting it to the universal tabulator format if needed.
+    If the fileFormat (see formatSniffer) is not given, it is guessed from the file.
+    Returns the JSONReader and the (migrated) jsonData it was created with.
+    The format that was used is stored in the graph's fileFormat, or None if it is unknown.
+    """
+    if fileFormat is None:
+        fileFormat = formatSniffer.sniff_format(fileObject)
 
-        # First, try to convert
-        jsonData = convert_to_standardized_format(fileObject)
+    jsonReader = None
+    if fileFormat in (formatSniffer.UNIVERSAL_TABULATOR, None):
+        try:
+            # First, try to load it directly, assuming it is a valid format
+            # This circumvents jsonschema validation needlessly
+            with time_stage('read'):
+                content = fileObject.read()
+            with time_stage('parse'):
+                jsonData = json.loads(content)
+
+            # Skip the migrations if this exact file was loaded before and did not need them
+            fingerprint = rcvrcJson.fingerprint(content)
+            isClean = rcvrcJson.is_fingerprint_clean(fingerprint)
+            jsonReader = rcvrcJson.JSONReader(jsonData, applyMigrations=not isClean)
+            if not jsonReader.neededMigrations:
+                rcvrcJson.record_clean_fingerprint(fingerprint)
+        except Exception:  # pylint: disable=broad-except
+            fileFormat = None
+
+    if jsonReader is None:
+        # If the loading failed, or it's another format, then attempt to convert it
+        jsonData = None
+        with time_stage('convert'):
+            if fileFormat in formatSniffer.CONVERTERS:
+                try:
+                    jsonData = formatSniffer.convert_with_format(fileObject, fileFormat)
+                except CouldNotConvertException as exc:
+                    logger.info("The file was not %s as expected: %s", fileFormat, str(exc))
+                    fileFormat = None
+
+            # If we don't know the format, try every converter
+            if jsonData is None:
+                fileObject.seek(0)
+                jsonData = convert_to_standardized_format(fileObject)
 
         # Then, try to load
         try:
@@ -90,6 +124,31 @@ def make_graph_with_file(fileObject, excludeFinalWinnerAndEliminatedCandidate):
         except Exception as exc:  # pylint: disable=broad-except
             raise BadJSONError("File schema was valid, but we could not interpret it") from exc
 
+    jsonReader.get_graph().fileFormat = fileFormat
+    return jsonReader, jsonData
+
+
+def load_reader_with_data(jsonData):
+    """
+    Like load_reader_with_file, but for data already in the universal tabulator format,
+    e.g. converted from the data entry table, so it needn't be written out and read back.
+    The data is checked against the schema, as converting a file would.
+    Returns the JSONReader.
+    """
+    schema = SchemaV0()
+    if not schema.validate(jsonData):
+        raise BadJSONError(schema.last_error())
+
+    try:
+        return rcvrcJson.JSONReader(jsonData)
+    except rcvrcJson.MigrationError as exc:
+        raise BadJSONError("Invalid file: " + str(exc)) from exc
+    except Exception as exc:
+        raise BadJSONError("File schema was valid, but we could not interpret it") from exc
+
+
+def make_graph_with_reader(jsonReader, jsonData, excludeFinalWinnerAndEliminatedCandidate):
+    """ Create and return a graph from a JSONReader and the data it was created with """
     try:
         graph = initialize_graph(jsonReader, excludeFinalWinnerAndEliminatedCandidate)
     except Exception as exc:
@@ -102,3 +161,9 @@ def make_graph_with_file(fileObject, excludeFinalWinnerAndEliminatedCandidate):
         raise exc
 
     return graph
+
+
+def make_graph_with_file(fileObject, excludeFinalWinnerAndEliminatedCandidate, fileFormat=None):
+    """ Load the given fileObject, create and return a graph """
+    jsonReader, jsonData = load_reader_with_file(fileObject, fileFormat)
+    return make_graph_with_reader(jsonReader, jsonData, excludeFinalWinnerAndEliminatedCandidate)
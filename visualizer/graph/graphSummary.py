@@ -23,7 +23,8 @@ class GraphSummary:
         # Accumulate the votes gained by each candidate in each node (into candidates dict)
         # and what happened in each round (into rounds list)
         candidates = {}
-        alreadyWonInPreviousRound = []
+        winnerItems = []
+        alreadyWonInPreviousRound = set()
         for node in graph.nodes:
             item = node.item
             if item not in candidates:
@@ -37,7 +38,8 @@ class GraphSummary:
                 # Only count winner the first time they win
                 if item not in alreadyWonInPreviousRound:
                     rounds[currRound].add_winner(item)
-                    alreadyWonInPreviousRound.append(item)
+                    alreadyWonInPreviousRound.add(item)
+                    winnerItems.append(item)
             if node.isEliminated:
                 # Eliminate the next round: in the sankey representation,
                 # eliminated candidates are shown on the previous round
@@ -54,11 +56,12 @@ class GraphSummary:
         self.rounds = rounds
         self.candidates = candidates
         self.linksByTargetNode = linksByTargetNode
-        self.winnerNames = [i.name for i in alreadyWonInPreviousRound]
+        self.winnerNames = [i.name for i in winnerItems]
         self.numWinners = len(self.winnerNames)
         self.numEliminated = sum(len(r.eliminatedNames) for r in rounds)
 
 
+# pylint: disable=too-many-instance-attributes
 class RoundInfo:
     """ Summarizes a single round, with functions to build the round """
 
@@ -70,6 +73,10 @@ class RoundInfo:
         self.winnerNames = []
         self.totalActiveVotes = 0  # The total number of active ballots this round
 
+        # Sets of the above names, for fast lookups: see is_eliminated and is_winner
+        self._eliminatedNameSet = set()
+        self._winnerNameSet = set()
+
     def key(self):
         """ Returns the "key" for this round (just the round number) """
         return self.round_i
@@ -78,11 +85,21 @@ class RoundInfo:
         """ Adds the name to the list of names eliminated this round """
         self.eliminatedItems.append(item)
         self.eliminatedNames.append(item.name)
+        self._eliminatedNameSet.add(item.name)
 
     def add_winner(self, item):
         """ Adds the name to the list of names elected this round """
         self.winnerItems.append(item)
         self.winnerNames.append(item.name)
+        self._winnerNameSet.add(item.name)
+
+    def is_eliminated(self, name):
+        """ Was the candidate with this name eliminated this round? """
+        return name in self._eliminatedNameSet
+
+    def is_winner(self, name):
+        """ Was the candidate with this name elected this round? """
+        return name in self._winnerNameSet
 
     def add_votes(self, candidateItem, numVotes):
         """ Notes that the given Candidate received numVotes votes - unless they're
@@ -1,27 +1,114 @@
 """ Class which reads an RCVRC-formatted JSON file """
-import abc
+from collections import OrderedDict
 import datetime
+import hashlib
+import threading
 
+from common.timing import time_stage
 from visualizer import common
 from . import rcvResult
 from .graph import Graph
+from .compactGraph import CompactGraph, is_large_election
 
 
 class MigrationError(Exception):
     """ An error triggered during migration, with a message to be passed on to the user """
 
 
-class JSONMigrateTask():
-    """ An abstract base class to "fix" JSONs. Each migration "task" should override this."""
+# Fingerprints of files which did not need any migration, most recent last.
+# Files are loaded on many threads (validating batches, scraping...): use it with the lock.
+CLEAN_FINGERPRINTS = OrderedDict()
+MAX_CLEAN_FINGERPRINTS = 1024
+_cleanFingerprintsLock = threading.Lock()
 
-    def __init__(self, jsonData):
+
+def fingerprint(content):
+    """ The fingerprint of the contents of a file, as bytes or str """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def is_fingerprint_clean(fileFingerprint):
+    """ Was a file with this fingerprint previously loaded without needing any migration? """
+    with _cleanFingerprintsLock:
+        if fileFingerprint not in CLEAN_FINGERPRINTS:
+            return False
+        CLEAN_FINGERPRINTS.move_to_end(fileFingerprint)
+        return True
+
+
+def record_clean_fingerprint(fileFingerprint):
+    """ Notes that a file with this fingerprint did not need any migration """
+    with _cleanFingerprintsLock:
+        CLEAN_FINGERPRINTS[fileFingerprint] = True
+        CLEAN_FINGERPRINTS.move_to_end(fileFingerprint)
+        while len(CLEAN_FINGERPRINTS) > MAX_CLEAN_FINGERPRINTS:
+            CLEAN_FINGERPRINTS.popitem(last=False)
+
+
+def clear_clean_fingerprints():
+    """ Forgets every clean fingerprint, so every file is migrated again """
+    with _cleanFingerprintsLock:
+        CLEAN_FINGERPRINTS.clear()
+
+
+# pylint: disable=too-few-public-methods
+class MigrationEngine():
+    """
+    Runs a list of migration tasks in a single pass over the rounds:
+    each round is visited by every task, in order, before moving on to the next round.
+
+    A task with needsNextRound sees the following round only after it has been visited by
+    every task before it, so the engine runs that task (and every task after it)
+    one round behind the tasks before it.
+    """
+
+    def __init__(self, jsonData, tasks):
         self.data = jsonData
+        self.tasks = tasks
 
-    def _enumerate_tally_results(self):
+    def _get_stages(self):
+        """ Splits the tasks into stages, each running one round behind the previous one """
+        stages = [[]]
+        for task in self.tasks:
+            if task.needsNextRound and stages[-1]:
+                stages.append([])
+            stages[-1].append(task)
+        return stages
+
+    def run(self):
+        """ Run every task. Returns whether any task changed the data. """
         results = self.data['results']
-        for result in results:
-            for tallyResult in result['tallyResults']:
-                yield tallyResult
+        stages = self._get_stages()
+
+        for i in range(len(results) + len(stages) - 1):
+            for stage_i, stage in enumerate(stages):
+                round_i = i - stage_i
+                if not 0 <= round_i < len(results):
+                    continue
+                for task in stage:
+                    task.visit_round(round_i, results[round_i])
+
+        for task in self.tasks:
+            task.finish()
+
+        return any(task.hasChanged for task in self.tasks)
+
+
+class JSONMigrateTask():
+    """
+    An abstract base class to "fix" JSONs. Each migration "task" should override
+    visit_round or visit_tally_result, which the MigrationEngine calls for each round.
+    Set hasChanged if the task changed the data.
+    """
+
+    # Set this if visit_round needs the next round, after it was migrated by all previous tasks
+    needsNextRound = False
+
+    def __init__(self, jsonData):
+        self.data = jsonData
+        self.hasChanged = False
 
     def is_rankit_data(self):
         """ Is the jsonData from RankIt? """
@@ -29,149 +116,208 @@ class JSONMigrateTask():
             return False
         return self.data['config']['jurisdiction'] == 'RankIt Export'
 
-    def rename(self, fromStr, toStr):
+    def rename_in_round(self, result, fromStr, toStr):
         """
-        A helper function to rename a candidate s/fromStr/toStr throughout the JSON
-        Returns false if toStr already existed in the results -- will refuse to overwrite
+        A helper function to rename a candidate s/fromStr/toStr throughout a single round
+        Returns false if toStr already existed in the round -- will refuse to overwrite
         """
-        results = self.data['results']
-        for result in results:
-            if fromStr in result['tally']:
-                if toStr in result['tally']:
+        if fromStr in result['tally']:
+            if toStr in result['tally']:
+                return False
+            result['tally'][toStr] = result['tally'][fromStr]
+            del result['tally'][fromStr]
+            self.hasChanged = True
+
+        for tallyResult in result['tallyResults']:
+            if fromStr in tallyResult['transfers']:
+                if toStr in tallyResult['transfers']:
                     return False
-                result['tally'][toStr] = result['tally'][fromStr]
-                del result['tally'][fromStr]
-
-            for tallyResult in result['tallyResults']:
-                if fromStr in tallyResult['transfers']:
-                    if toStr in tallyResult['transfers']:
-                        return False
-                    tallyResult['transfers'][toStr] = tallyResult['transfers'][fromStr]
-                    del tallyResult['transfers'][fromStr]
+                tallyResult['transfers'][toStr] = tallyResult['transfers'][fromStr]
+                del tallyResult['transfers'][fromStr]
+                self.hasChanged = True
         return True
 
-    @abc.abstractmethod
+    def finish(self):
+        """ Called after every round was visited """
+
+    def visit_round(self, round_i, result):
+        """ Migrate a single round. By default, visits each of its tallyResults. """
+        for tallyResult in result['tallyResults']:
+            self.visit_tally_result(round_i, result, tallyResult)
+
+    def visit_tally_result(self, round_i, result, tallyResult):
+        """ Migrate a single tallyResult of the given round """
+
     def do(self):
-        """ Run the migration. Put your subclass' logic here. """
+        """ Run just this migration """
+        MigrationEngine(self.data, [self]).run()
 
 
 class FixUndeclaredUWITask(JSONMigrateTask):
     """ Undeclared votes are sometimes marked as 'UWI' instead of 'Undeclared' """
 
-    def do(self):
-        """ Run the migration """
-        results = self.data['results']
+    def visit_round(self, round_i, result):
+        """ Only the first round needs fixing """
+        if round_i != 0:
+            return
 
         firstEliminated = []
-        firstTally = results[0]['tallyResults']
-        for tallyResult in firstTally:
+        for tallyResult in result['tallyResults']:
             if 'eliminated' in tallyResult:
                 firstEliminated.append(tallyResult['eliminated'])
 
-        firstTally = results[0]['tally']
+        firstTally = result['tally']
         if 'UWI' in firstTally and \
                 'Undeclared' not in firstTally and \
                 'Undeclared' in firstEliminated:
             firstTally['Undeclared'] = firstTally['UWI']
             del firstTally['UWI']
+            self.hasChanged = True
 
 
 class FixNoTransfersTask(JSONMigrateTask):
     """ The JSON prefers no key named "transfers" instead of an empty list. We do not. """
 
-    def do(self):
-        """ Run the migration """
-        for tallyResult in self._enumerate_tally_results():
-            if 'transfers' not in tallyResult:
-                tallyResult['transfers'] = {}
+    def visit_tally_result(self, round_i, result, tallyResult):
+        """ Add the missing transfers """
+        if 'transfers' not in tallyResult:
+            tallyResult['transfers'] = {}
+            self.hasChanged = True
 
 
 class FixIgnoreResidualSurplus(JSONMigrateTask):
     """ Creates a "residual surplus" candidate in the first round if we find it in other rounds,
         since we look to the first round for all candidates (or places votes can be transferred) """
 
-    def do(self):
-        """ Run the migration """
-        for tallyResult in self._enumerate_tally_results():
-            if 'residual surplus' in tallyResult['transfers']:
-                self.data['results'][0]['tally']['residual surplus'] = 0
+    searchText = 'residual surplus'
+
+    def __init__(self, jsonData):
+        super().__init__(jsonData)
+
+        # The first round is migrated before we know whether to add the candidate
+        firstTally = self.data['results'][0]['tally']
+        self.hadNormalizedName = common.RESIDUAL_SURPLUS_TEXT in firstTally and \
+            self.searchText not in firstTally
+        self.isInTransfers = False
+
+    def visit_tally_result(self, round_i, result, tallyResult):
+        """ Look for it in the transfers """
+        if self.searchText in tallyResult['transfers']:
+            self.isInTransfers = True
+
+    def finish(self):
+        """ Add the candidate as if it was there all along: NormalizeSpecialNames
+            would have renamed it, moving it to the end of the first round """
+        if not self.isInTransfers:
+            return
+        if self.hadNormalizedName:
+            raise MigrationError(f"JSON cannot have both \"{self.searchText}\" and "
+                                 f"\"{common.RESIDUAL_SURPLUS_TEXT}\"")
+
+        firstTally = self.data['results'][0]['tally']
+        firstTally.pop(common.RESIDUAL_SURPLUS_TEXT, None)
+        firstTally[common.RESIDUAL_SURPLUS_TEXT] = 0.0
+        self.hasChanged = True
 
 
 class MakeTalliesANumber(JSONMigrateTask):
     """ Converts tally strings to numbers """
 
-    def do(self):
-        """ Run the migration """
-        results = self.data['results']
-        for result in results:
-            tally = result['tally']
-            for name in tally:
-                tally[name] = float(tally[name])
+    def visit_round(self, round_i, result):
+        """ Convert the tally, then the transfers """
+        tally = result['tally']
+        for name, votes in tally.items():
+            if not isinstance(votes, float):
+                tally[name] = float(votes)
+                self.hasChanged = True
 
-        for tallyResult in self._enumerate_tally_results():
-            xfers = tallyResult['transfers']
-            for name in xfers:
-                xfers[name] = float(xfers[name])
+        super().visit_round(round_i, result)
+
+    def visit_tally_result(self, round_i, result, tallyResult):
+        """ Convert the transfers """
+        xfers = tallyResult['transfers']
+        for name, votes in xfers.items():
+            if not isinstance(votes, float):
+                xfers[name] = float(votes)
+                self.hasChanged = True
 
 
 class HideDecimalsTask(JSONMigrateTask):
     """ If the config desired it - remove all decimal places """
 
-    def do(self):
-        """ Run the migration """
-        results = self.data['results']
-        for result in results:
-            tally = result['tally']
-            for name in tally:
-                tally[name] = round(tally[name])
+    def visit_round(self, round_i, result):
+        """ Round the tally, then the transfers """
+        tally = result['tally']
+        for name in tally:
+            tally[name] = round(tally[name])
+        self.hasChanged = True
 
-        for tallyResult in self._enumerate_tally_results():
-            xfers = tallyResult['transfers']
-            for name in xfers:
-                xfers[name] = round(xfers[name])
+        super().visit_round(round_i, result)
+
+    def visit_tally_result(self, round_i, result, tallyResult):
+        """ Round the transfers """
+        xfers = tallyResult['transfers']
+        for name in xfers:
+            xfers[name] = round(xfers[name])
 
 
 class MakeExhaustedAndSurplusACandidate(JSONMigrateTask):
     """ If there are "exhausted" ballots, make them a first-class citizen candidate """
 
-    def _make_it_a_candidate(self, searchText):
-        """ Call this if exhausted was found. """
-        numExhausted = 0
-        results = self.data['results']
-        for result in results:
-            result['tally'][searchText] = numExhausted
-            for tallyResult in result['tallyResults']:
-                if searchText in tallyResult['transfers']:
-                    numExhausted += tallyResult['transfers'][searchText]
+    searchTexts = (common.INACTIVE_TEXT, common.RESIDUAL_SURPLUS_TEXT)
 
-    def _make_it_a_candidate_if_in_transfers(self, searchText):
-        """ Looks for searchText in transfers OR in list of names.
-            If it exists, makes it a candidate. """
-        for result in self.data['results']:
+    def __init__(self, jsonData):
+        super().__init__(jsonData)
+
+        # A running count of votes transferred to each searchText
+        self.isFound = {searchText: False for searchText in self.searchTexts}
+        self.numVotes = {searchText: 0 for searchText in self.searchTexts}
+        self.numVotesPerRound = {searchText: [] for searchText in self.searchTexts}
+
+    def visit_round(self, round_i, result):
+        """ Look for each searchText in the tally, then in the transfers """
+        for searchText in self.searchTexts:
+            self.numVotesPerRound[searchText].append(self.numVotes[searchText])
             if searchText in result['tally']:
-                self._make_it_a_candidate(searchText)
-                return
+                self.isFound[searchText] = True
 
-        for tallyResult in self._enumerate_tally_results():
+        super().visit_round(round_i, result)
+
+    def visit_tally_result(self, round_i, result, tallyResult):
+        """ Count the votes transferred to each searchText """
+        for searchText in self.searchTexts:
             if searchText in tallyResult['transfers']:
-                self._make_it_a_candidate(searchText)
-                return
+                self.isFound[searchText] = True
+                self.numVotes[searchText] += tallyResult['transfers'][searchText]
 
-    def do(self):
+    def _make_it_a_candidate_if_found(self, searchText):
+        """ Looks for searchText in transfers OR in list of names.
+            If it exists, makes it a candidate. """
+        if not self.isFound[searchText]:
+            return
+
+        for result, numExhausted in zip(self.data['results'],
+                                        self.numVotesPerRound[searchText]):
+            previous = result['tally'].get(searchText)
+            if not isinstance(previous, type(numExhausted)) or previous != numExhausted:
+                self.hasChanged = True
+            result['tally'][searchText] = numExhausted
+
+    def finish(self):
         """ Run the migration, ensuring they are not already marked as candidates """
         if common.INACTIVE_TEXT not in self.data['results'][0]['tally']:
-            self._make_it_a_candidate_if_in_transfers(common.INACTIVE_TEXT)
+            self._make_it_a_candidate_if_found(common.INACTIVE_TEXT)
         if common.RESIDUAL_SURPLUS_TEXT not in self.data['results'][0]:
-            self._make_it_a_candidate_if_in_transfers(common.RESIDUAL_SURPLUS_TEXT)
+            self._make_it_a_candidate_if_found(common.RESIDUAL_SURPLUS_TEXT)
 
 
 class NormalizeSpecialNames(JSONMigrateTask):
     """ normalize names to their canonical, indexable names """
 
-    def do(self):
-        """ Run the migration """
+    def visit_round(self, round_i, result):
+        """ Rename each name in this round """
         for name, normalizedName in common.candidate_renames().items():
-            success = self.rename(name, normalizedName)
+            success = self.rename_in_round(result, name, normalizedName)
             if not success:
                 raise MigrationError(f"JSON cannot have both \"{name}\" and \"{normalizedName}\"")
 
@@ -179,83 +325,95 @@ class NormalizeSpecialNames(JSONMigrateTask):
 class FixRankitMissingTransfers(JSONMigrateTask):
     """ Rankit often forgets to eliminate candidates, they just drop them """
 
-    def _get_eliminations(self, round_i):
-        eliminatedNames = set()
-        for result in self.data['results'][round_i]['tallyResults']:
-            if 'eliminated' in result:
-                eliminatedNames.add(result['eliminated'])
-        return eliminatedNames
+    needsNextRound = True
 
-    def do(self):
-        """ Run the migration """
-        if not self.is_rankit_data():
-            return
+    def __init__(self, jsonData):
+        super().__init__(jsonData)
+        self.isRankit = self.is_rankit_data()
 
+    def visit_round(self, round_i, result):
+        """ Eliminate candidates who are missing from the next round """
         results = self.data['results']
-        for round_i in range(1, len(results)):
-            prevRound = results[round_i - 1]['tally']
-            thisRound = results[round_i]['tally']
-            eliminations = self._get_eliminations(round_i - 1)
+        if not self.isRankit or round_i == len(results) - 1:
+            return
+
+        thisRound = result['tally']
+        nextRound = results[round_i + 1]['tally']
+        eliminations = {r['eliminated'] for r in result['tallyResults'] if 'eliminated' in r}
 
-            for name in prevRound:
-                if name not in thisRound and name not in eliminations:
-                    newElimination = {'eliminated': name, 'transfers': {}}
-                    results[round_i - 1]['tallyResults'].append(newElimination)
+        for name in thisRound:
+            if name not in nextRound and name not in eliminations:
+                newElimination = {'eliminated': name, 'transfers': {}}
+                result['tallyResults'].append(newElimination)
+                self.hasChanged = True
 
 
 class FixRankitNoElimOnLastRound(JSONMigrateTask):
     """ Rankit incorrectly eliminates on the last round """
 
-    def do(self):
-        """ Run the migration """
-        if not self.is_rankit_data():
+    def __init__(self, jsonData):
+        super().__init__(jsonData)
+        self.isRankit = self.is_rankit_data()
+
+    def visit_round(self, round_i, result):
+        """ Only the last round needs fixing """
+        if not self.isRankit or round_i != len(self.data['results']) - 1:
             return
 
-        results = self.data['results']
-        lastRoundTally = results[-1]['tallyResults']
+        lastRoundTally = result['tallyResults']
         lastRoundTally = [r for r in lastRoundTally if 'eliminated' not in r]
-        results[-1]['tallyResults'] = lastRoundTally
+        if len(lastRoundTally) != len(result['tallyResults']):
+            self.hasChanged = True
+        result['tallyResults'] = lastRoundTally
 
 
 class FixRankitCombinedTallyResults(JSONMigrateTask):
     """ Rankit includes eliminations and elected on the same tallyResult """
 
-    def do(self):
-        """ Run the migration """
-        if not self.is_rankit_data():
+    def __init__(self, jsonData):
+        super().__init__(jsonData)
+        self.isRankit = self.is_rankit_data()
+
+    def visit_round(self, round_i, result):
+        """ Split the combined tallyResults """
+        if not self.isRankit:
             return
 
-        results = self.data['results']
-        for result in results:
-            toAppendAtEnd = []
-            for tallyResult in result['tallyResults']:
-                if 'elected' not in tallyResult or 'eliminated' not in tallyResult:
-                    continue
-                toSplit = tallyResult['elected']
-                del tallyResult['elected']
-                toAppendAtEnd.append({'elected': toSplit, 'transfers': {}})
-            result['tallyResults'].extend(toAppendAtEnd)
+        toAppendAtEnd = []
+        for tallyResult in result['tallyResults']:
+            if 'elected' not in tallyResult or 'eliminated' not in tallyResult:
+                continue
+            toSplit = tallyResult['elected']
+            del tallyResult['elected']
+            toAppendAtEnd.append({'elected': toSplit, 'transfers': {}})
+        if toAppendAtEnd:
+            self.hasChanged = True
+        result['tallyResults'].extend(toAppendAtEnd)
 
 
 class FixRankitMissingWinners(JSONMigrateTask):
     """ Rankit stops including Winner in tally after they win """
 
-    def do(self):
-        """ Run the migration """
-        if not self.is_rankit_data():
+    def __init__(self, jsonData):
+        super().__init__(jsonData)
+        self.isRankit = self.is_rankit_data()
+        self.winnerNamesToLastNumVotes = {}
+
+    def visit_round(self, round_i, result):
+        """ Add every previous winner who is missing from this round """
+        if not self.isRankit:
             return
 
-        winnerNamesToLastNumVotes = {}
-        for result in self.data['results']:
-            for tallyResult in result['tallyResults']:
-                if 'elected' not in tallyResult:
-                    continue
-                name = tallyResult['elected']
-                winnerNamesToLastNumVotes[name] = result['tally'][name]
+        for tallyResult in result['tallyResults']:
+            if 'elected' not in tallyResult:
+                continue
+            name = tallyResult['elected']
+            self.winnerNamesToLastNumVotes[name] = result['tally'][name]
 
-            for name, lastNumVotes in winnerNamesToLastNumVotes.items():
-                if name not in result['tally']:
-                    result['tally'][name] = lastNumVotes
+        for name, lastNumVotes in self.winnerNamesToLastNumVotes.items():
+            if name not in result['tally']:
+                result['tally'][name] = lastNumVotes
+                self.hasChanged = True
 
 
 class JSONReader:
@@ -265,19 +423,29 @@ class JSONReader:
     self.graph is a Graph object which is partially initialized (TODO how partially?)
     self.rounds is a list of Round objects
     self.items is a list of Item objects
+    self.neededMigrations is whether the migrations changed the data
     """
     graph: object
     rounds: list
     items: list
     eliminationOrder: list
+    neededMigrations: bool
 
-    def __init__(self, data):
-        self.parse_data(data)
-        self.graph.create_graph_from_rounds(self.rounds)
-        self.set_elimination_order(self.rounds, self.graph.items)
+    def __init__(self, data, applyMigrations=True, useCompactGraph=None):
+        with time_stage('migrate'):
+            self.parse_data(data, applyMigrations, useCompactGraph)
+        with time_stage('graph'):
+            self.graph.create_graph_from_rounds(self.rounds)
+            self.set_elimination_order(self.rounds, self.graph.items)
 
-    def parse_data(self, data):
-        """ Parses the JSON data, or raises an exception on failure """
+    def parse_data(self, data, applyMigrations=True, useCompactGraph=None):
+        """
+        Parses the JSON data, or raises an exception on failure.
+        Only skip the migrations if the data has already been migrated, e.g. if it
+        was loaded from a compiled election.
+        By default, large elections are loaded into a CompactGraph: pass
+        useCompactGraph=True or False to choose.
+        """
         def get_migration_tasks():
             return [FixNoTransfersTask,
                     FixUndeclaredUWITask,
@@ -306,7 +474,12 @@ class JSONReader:
             date = parse_date(data['config'].get('date'))
             threshold = data['config'].get('threshold')
 
-            graph = Graph(title)
+            if useCompactGraph is None:
+                isCompact = is_large_election(len(data['results']),
+                                              len(data['results'][0]['tally']))
+            else:
+                isCompact = useCompactGraph
+            graph = CompactGraph(title) if isCompact else Graph(title)
 
             if date is not None:
                 graph.set_date(date)
@@ -351,10 +524,12 @@ class JSONReader:
                 rounds.append(rnd)
             return rounds
 
-        # Apply migrations and configuration adjustments
-        self.tasks = get_migration_tasks()
-        for task in self.tasks:
-            task(data).do()
+        # Apply migrations and configuration adjustments, all in a single pass
+        self.tasks = get_migration_tasks() if applyMigrations else []
+        self.neededMigrations = False
+        if self.tasks:
+            engine = MigrationEngine(data, [task(data) for task in self.tasks])
+            self.neededMigrations = engine.run()
 
         graph = load_graph(data)
         items = initialize_items(data)
@@ -399,7 +574,7 @@ class JSONReader:
         # because our goal is an alphabetical candidate list, which is the reverse of
         # the elimination order
         reverseOrder = sorted(itemsRemaining, key=lambda x:
-                              (-self.graph.nodesPerRound[-1][x].count, x.name))
+                              (-rounds[-1].itemsToVotes[x], x.name))
         itemsRemaining = reversed(reverseOrder)
         eliminationOrder.extend(itemsRemaining)
         eliminationOrder.extend(winners)
@@ -0,0 +1,76 @@
+"""
+The homepage's lists of featured elections and of the most recent uploads. Each is cached
+until it changes (see visualizer.signal), so rendering the homepage needn't query either.
+"""
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.urls import reverse
+
+from common.cacheVersions import invalidate_paths
+from visualizer.models import HomepageFeaturedElection, HomepageFeaturedElectionColumn, \
+    JsonConfig
+
+MOST_RECENT_KEY = 'homepage.mostRecent'
+FEATURED_ELECTIONS_KEY = 'homepage.featuredElections'
+
+# How many of the most recent uploads are listed
+NUM_MOST_RECENT = 10
+
+# In case a change is missed, e.g. by a queryset's update()
+FRAGMENT_TIMEOUT = 60 * 60
+
+
+def _get_homepage_paths():
+    return ['/', reverse('index')]
+
+
+def get_most_recent():
+    """ The most recent public uploads, newest first """
+    mostRecent = cache.get(MOST_RECENT_KEY)
+    if mostRecent is None:
+        models = JsonConfig.get_all_public() \
+                           .order_by('-uploadedAt') \
+                           .only('slug', 'title', 'numRounds', 'numCandidates')[:NUM_MOST_RECENT]
+        mostRecent = [{'slug': model.slug,
+                       'title': model.title,
+                       'numRounds': model.numRounds,
+                       'numCandidates': model.numCandidates}
+                      for model in models]
+        cache.set(MOST_RECENT_KEY, mostRecent, FRAGMENT_TIMEOUT)
+    return mostRecent
+
+
+def get_featured_elections():
+    """ Each column of featured elections, with its links, in two queries """
+    featuredElections = cache.get(FEATURED_ELECTIONS_KEY)
+    if featuredElections is None:
+        links = HomepageFeaturedElection.objects.select_related('jsonConfig') \
+                                                .only('title', 'column', 'jsonConfig__slug')
+        columns = HomepageFeaturedElectionColumn.objects.prefetch_related(
+            Prefetch('links_in_column', queryset=links))
+        featuredElections = [{'title': column.title,
+                              'links': [{'slug': link.jsonConfig.slug,
+                                         'title': link.title}
+                                        for link in column.links_in_column.all()]}
+                             for column in columns]
+        cache.set(FEATURED_ELECTIONS_KEY, featuredElections, FRAGMENT_TIMEOUT)
+    return featuredElections
+
+
+def is_in_most_recent(jsonConfig):
+    """ Is the JsonConfig in the cached list of the most recent uploads? """
+    mostRecent = cache.get(MOST_RECENT_KEY)
+    return mostRecent is None or any(m['slug'] == jsonConfig.slug for m in mostRecent)
+
+
+def invalidate_most_recent():
+    """ The most recent uploads changed: invalidates them, and the cached homepage """
+    cache.delete(MOST_RECENT_KEY)
+    invalidate_paths(_get_homepage_paths())
+
+
+def invalidate_featured_elections():
+    """ The featured elections changed: invalidates them, and the cached homepage """
+    cache.delete(FEATURED_ELECTIONS_KEY)
+    invalidate_paths(_get_homepage_paths())
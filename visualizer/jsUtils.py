@@ -1,5 +1,6 @@
-""" A helper function for javascript-generating python """
+""" Helper functions for javascript-generating python """
 
+import json
 import string
 
 
@@ -25,3 +26,12 @@ def approx_length(stringToMeasure):
         else:
             size += 50
     return size * 6 / 1000.0  # Convert to picas
+
+
+# Characters which could end the inline <script> the JSON is embedded in
+_INLINE_JSON_ESCAPES = {ord('<'): '\\u003C', ord('>'): '\\u003E', ord('&'): '\\u0026'}
+
+
+def to_inline_json(data):
+    """ Serializes data as compact JSON which is safe to embed in an inline <script> """
+    return json.dumps(data, separators=(',', ':')).translate(_INLINE_JSON_ESCAPES)
@@ -0,0 +1,84 @@
+"""
+Management script to benchmark page generation on synthetic elections.
+Reports the time and peak memory of each stage, and compares them against a saved baseline.
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from visualizer.benchmark.benchmarkRunner import SCENARIOS,\
+    benchmark_scenario,\
+    find_regressions
+
+
+class Command(BaseCommand):
+    """
+    Runs the management script
+    """
+    help = 'Times each stage of page generation on synthetic elections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Which scenario to run. Repeat to run several. Default: all')
+        parser.add_argument('--candidates', type=int,
+                            help='Instead of the scenarios, run an election with this many '
+                                 'candidates (see also --winners and --rounds)')
+        parser.add_argument('--winners', type=int, default=1)
+        parser.add_argument('--rounds', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Report the fastest of this many runs')
+        parser.add_argument('--baseline', type=str, default=None,
+                            help='A baseline JSON file to compare against')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Save the results to the --baseline file')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Report stages this much slower than the baseline (0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError("--save-baseline requires --baseline")
+
+        if options['candidates']:
+            scenarios = {'custom': {'numCandidates': options['candidates'],
+                                    'numWinners': options['winners'],
+                                    'numRounds': options['rounds']}}
+        else:
+            names = options['scenario'] or SCENARIOS.keys()
+            scenarios = {name: SCENARIOS[name] for name in names}
+
+        results = {}
+        for name, scenario in scenarios.items():
+            results[name] = benchmark_scenario(scenario, options['repeat'], options['seed'])
+            self._write_results(name, results[name])
+
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}"))
+        elif options['baseline']:
+            self._compare_to_baseline(results, options['baseline'], options['tolerance'])
+
+    def _write_results(self, name, results):
+        """ Prints a table of the results of one scenario """
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        for stageName, result in results.items():
+            self.stdout.write(f"  {stageName:<12} {result['seconds'] * 1000:10.1f} ms"
+                              f" {result['peakMemory'] / 1024 / 1024:10.1f} MB")
+
+    def _compare_to_baseline(self, results, baselineFilename, tolerance):
+        """ Reports every regression, and fails if there are any """
+        if not os.path.exists(baselineFilename):
+            raise CommandError(f"No baseline at {baselineFilename}: run with --save-baseline")
+        with open(baselineFilename, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        regressions = find_regressions(results, baseline, tolerance)
+        for scenarioName, stageName, baselineSeconds, seconds in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"{scenarioName} {stageName}: {baselineSeconds * 1000:.1f} ms"
+                f" -> {seconds * 1000:.1f} ms"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} stages are slower than the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
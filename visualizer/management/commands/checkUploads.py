@@ -2,22 +2,42 @@
 Managament script to ensure the last N uploads can still be loaded.
 If you need something more heavy-handed than the unit tests, check this
 against the production database.
+Loads them in parallel, and can report the slowest uploads and compare against a
+report from an earlier run: see visualizer.benchmark.corpusRunner.
 """
-from django.core.management.base import BaseCommand, CommandError
-
+from visualizer.benchmark.corpusCommand import CorpusCommand
+from visualizer.benchmark.corpusRunner import make_item, make_unreadable_item
 from visualizer.models import JsonConfig
-from common.viewUtils import get_data_for_view
+from common.viewUtils import DefaultConfig
+
+
+def _read(fieldFile):
+    """ Reads an uploaded file's content """
+    with fieldFile.open('rb') as f:
+        return f.read()
+
 
+def _make_config(jsonConfig):
+    """ A copy of the options which affect rendering, which can be sent to another process """
+    config = DefaultConfig()
+    config.onlyShowWinnersTabular = jsonConfig.onlyShowWinnersTabular
+    config.textForWinner = jsonConfig.textForWinner
+    config.isPreferentialBlock = jsonConfig.isPreferentialBlock
+    config.excludeFinalWinnerAndEliminatedCandidate = \
+        jsonConfig.excludeFinalWinnerAndEliminatedCandidate
+    return config
 
-class Command(BaseCommand):
+
+class Command(CorpusCommand):
     """
     Runs the management script
     """
-    help = 'Closes the specified poll for voting'
+    help = 'Checks that the most recent uploads can still be loaded, and times them'
 
     def add_arguments(self, parser):
         parser.add_argument('start', type=int)  # Allow you to skip some if you've fixed em
         parser.add_argument('count', type=int)  # Max number to look at
+        super().add_arguments(parser)
 
     def handle(self, *args, **options):
         start = options['start']
@@ -25,13 +45,19 @@ class Command(BaseCommand):
         end = start + count
         allJsonConfigs = JsonConfig.objects.all().order_by('-id')  # pylint: disable=no-member
         allJsonConfigs = allJsonConfigs[start:end]
-        for i, jsonConfig in enumerate(allJsonConfigs):
+        self.check_corpus(self._items(allJsonConfigs, start), options,
+                          "Successfully loaded configs")
+
+    @classmethod
+    def _items(cls, jsonConfigs, start):
+        """ Reads each upload, as it is needed """
+        for i, jsonConfig in enumerate(jsonConfigs.iterator()):
             index = start + i
             try:
-                get_data_for_view(jsonConfig)
-                self.stdout.write(self.style.SUCCESS(
-                    f"{index}: Successfully loaded {jsonConfig.slug}"))
+                sidecarContent = None
+                if jsonConfig.candidateSidecarFile:
+                    sidecarContent = _read(jsonConfig.candidateSidecarFile)
+                yield make_item(jsonConfig.slug, _read(jsonConfig.jsonFile),
+                                _make_config(jsonConfig), sidecarContent, index)
             except Exception as exc:  # pylint: disable=broad-except
-                raise CommandError(f'Could not load {jsonConfig.slug}: ' + str(exc)) from exc
-
-        self.stdout.write(self.style.SUCCESS("Successfully loaded configs"))
+                yield make_unreadable_item(jsonConfig.slug, exc, index)
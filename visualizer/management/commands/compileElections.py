@@ -0,0 +1,40 @@
+"""
+Management script to compile elections uploaded before compiled elections existed,
+or compiled with an older format version. Until then, views read the files directly.
+"""
+from django.core.management.base import BaseCommand
+
+from visualizer.graph.compiledElection import is_compiled_election_current
+from visualizer.models import JsonConfig
+
+
+class Command(BaseCommand):
+    """
+    Runs the management script
+    """
+    help = 'Compiles every election whose compiled data is missing or outdated'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Recompile even if the compiled election is current')
+
+    def handle(self, *args, **options):
+        numCompiled = 0
+        numFailed = 0
+        for jsonConfig in JsonConfig.objects.all().order_by('-id').iterator():
+            if not options['force'] and \
+                    is_compiled_election_current(jsonConfig.compiledElection):
+                continue
+
+            jsonConfig.compile()
+            if jsonConfig.compiledElection is None:
+                numFailed += 1
+                self.stdout.write(self.style.WARNING(f"Could not compile {jsonConfig.slug}"))
+                continue
+
+            # Don't trigger a cache purge for every election
+            jsonConfig.save_compiled_election()
+            numCompiled += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compiled {numCompiled} elections, {numFailed} failed"))
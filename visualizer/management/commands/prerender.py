@@ -0,0 +1,73 @@
+"""
+Management script to pre-render elections after a deploy or a scrape, so their first
+visitors get a cached page. See common.prerender.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from common.prerender import get_election_page_targets,\
+    get_featured_slugs,\
+    get_recent_slugs,\
+    prerender
+
+
+class Command(BaseCommand):
+    """
+    Runs the management script
+    """
+    help = 'Compiles and caches the pages of recent, featured or election-page elections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recent', type=int, default=0,
+                            help='Pre-render this many of the most recent uploads')
+        parser.add_argument('--featured', action='store_true',
+                            help='Pre-render the elections featured on the homepage')
+        parser.add_argument('--election-page', action='append', default=[],
+                            help='Pre-render this election page and every election on it. '
+                                 'Repeat for several pages')
+        parser.add_argument('--all-election-pages', action='store_true',
+                            help='Pre-render every election page and every election on them')
+        parser.add_argument('--slug', action='append', default=[],
+                            help='Pre-render this election. Repeat for several elections')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='How many elections to pre-render at a time')
+        parser.add_argument('--host', type=str, default=None,
+                            help='The host to cache pages for. Default: the current Site')
+
+    def handle(self, *args, **options):
+        slugs = list(options['slug'])
+        if options['recent']:
+            slugs += get_recent_slugs(options['recent'])
+        if options['featured']:
+            slugs += get_featured_slugs()
+
+        paths = []
+        if options['all_election_pages'] or options['election_page']:
+            pageSlugs = None if options['all_election_pages'] else options['election_page']
+            paths, pageElectionSlugs = get_election_page_targets(pageSlugs)
+            slugs += pageElectionSlugs
+
+        # Remove duplicates, keeping the order
+        slugs = list(dict.fromkeys(slugs))
+        if not slugs and not paths:
+            raise CommandError("Nothing to pre-render: choose --recent, --featured, --slug, "
+                               "--election-page or --all-election-pages")
+
+        failures = prerender(slugs, paths,
+                             numWorkers=options['workers'],
+                             host=options['host'],
+                             onProgress=self._write_progress)
+
+        message = f"Pre-rendered {len(slugs)} elections and {len(paths)} election pages, " \
+                  f"{len(failures)} pages failed"
+        if failures:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def _write_progress(self, numDone, numTotal, target, failures):
+        """ Prints one line per election or page """
+        if failures:
+            self.stdout.write(self.style.WARNING(
+                f"[{numDone}/{numTotal}] {target}: failed {', '.join(failures)}"))
+        else:
+            self.stdout.write(f"[{numDone}/{numTotal}] {target}")
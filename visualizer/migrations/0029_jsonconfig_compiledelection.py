@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0028_remove_jsonconfig_dousehorizontalbargraph_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jsonconfig',
+            name='compiledElection',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
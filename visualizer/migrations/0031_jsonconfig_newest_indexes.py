@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0030_jsonconfig_updatedat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jsonconfig',
+            index=models.Index(fields=['-uploadedAt', '-id'], name='jsonconfig_newest'),
+        ),
+        migrations.AddIndex(
+            model_name='jsonconfig',
+            index=models.Index(fields=['owner', '-uploadedAt', '-id'], name='jsonconfig_owner_newest'),
+        ),
+    ]
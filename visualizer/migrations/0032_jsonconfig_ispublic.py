@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+def set_is_public(apps, schema_editor):
+    """ Uploads by private users are not public """
+    JsonConfig = apps.get_model('visualizer', 'JsonConfig')
+    JsonConfig.objects.filter(owner__userprofile__isPrivate=True).update(isPublic=False)
+
+
+def reverse_func(apps, schema_editor):
+    """ Not needed: code to reverse the migration """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_userprofile_isprivate'),
+        ('visualizer', '0031_jsonconfig_newest_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jsonconfig',
+            name='isPublic',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='jsonconfig',
+            index=models.Index(fields=['isPublic', '-uploadedAt'], name='jsonconfig_public_newest'),
+        ),
+        migrations.RunPython(set_is_public, reverse_func),
+    ]
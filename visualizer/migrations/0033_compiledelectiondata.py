@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_compiled_elections(apps, schema_editor):
+    """ Moves each compiled election to its own table """
+    JsonConfig = apps.get_model('visualizer', 'JsonConfig')
+    CompiledElectionData = apps.get_model('visualizer', 'CompiledElectionData')
+    compiled = JsonConfig.objects.filter(compiledElection__isnull=False) \
+                                 .values_list('pk', 'compiledElection')
+    batch = []
+    for pk, data in compiled.iterator(chunk_size=100):
+        batch.append(CompiledElectionData(jsonConfig_id=pk, data=data))
+        if len(batch) == 100:
+            CompiledElectionData.objects.bulk_create(batch)
+            batch = []
+    CompiledElectionData.objects.bulk_create(batch)
+
+
+def reverse_func(apps, schema_editor):
+    """ Not needed: views read the files until compileElections is run """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visualizer', '0032_jsonconfig_ispublic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompiledElectionData',
+            fields=[
+                ('jsonConfig', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compiledElectionData', serialize=False, to='visualizer.jsonconfig')),
+                ('data', models.JSONField()),
+            ],
+        ),
+        migrations.RunPython(move_compiled_elections, reverse_func),
+        migrations.RemoveField(
+            model_name='jsonconfig',
+            name='compiledElection',
+        ),
+    ]
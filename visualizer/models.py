@@ -1,13 +1,24 @@
 """ The django object models """
 
+import logging
+import re
+
 from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
 from django.urls import reverse
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
 from common.cloudflare import CloudflareAPI
+from visualizer.graph import compiledElection
+
+logger = logging.getLogger(__name__)
+
+# Sent once JsonConfig.save has purged its cached pages (which may be after the save, in
+# CloudflareAPI.coalesce_purges), with the arguments of post_save: unlike post_save,
+# anything rendered now is cached under the new versions.
+jsonConfigPurged = Signal()
 
 
 class ColorTheme(models.IntegerChoices):
@@ -42,7 +53,11 @@ class MovieGenerationStatuses(models.IntegerChoices):
     FAILED = 5, _('Failed')
 
 
-class JsonConfig(models.Model):
+# The compiled election of a JsonConfig which hasn't been read from the database yet
+_NOT_LOADED = object()
+
+
+class JsonConfig(models.Model):  # pylint: disable=too-many-instance-attributes
     """ A Json file representing a single election, and its configuration """
     detail_views = ('visualizer.views.Visualize',)
 
@@ -50,6 +65,7 @@ class JsonConfig(models.Model):
     candidateSidecarFile = models.FileField(null=True, blank=True)
     slug = models.SlugField(unique=True, max_length=255)
     uploadedAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         related_name='this_users_jsons',
@@ -61,6 +77,10 @@ class JsonConfig(models.Model):
     numRounds = models.IntegerField()
     numCandidates = models.IntegerField()
 
+    # Whether it may be listed publicly: on the homepage and in the sitemap. Denormalized from
+    # the owner's UserProfile.isPrivate: set on each save, and kept in sync by accounts.signal.
+    isPublic = models.BooleanField(default=True, editable=False)
+
     dataSourceURL = models.URLField(max_length=512, null=True, blank=True)
     areResultsCertified = models.BooleanField(default=False)
     textForWinner = models.IntegerField(choices=TextForWinner.choices, default=0)
@@ -97,6 +117,24 @@ class JsonConfig(models.Model):
     excludeFinalWinnerAndEliminatedCandidate = models.BooleanField(default=False)
     hideDecimals = models.BooleanField(default=False)
 
+    # Set by validatedElection, until the next save
+    _validatedElection = None
+
+    # The compiled election: see the compiledElection property
+    _compiledElection = _NOT_LOADED
+    _isCompiledElectionChanged = False
+
+    # Set by save: whether it became public or private, e.g. when moved to another owner
+    wasPublicityChanged = False
+
+    class Meta:
+        """ Indexes for listing uploads newest first: see views.NewestFirstPagination """
+        indexes = [
+            models.Index(fields=['-uploadedAt', '-id'], name='jsonconfig_newest'),
+            models.Index(fields=['owner', '-uploadedAt', '-id'], name='jsonconfig_owner_newest'),
+            models.Index(fields=['isPublic', '-uploadedAt'], name='jsonconfig_public_newest'),
+        ]
+
     @classmethod
     def get_all_non_auto_fields(cls):
         """ All editable fields of JsonConfig - must be kept up to date with the list
@@ -122,27 +160,53 @@ class JsonConfig(models.Model):
     @classmethod
     def get_all_public(cls):
         """ Returns users whose data can be included in sitemap & index """
-        userModel = get_user_model()
-        privateUsers = userModel.objects.filter(userprofile__isPrivate=True)
-        return JsonConfig.objects.all().exclude(owner__in=privateUsers)
+        return JsonConfig.objects.filter(isPublic=True)
 
-    def _get_unique_slug(self):
-        # loop until the name is unique
-        slug = slugify(self.title)
+    def _is_owner_public(self):
+        """ Is the owner public, i.e. not a private user? """
+        owner = self.owner
+        return owner is None or not hasattr(owner, 'userprofile') or \
+            not owner.userprofile.isPrivate
+
+    @classmethod
+    def _get_base_slug(cls, title):
+        slug = slugify(title)
         if slug.endswith('json'):
             slug = slug[:-4]
 
         # at most 220 chars for slug, 20 for title, leaving 15 for numbers
-        slug = slug[:220]
+        return slug[:220]
 
-        # loop until the name is unique
-        num = 1
-        uniqueSlug = slug
-        while JsonConfig.objects.filter(slug=uniqueSlug).exists():
-            uniqueSlug = f'{slug}-{num}'
-            num += 1
+    @classmethod
+    def get_unique_slugs(cls, titles):
+        """
+        Returns a unique slug for each title, unique among each other too, with one query.
+        A taken slug gets the first free numbered suffix, e.g. title-1, title-2...
+        """
+        baseSlugs = [cls._get_base_slug(title) for title in titles]
+        if not baseSlugs:
+            return []
+
+        # Every slug taken by one of these titles, with or without a suffix
+        query = models.Q()
+        for baseSlug in set(baseSlugs):
+            query |= models.Q(slug__regex=rf'^{re.escape(baseSlug)}(-[0-9]+)?$')
+        takenSlugs = set(cls.objects.filter(query).values_list('slug', flat=True))
+
+        uniqueSlugs = []
+        for baseSlug in baseSlugs:
+            # loop until the name is unique
+            num = 1
+            uniqueSlug = baseSlug
+            while uniqueSlug in takenSlugs:
+                uniqueSlug = f'{baseSlug}-{num}'
+                num += 1
+            takenSlugs.add(uniqueSlug)
+            uniqueSlugs.append(uniqueSlug)
+        return uniqueSlugs
 
-        return uniqueSlug
+    def _get_unique_slug(self):
+        return self.get_unique_slugs([self.title])[0]
 
     def __str__(self):
         return f"{self.slug}: {self.title}"
@@ -151,16 +215,137 @@ class JsonConfig(models.Model):
         """ Used in the admin panel to have a "Visit Site" link """
         return reverse('visualize', args=(self.slug,))
 
+    @property
+    def validatedElection(self):
+        """
+        The validators.ValidatedElection of the files about to be saved: if set, saving uses
+        its compiled election rather than reading and compiling the files again. Can be
+        passed to the constructor, or set by a serializer.
+        """
+        return self._validatedElection
+
+    @validatedElection.setter
+    def validatedElection(self, validatedElection):
+        self._validatedElection = validatedElection
+
+    @property
+    def compiledElection(self):
+        """
+        The jsonFile and candidateSidecarFile, compiled when saved so views don't need
+        to re-parse them, or None. See visualizer.graph.compiledElection.
+        It's large, so it's kept in its own table (see CompiledElectionData),
+        and only read the first time it's used.
+        """
+        if self._compiledElection is _NOT_LOADED:
+            self._compiledElection = None
+            if self.pk is not None:
+                self._compiledElection = CompiledElectionData.objects \
+                    .filter(jsonConfig_id=self.pk) \
+                    .values_list('data', flat=True) \
+                    .first()
+        return self._compiledElection
+
+    @compiledElection.setter
+    def compiledElection(self, data):
+        self._compiledElection = data
+        self._isCompiledElectionChanged = True
+
+    def save_compiled_election(self):
+        """
+        Saves the compiled election, if it changed, without saving anything else:
+        so, unlike save, this neither purges nor invalidates anything
+        """
+        if not self._isCompiledElectionChanged:
+            return
+        if self._compiledElection is None:
+            CompiledElectionData.objects.filter(jsonConfig_id=self.pk).delete()
+        else:
+            CompiledElectionData.objects.update_or_create(
+                jsonConfig_id=self.pk, defaults={'data': self._compiledElection})
+        self._isCompiledElectionChanged = False
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        # Not when loading a deferred field: only when reloading everything
+        if fields is None:
+            self._compiledElection = _NOT_LOADED
+            self._isCompiledElectionChanged = False
+
+    def _is_compilation_needed(self):
+        """ Has either file changed, or is the compiled election missing or outdated? """
+        # pylint: disable=protected-access,no-member
+        if not self.jsonFile._committed or not self.candidateSidecarFile._committed:
+            return True
+        if not compiledElection.is_compiled_election_current(self.compiledElection):
+            return True
+        hasSidecar = bool(self.candidateSidecarFile)
+        return hasSidecar != (self.compiledElection['sidecar'] is not None)
+
+    def compile(self):
+        """
+        Compiles the jsonFile and candidateSidecarFile. Does not save the model.
+        On failure, the compiled election is cleared and views will read the files directly.
+        """
+        sidecarFile = self.candidateSidecarFile if self.candidateSidecarFile else None
+        try:
+            self.jsonFile.seek(0)
+            if sidecarFile:
+                sidecarFile.seek(0)
+            self.compiledElection = compiledElection.compile_election(self.jsonFile, sidecarFile)
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Could not compile %s", self.slug, exc_info=True)
+            self.compiledElection = None
+        finally:
+            # Rewind, since the files may not have been written to storage yet
+            self.jsonFile.seek(0)
+            if sidecarFile:
+                sidecarFile.seek(0)
+
     # pylint: disable=signature-differs
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = self._get_unique_slug()
 
-        if not self._state.adding:
-            # Model is being updated, not created. Clear the cache.
+        # The owner may have changed: this is one lookup of the profile
+        isPublic = self._is_owner_public()
+        self.wasPublicityChanged = not self._state.adding and isPublic != self.isPublic
+        self.isPublic = isPublic
+
+        if self._validatedElection is not None:
+            self.compiledElection = self._validatedElection.compiledElection
+            self._validatedElection = None
+        elif self.jsonFile and self._is_compilation_needed():
+            self.compile()
+
+        isUpdate = not self._state.adding
+
+        # Saved together, so the compiled election always matches the files
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.save_compiled_election()
+
+        if isUpdate:
+            # Model was updated, not created. Clear the cache, now that the
+            # new data is saved so it can't be cached under the new version.
+            # (A new upload invalidates the homepage instead: see visualizer.signal.)
             CloudflareAPI.purge_vis_cache(self.slug)
 
-        super().save(*args, **kwargs)
+        CloudflareAPI.after_purge(lambda: jsonConfigPurged.send(
+            sender=JsonConfig, instance=self, created=not isUpdate))
+
+
+class CompiledElectionData(models.Model):
+    """
+    The compiled election of a JsonConfig (see JsonConfig.compiledElection): kept out of
+    the JsonConfig table, so the many queries which don't build a graph never load it
+    """
+    jsonConfig = models.OneToOneField(JsonConfig, on_delete=models.CASCADE, primary_key=True,
+                                      related_name='compiledElectionData')
+
+    data = models.JSONField()
+
+    def __str__(self):
+        return str(self.jsonConfig_id)
 
 
 class HomepageFeaturedElectionColumn(models.Model):
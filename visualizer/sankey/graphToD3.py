@@ -1,36 +1,38 @@
-import json
+""" Creates the data for the d3 sankey diagram """
 
-from visualizer.jsUtils import approx_length
+from visualizer.jsUtils import approx_length, to_inline_json
 
 
-class D3Sankey:
+class D3Sankey:  # pylint: disable=too-few-public-methods
+    """
+    The data for sankey-wrapper.js: data is a JSON-serializable dict,
+    and json is that dict serialized once, ready to embed in the page.
+    """
+
     def __init__(self, graph):
-        longestLabelApxWidth = max([approx_length(n.label)
-                                    for n in graph.nodesPerRound[0].values()])
+        longestLabelApxWidth = max(approx_length(n.label)
+                                   for n in graph.nodesPerRound[0].values())
         totalVotesPerRound = [r.totalActiveVotes for r in graph.summary.rounds]
-        js = ''
-        js += f'numRounds = {graph.numRounds};\n'
-        js += f'numCandidates = {len(graph.nodesPerRound[0])} ;\n'
-        js += f'longestLabelApxWidth = {longestLabelApxWidth};\n'
-        js += f'totalVotesPerRound = {totalVotesPerRound};\n'
-        js += 'graph = {"nodes" : [], "links" : []};\n'
 
         # Maps Items to a unique index. Used for color indexing.
         indices = {item: i for i, item in enumerate(graph.eliminationOrder)}
 
+        nodes = []
         nodeIndices = {}
-        for i, node in enumerate(graph.nodes):
+        for node in graph.nodes:
             # Skip inactive (exhausted) nodes
             if not node.item.isActive:
                 continue
 
-            nodeIndices[node] = i
-            js += f'graph.nodes.push({{ "name": {json.dumps(node.label)},\n'
-            js += f'                    "round": {node.roundNum},\n'
-            js += f'                    "value": {node.count},\n'
-            js += f'                    "isWinner": {int(node.isWinner)},\n'
-            js += f'                    "isEliminated": {int(node.isEliminated)},\n'
-            js += f'                    "index": "{indices[node.item]}"}});\n'
+            nodeIndices[node] = len(nodes)
+            nodes.append({'name': node.label,
+                          'round': node.roundNum,
+                          'value': node.count,
+                          'isWinner': int(node.isWinner),
+                          'isEliminated': int(node.isEliminated),
+                          'index': indices[node.item]})
+
+        links = []
         for link in graph.links:
             # Skip inactive (exhausted) nodes
             if not link.source.item.isActive:
@@ -38,10 +40,16 @@ class D3Sankey:
             if not link.target.item.isActive:
                 continue
 
-            sourceIndex = nodeIndices[link.source]
-            targetIndex = nodeIndices[link.target]
-            js += f'graph.links.push({{ "source": {sourceIndex},\n'
-            js += f'                    "target": {targetIndex},\n'
-            js += f'            "candidateIndex": {indices[link.source.item]},\n'
-            js += f'                     "value": {link.value:0.3f} }});\n'
-        self.js = js
+            links.append({'source': nodeIndices[link.source],
+                          'target': nodeIndices[link.target],
+                          'candidateIndex': indices[link.source.item],
+                          'value': round(link.value, 3)})
+
+        self.data = {
+            'numRounds': graph.numRounds,
+            'numCandidates': len(graph.nodesPerRound[0]),
+            'longestLabelApxWidth': longestLabelApxWidth,
+            'totalVotesPerRound': totalVotesPerRound,
+            'graph': {'nodes': nodes, 'links': links},
+        }
+        self.json = to_inline_json(self.data)
@@ -7,6 +7,7 @@ import plotly.offline as py
 
 class PlotlySankey:
     def __init__(self, graph):
+        nodeIndices = {node: i for i, node in enumerate(graph.nodes)}
         data_trace = dict(
             type='sankey',
             domain=dict(
@@ -25,8 +26,8 @@ class PlotlySankey:
                 color=[n.color for n in graph.nodes]
             ),
             link=dict(
-                source=[graph.nodes.index(l.source) for l in graph.links],
-                target=[graph.nodes.index(l.target) for l in graph.links],
+                source=[nodeIndices[l.source] for l in graph.links],
+                target=[nodeIndices[l.target] for l in graph.links],
                 value=[l.value for l in graph.links],
                 color=[l.color for l in graph.links]
             )
@@ -11,7 +11,7 @@ from visualizer.graph.graphCreator import BadJSONError
 from visualizer.models import TextForWinner
 from visualizer.sidecar.reader import BadSidecarError
 from .models import JsonConfig
-from .validators import try_to_load_jsons
+from .validators import validate_election
 
 
 class BaseVisualizationSerializer(serializers.HyperlinkedModelSerializer):
@@ -35,6 +35,34 @@ class BaseVisualizationSerializer(serializers.HyperlinkedModelSerializer):
         read_only_but_validate_fields = ('numRounds', 'numCandidates', 'title')
         fields = read_only_fields + read_only_but_validate_fields
 
+    # The URLs added by to_representation
+    urlFields = ('visualizeUrl', 'embedUrl', 'embedSankeyUrl', 'embedTableUrl',
+                 'oembedEndpointUrl')
+
+    def __init__(self, *args, **kwargs):
+        """ Drops the fields not requested with ?fields=, so they aren't serialized """
+        super().__init__(*args, **kwargs)
+
+        requestedFields = self.get_requested_fields()
+        if requestedFields is None:
+            return
+        unknownFields = requestedFields - set(self.fields) - set(self.urlFields)
+        if unknownFields:
+            raise serializers.ValidationError(
+                {'fields': ['Unknown fields: ' + ', '.join(sorted(unknownFields))]})
+        for field in set(self.fields) - requestedFields:
+            self.fields.pop(field)
+
+    def get_requested_fields(self):
+        """
+        When reading, a comma-separated list of fields may be requested with ?fields=,
+        e.g. ?fields=slug,title,visualizeUrl. Returns the set of them, or None for every field.
+        """
+        request = self.context.get('request')
+        if request is None or request.method != 'GET' or 'fields' not in request.query_params:
+            return None
+        return set(request.query_params['fields'].split(','))
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         request = self.context['request']
@@ -52,14 +80,53 @@ class BaseVisualizationSerializer(serializers.HyperlinkedModelSerializer):
         data['embedSankeyUrl'] = request.build_absolute_uri(embedRelativeSankeyUrl)
         data['embedTableUrl'] = request.build_absolute_uri(embedRelativeTableUrl)
         data['oembedEndpointUrl'] = request.build_absolute_uri(oembedRelativeUrl)
+
+        requestedFields = self.get_requested_fields()
+        if requestedFields is not None:
+            for field in set(self.urlFields) - requestedFields:
+                del data[field]
         return data
 
     def to_internal_value(self, data):
         """ Before saving from the REST API, populates all required data """
+        data = self.rename_fields(data)
+
         # Sanity check: no superfluous fields
         self.check_for_superfluous_fields_before_modification(data)
 
         # Validate data, checking for errors but not raising exceptions.
+        # The files may have been validated already, e.g. alongside others in a batch.
+        validatedElection = self.context.get('validatedElection')
+        if validatedElection is None:
+            validatedElection = self.validate_election_or_errors(
+                *self.get_files_to_validate(data))
+
+        if 'jsonFile' in data:
+            # Only update these fields if the jsonFile changed
+            self.populate_dict_with_json_data(data, validatedElection.graph)
+
+        # Now run all other validations
+        data = super().to_internal_value(data)
+
+        # Saved with the model, so it doesn't read and compile the files again
+        data['validatedElection'] = validatedElection
+
+        return data
+
+        # validations happen after this point...
+
+    def rename_fields(self, data):
+        """
+        Subclasses may accept fields under other names: this renames them, in place,
+        to the model's fields. Raises a ValidationError if they are misused.
+        """
+        return data
+
+    def get_files_to_validate(self, data):
+        """
+        Returns the jsonFile and candidateSidecarFile (or None) which would be saved,
+        given the (renamed) data
+        """
         if self.instance:
             # Updating: if the field is not provided, grab it from self.instance.
             jsonFile = data.get('jsonFile', self.instance.jsonFile)
@@ -77,24 +144,13 @@ class BaseVisualizationSerializer(serializers.HyperlinkedModelSerializer):
             # Creating: if the field is not provided, it does not exist. Treat it as None.
             jsonFile = data.get('jsonFile')
             candidateSidecarFile = data.get('candidateSidecarFile')
-        graph = self.load_graph_or_errors(jsonFile, candidateSidecarFile)
-
-        if 'jsonFile' in data:
-            # Only update these fields if the jsonFile changed
-            self.populate_dict_with_json_data(data, graph)
-
-        # Now run all other validations
-        data = super().to_internal_value(data)
-
-        return data
-
-        # validations happen after this point...
+        return jsonFile, candidateSidecarFile
 
     @classmethod
-    def load_graph_or_errors(cls, jsonFile, candidateSidecarFile):
-        """ Returns the graph, or raises an error if it cannot. """
+    def validate_election_or_errors(cls, jsonFile, candidateSidecarFile):
+        """ Returns the validators.ValidatedElection, or raises an error if it cannot. """
         try:
-            return try_to_load_jsons(jsonFile, candidateSidecarFile)
+            return validate_election(jsonFile, candidateSidecarFile)
         except BadJSONError as exc:
             errorMessage = traceback.format_exc()
             raise serializers.ValidationError(
@@ -170,7 +226,7 @@ class BallotpediaSerializer(BaseVisualizationSerializer):
                      'owner')
         fields = BaseVisualizationSerializer.Meta.fields + bp_fields
 
-    def to_internal_value(self, data):
+    def rename_fields(self, data):
         """
         Instead of jsonFile, this endpoint uses the more-descriptive "resultsSummaryFile".
         Rename resultsSummaryFile to jsonFile here.
@@ -198,7 +254,7 @@ class BallotpediaSerializer(BaseVisualizationSerializer):
 
             del data['isPrimary']
 
-        return super().to_internal_value(data)
+        return data
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -54,12 +54,13 @@ class SidecarReader:
         if len(actualNames) != len(expectedNames):
             raise BadSidecarError("The candidate order must include all candidates. " +
                                   f"Expected: {expectedNames}, received: {actualNames}")
+        expectedNameSet = set(expectedNames)
         for candidate in self.data['order']:
-            self._expect_in(expectedNames, "the actual candidates", candidate)
+            self._expect_in(expectedNameSet, "the actual candidates", candidate)
 
         # Not all candidates must have info, but all infos must be candidates
         for candidate, info in self.data['info'].items():
-            self._expect_in(expectedNames, "the actual candidates", candidate)
+            self._expect_in(expectedNameSet, "the actual candidates", candidate)
             self._expect_in(info, "the candidate info", 'incumbent')
 
             assert isinstance(info['incumbent'], bool)
@@ -0,0 +1,38 @@
+"""
+Signals that invalidate the homepage's cached lists (see visualizer.homepage)
+when the featured elections or the most recent uploads change
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from visualizer import homepage
+from visualizer.models import HomepageFeaturedElection, HomepageFeaturedElectionColumn, \
+    JsonConfig
+
+
+# pylint: disable=unused-argument
+@receiver(post_save, sender=JsonConfig)
+def invalidate_most_recent_on_save(sender, instance, created, **kwargs):
+    """
+    A new upload is listed on the homepage, an update may change a listed one,
+    and an upload moved to another owner may become public or private
+    """
+    if created or instance.wasPublicityChanged or homepage.is_in_most_recent(instance):
+        homepage.invalidate_most_recent()
+
+
+@receiver(post_delete, sender=JsonConfig)
+def invalidate_most_recent_on_delete(sender, instance, **kwargs):
+    """ A deleted upload may have been listed on the homepage """
+    if homepage.is_in_most_recent(instance):
+        homepage.invalidate_most_recent()
+
+
+@receiver(post_save, sender=HomepageFeaturedElection)
+@receiver(post_delete, sender=HomepageFeaturedElection)
+@receiver(post_save, sender=HomepageFeaturedElectionColumn)
+@receiver(post_delete, sender=HomepageFeaturedElectionColumn)
+def invalidate_featured_elections(sender, **kwargs):
+    """ A featured election or column was added, changed or removed """
+    homepage.invalidate_featured_elections()
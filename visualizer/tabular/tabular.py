@@ -20,7 +20,7 @@ class TabulateByRoundInteractive:
     def __init__(self, graph, config):
         summary = graph.summarize()
         self.rounds = []
-        lastRoundEliminated = []  # eliminated only show one round later
+        lastRoundEliminated = set()  # eliminated only show one round later
         alreadyWonInRound = {}  # Contains winners in previous rounds, 1-indexed
         for roundNum, roundData in enumerate(summary.rounds):
             for winnerName in roundData.winnerNames:
@@ -28,8 +28,8 @@ class TabulateByRoundInteractive:
             rnd = []
             for item, cinfo in summary.candidates.items():
                 d = {}
-                isEliminatedThisRound = cinfo.name in roundData.eliminatedNames
-                isElectedThisRound = cinfo.name in roundData.winnerNames
+                isEliminatedThisRound = roundData.is_eliminated(cinfo.name)
+                isElectedThisRound = roundData.is_winner(cinfo.name)
                 isElectedPrevRound = cinfo.name in alreadyWonInRound
                 if isEliminatedThisRound:
                     d['change'] = "Eliminated: " + changify(-cinfo.totalVotesPerRound[-1])
@@ -64,13 +64,13 @@ class TabulateByRoundInteractive:
                     d['primaryLabel'], d['secondaryLabel'] = makePrimarySecondaryLabels(
                         myNumVotes, allVotes, item)
                 d['name'] = cinfo.name
-                d['wonThisRound'] = cinfo.name in roundData.winnerNames
+                d['wonThisRound'] = isElectedThisRound
                 d['eliminatedThisRound'] = isEliminatedThisRound
                 d['isWinner'] = isElectedPrevRound
                 d['isEliminated'] = cinfo.name in lastRoundEliminated or \
                     d['eliminatedThisRound']
                 rnd.append(d)
-            lastRoundEliminated = roundData.eliminatedNames
+            lastRoundEliminated = set(roundData.eliminatedNames)
             self.rounds.append(rnd)
 
 
@@ -147,8 +147,8 @@ class OneCandidateOneRound:
         self.numVotes = intify(myNumVotes)
         self.pctVotes = percentify(myNumVotes, allVotes)
 
-        self.isWinner = item.name in thisRoundSummary.winnerNames
-        self.isEliminated = item.name in thisRoundSummary.eliminatedNames
+        self.isWinner = thisRoundSummary.is_winner(item.name)
+        self.isEliminated = thisRoundSummary.is_eliminated(item.name)
 
 
 class TabulateByCandidate:
@@ -181,8 +181,6 @@ class CandidateTabulation:
 
             if node in summary.linksByTargetNode:
                 linksForThisNode = summary.linksByTargetNode[node]
-                for l in linksForThisNode:
-                    l.value = intify(l.value)
             else:
                 # No incoming nodes this round (always true on first round)
                 linksForThisNode = []
@@ -207,12 +205,12 @@ class RoundTabulation:
         self.primaryLabel, self.secondaryLabel = makePrimarySecondaryLabels(
             myNumVotes, allVotes, item)
 
-        thisRoundWinners = roundInfos[round_i].winnerNames
+        isWinnerThisRound = roundInfos[round_i].is_winner(item.name)
         if round_i < len(roundInfos) - 1:
-            thisRoundEliminations = roundInfos[round_i + 1].eliminatedNames
+            isEliminatedThisRound = roundInfos[round_i + 1].is_eliminated(item.name)
         else:
-            thisRoundEliminations = []
-        eliminatedText = "Eliminated. " if item.name in thisRoundEliminations else ""
+            isEliminatedThisRound = False
+        eliminatedText = "Eliminated. " if isEliminatedThisRound else ""
 
         if round_i == 0:
             self.summary = f"{totalActiveVotes} first-round votes. " + eliminatedText
@@ -223,15 +221,17 @@ class RoundTabulation:
             if link.source.item.name == link.target.item.name:
                 # Don't account for links to self
                 continue
-            voteTxt = pluralize('vote', link.value)
+            # Don't modify the link itself: other visualizations need the number
+            value = intify(link.value)
+            voteTxt = pluralize('vote', value)
             transfers.append(
-                f"{link.value} {voteTxt} from {link.source.item.name}. ")
+                f"{value} {voteTxt} from {link.source.item.name}. ")
 
         transferText = andify("Gained ", transfers, "")
 
         # Only show info relevant to this candidate
         winCaption = TextForWinner.as_caption(config) + ". "
-        winnerText = winCaption if item.name in thisRoundWinners else ""
+        winnerText = winCaption if isWinnerThisRound else ""
         self.summary = winnerText + transferText + eliminatedText
 
 
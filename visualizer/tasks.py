@@ -0,0 +1,21 @@
+"""
+Tasks run by a celery worker (see rcvis.celeryconfig) rather than by the web process,
+so they aren't lost when a web worker restarts
+"""
+
+import os
+
+from celery import shared_task
+
+from common.prerender import prerender
+
+
+def prerender_task(slugs, paths):
+    """ Pre-renders the elections (by slug) and the other paths, e.g. after a save.
+        Turned into a @shared_task below, but doesn't work in readthedocs so it's conditional. """
+    prerender(slugs, paths, numWorkers=1)
+
+
+is_read_the_docs_env = os.environ.get('READTHEDOCS') == 'True'
+if not is_read_the_docs_env:
+    prerender_task = shared_task(prerender_task)
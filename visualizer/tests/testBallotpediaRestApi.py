@@ -7,7 +7,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from common.testUtils import TestHelpers
-from visualizer.models import TextForWinner
+from visualizer.models import JsonConfig, TextForWinner
 from visualizer.tests import filenames
 
 TestHelpers.silence_logging_spam()
@@ -271,3 +271,59 @@ class BallotpediaRestAPITests(APITestCase):
                 # Ensure that isPrimary did not reset to the default
                 obj = TestHelpers.get_latest_upload()
                 self.assertEqual(obj.textForWinner, TextForWinner.PRIMARY)
+
+    def test_batch(self):
+        """ Many visualizations can be created and updated at once, some failing """
+        with open(filenames.THREE_ROUND, encoding='utf-8') as jsonFile:
+            response = self.client.post('/api/bp/', data={'resultsSummaryFile': jsonFile})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        existing = TestHelpers.get_latest_upload()
+        someoneElses = JsonConfig.objects.create(
+            owner=get_user_model().objects.create_user('someoneelse'),
+            jsonFile=existing.jsonFile, title='Not mine', numRounds=1, numCandidates=1)
+
+        badSidecar = TestHelpers.modify_json_with(filenames.THREE_ROUND_SIDECAR,
+                                                  lambda d: d['order'].remove('Banana'))
+        with open(filenames.THREE_ROUND, encoding='utf-8') as jsonFile0, \
+                open(filenames.THREE_ROUND_SIDECAR, encoding='utf-8') as sidecarFile0, \
+                open(filenames.THREE_ROUND, encoding='utf-8') as jsonFile1, \
+                open(badSidecar.name, encoding='utf-8') as sidecarFile1, \
+                open(filenames.THREE_ROUND, encoding='utf-8') as jsonFile2:
+            data = {'items-0-resultsSummaryFile': jsonFile0,
+                    'items-0-candidateSidecarFile': sidecarFile0,
+                    'items-1-resultsSummaryFile': jsonFile1,
+                    'items-1-candidateSidecarFile': sidecarFile1,
+                    'items-2-resultsSummaryFile': jsonFile2,
+                    'items-2-dataSourceURL': 'http://example.com/test',
+                    'items-3-id': existing.id,
+                    'items-3-areResultsCertified': True,
+                    'items-4-id': someoneElses.id,
+                    'items-4-areResultsCertified': True,
+                    'items-5-id': someoneElses.id + 1}
+            response = self.client.post('/api/bp/batch/', data=data)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], [201, 400, 201, 200, 403, 404])
+        assert 'order must include all' in results[1]['errors']['candidateSidecarFile'][0]
+
+        # Both new visualizations get their own slugs
+        existing.refresh_from_db()
+        self.assertEqual([results[0]['data']['slug'], results[2]['data']['slug']],
+                         [existing.slug + '-1', existing.slug + '-2'])
+        self.assertEqual(JsonConfig.objects.get(slug=existing.slug + '-2').dataSourceURL,
+                         'http://example.com/test')
+
+        # Only the valid items were saved
+        self.assertEqual(JsonConfig.objects.count(), 4)
+        self.assertTrue(existing.areResultsCertified)
+        someoneElses.refresh_from_db()
+        self.assertFalse(someoneElses.areResultsCertified)
+
+    def test_batch_requires_items(self):
+        """ The batch endpoint only accepts numbered items """
+        response = self.client.post('/api/bp/batch/', data={})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post('/api/bp/batch/', data={'areResultsCertified': True})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
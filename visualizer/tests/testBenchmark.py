@@ -0,0 +1,177 @@
+"""
+Testing the synthetic election generator and the benchmark command
+"""
+
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from mock import patch
+from rcvformats.schemas.universaltabulator import SchemaV0 as UTSchema
+
+from common.testUtils import TestHelpers
+from visualizer.benchmark.benchmarkRunner import find_regressions
+from visualizer.benchmark.corpusRunner import diff_reports
+from visualizer.benchmark.syntheticElection import generate_election, SyntheticElectionError
+from visualizer.graph.graphCreator import make_graph_with_file
+from visualizer.models import JsonConfig
+
+
+class BenchmarkTests(TestCase):
+    """ Tests syntheticElection.py, benchmarkRunner.py, corpusRunner.py and their commands """
+
+    def test_generated_elections_are_valid(self):
+        """ Every mix of options generates a valid, consistent election """
+        for options in ({'numCandidates': 1},
+                        {'numCandidates': 8},
+                        {'numCandidates': 4, 'numWinners': 4},
+                        {'numCandidates': 30, 'numWinners': 5},
+                        {'numCandidates': 30, 'numWinners': 5, 'withSurplus': False},
+                        {'numCandidates': 100, 'numWinners': 2, 'numRounds': 5},
+                        {'numCandidates': 20, 'inactiveFraction': 0, 'seed': 3}):
+            data = generate_election(numVotes=10000, **options)
+            self.assertTrue(UTSchema().is_data_valid(data))
+
+            # Every vote is either in a tally or inactive
+            numInactive = 0
+            for result in data['results']:
+                self.assertEqual(sum(int(v) for v in result['tally'].values()) + numInactive,
+                                 10000)
+                for tallyResult in result['tallyResults']:
+                    numInactive += tallyResult['transfers'].get('exhausted', 0)
+
+            graph = make_graph_with_file(StringIO(json.dumps(data)), False)
+            self.assertEqual(len(graph.summarize().winnerNames), options.get('numWinners', 1))
+
+    def test_generated_elections_are_deterministic(self):
+        """ The seed determines the election """
+        self.assertEqual(generate_election(50, numWinners=3, seed=1),
+                         generate_election(50, numWinners=3, seed=1))
+        self.assertNotEqual(generate_election(50, numWinners=3, seed=1),
+                            generate_election(50, numWinners=3, seed=2))
+
+    def test_batch_elimination(self):
+        """ Asking for fewer rounds batch-eliminates candidates """
+        data = generate_election(100, numRounds=5)
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(len(generate_election(100)['results']), 100)
+
+    def test_impossible_elections(self):
+        """ Impossible parameters raise an error """
+        with self.assertRaises(SyntheticElectionError):
+            generate_election(2, numWinners=3)
+        with self.assertRaises(SyntheticElectionError):
+            generate_election(0)
+        with self.assertRaises(SyntheticElectionError):
+            generate_election(5, inactiveFraction=2)
+
+    def test_find_regressions(self):
+        """ Only stages meaningfully slower than the baseline are regressions """
+        baseline = {'small': {'parse': {'seconds': 0.1}, 'sankey': {'seconds': 0.001}}}
+        results = {'small': {'parse': {'seconds': 0.2},
+                             'sankey': {'seconds': 0.002},
+                             'tabular': {'seconds': 1.0}},
+                   'large': {'parse': {'seconds': 5.0}}}
+        self.assertEqual(find_regressions(results, baseline, 0.25),
+                         [('small', 'parse', 0.1, 0.2)])
+        self.assertEqual(find_regressions(results, baseline, 2), [])
+
+    def test_benchmark_command(self):
+        """ The command reports each stage, saves a baseline, and compares against it """
+        with tempfile.TemporaryDirectory() as directory:
+            baselineFilename = os.path.join(directory, 'baseline.json')
+            args = ['benchmark', '--scenario', 'small', '--repeat', '1',
+                    '--baseline', baselineFilename]
+
+            out = StringIO()
+            call_command(*args, '--save-baseline', stdout=out)
+            for stageName in ('parse', 'summarize', 'bargraph', 'sankey', 'tabular',
+                              'describer', 'total'):
+                self.assertIn(stageName, out.getvalue())
+            with open(baselineFilename, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            self.assertGreater(baseline['small']['total']['peakMemory'], 0)
+
+            # Compare against a baseline that is impossibly fast
+            for stage in baseline['small'].values():
+                stage['seconds'] = 0
+            with open(baselineFilename, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+            with patch('visualizer.benchmark.benchmarkRunner.MIN_REGRESSION_SECONDS', 0):
+                with self.assertRaises(CommandError):
+                    call_command(*args, stdout=StringIO())
+
+            # Or one that is impossibly slow
+            for stage in baseline['small'].values():
+                stage['seconds'] = 1000
+            with open(baselineFilename, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+            out = StringIO()
+            call_command(*args, stdout=out)
+            self.assertIn("No regressions", out.getvalue())
+
+    def test_corpus_report(self):
+        """ checkLocalFiles loads files in parallel past failures, and reports on them """
+        with tempfile.TemporaryDirectory() as directory:
+            for filename in ('oneRound.json', 'some-xfers.json', 'test-baddata.json'):
+                shutil.copy(os.path.join('testData', filename), directory)
+            reportFilename = os.path.join(directory, 'report.out')
+
+            out = StringIO()
+            with self.assertRaises(CommandError):
+                call_command('checkLocalFiles', directory, '--workers', '2',
+                             '--report', reportFilename, stdout=out)
+            self.assertIn('1 failed with BadJSONError', out.getvalue())
+            with open(reportFilename, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+            self.assertEqual(report['numFiles'], 3)
+            self.assertEqual(report['numFailures'], 1)
+            self.assertEqual(report['failuresByType']['BadJSONError'][0]['stage'], 'parse')
+            self.assertEqual(len(report['slowest']), 2)
+            for result in report['slowest']:
+                fileResult = report['files'][result['name']]
+                self.assertEqual(set(fileResult['stages']), {'parse', 'graph', 'render'})
+                self.assertGreater(fileResult['peakMemory'], 0)
+
+            # Without the bad file, nothing fails or is impossibly slower than before
+            os.remove(os.path.join(directory, 'test-baddata.json'))
+            out = StringIO()
+            call_command('checkLocalFiles', directory, '--workers', '1',
+                         '--compare', reportFilename, '--tolerance', '1000', stdout=out)
+            self.assertIn('0 files are new since the earlier report, 1 are missing',
+                          out.getvalue())
+            self.assertIn('Successfully loaded JSONs and CSVs', out.getvalue())
+
+    def test_diff_reports(self):
+        """ Reports are compared file by file """
+        def make_report(files):
+            return {'files': {name: {'success': seconds is not None, 'seconds': seconds}
+                              for name, seconds in files.items()}}
+        baseline = make_report({'same': 1, 'slower': 1, 'broken': 1, 'fixed': None, 'gone': 1})
+        report = make_report({'same': 1.1, 'slower': 2, 'broken': None, 'fixed': 1, 'new': 1})
+        self.assertEqual(diff_reports(baseline, report, 0.25), {
+            'newFailures': ['broken'],
+            'fixed': ['fixed'],
+            'slower': [('slower', 1, 2)],
+            'added': ['new'],
+            'removed': ['gone'],
+        })
+
+    def test_check_uploads_continues_past_failures(self):
+        """ checkUploads reports uploads which can't be read, and loads the rest """
+        TestHelpers.login(self.client)
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        slug = 'city-of-eastpointe-macomb-county-mi'
+        JsonConfig.objects.filter(slug=slug).update(jsonFile='does-not-exist.json')
+
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('checkUploads', 0, 100, '--workers', '1', stdout=out)
+        self.assertIn(f'0: Successfully loaded {slug}-1', out.getvalue())
+        self.assertIn(f'1: Could not load {slug} while in read', out.getvalue())
@@ -0,0 +1,275 @@
+"""
+Tests the two-tier cache backend, with locmem standing in for the shared cache,
+and pre-rendering pages into the cache
+"""
+
+import datetime
+from io import StringIO
+from mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from common import cacheVersions
+from common.testUtils import TestHelpers
+from common.tieredCache import TieredCache, TieredCacheError
+from electionpage.models import ElectionPage
+from visualizer.graph.compiledElection import is_compiled_election_current
+from visualizer.models import CompiledElectionData, HomepageFeaturedElection, \
+    HomepageFeaturedElectionColumn, JsonConfig
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-cache-tests',
+    },
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TieredCacheTests(TestCase):
+    """ Tests for common.tieredCache """
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    @classmethod
+    def _make_cache(cls, **options):
+        options.setdefault('SHARED_CACHE', 'shared')
+        return TieredCache(None, {'OPTIONS': options})
+
+    def test_needs_shared_cache(self):
+        """ The shared cache is required """
+        with self.assertRaises(TieredCacheError):
+            TieredCache(None, {})
+
+    def test_tiers(self):
+        """ Reads go to the in-process tier, then the shared tier, and are counted """
+        tiered = self._make_cache()
+        tiered.set('key', {'a': [1, 2]})
+        self.assertEqual(tiered.get('key'), {'a': [1, 2]})
+
+        # Another process only has the shared tier
+        otherProcess = self._make_cache()
+        self.assertEqual(otherProcess.get('key'), {'a': [1, 2]})
+        self.assertEqual(otherProcess.get('key'), {'a': [1, 2]})
+        self.assertIsNone(otherProcess.get('missing'))
+
+        self.assertEqual(tiered.get_stats()['localHits'], 1)
+        stats = otherProcess.get_stats()
+        self.assertEqual(stats['sharedHits'], 1)
+        self.assertEqual(stats['localHits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['localEntries'], 1)
+
+        # Deleting deletes from both tiers
+        tiered.delete('key')
+        self.assertIsNone(tiered.get('key'))
+        self.assertIsNone(caches['shared'].get(tiered.make_key('key')))
+
+        # add() doesn't overwrite, in either tier
+        self.assertTrue(tiered.add('added', 1))
+        self.assertFalse(otherProcess.add('added', 2))
+        self.assertEqual(otherProcess.get('added'), 1)
+
+        tiered.reset_stats()
+        self.assertEqual(tiered.get_stats()['localHits'], 0)
+
+    @override_settings(CACHES={**LOCMEM_CACHES, 'default': {
+        'BACKEND': 'common.tieredCache.TieredCache',
+        'OPTIONS': {'SHARED_CACHE': 'shared'},
+    }})
+    def test_path_versions_are_shared(self):
+        """ A path invalidated by another process is invalidated here right away """
+        version = cacheVersions.get_path_version('/v/slug')
+        self.assertEqual(cacheVersions.get_path_version('/v/slug'), version)
+
+        # Another process only shares the shared tier
+        thisProcess = caches['default']
+        caches['default'] = self._make_cache()
+        try:
+            cacheVersions.invalidate_paths(['/v/slug'])
+        finally:
+            caches['default'] = thisProcess
+        self.assertNotEqual(cacheVersions.get_path_version('/v/slug'), version)
+
+    def test_local_timeout(self):
+        """ Writes from other processes are seen once the in-process entry times out """
+        tiered = self._make_cache(LOCAL_TIMEOUT=0)
+        otherProcess = self._make_cache()
+        tiered.set('key', 'old')
+        otherProcess.set('key', 'new')
+        self.assertEqual(tiered.get('key'), 'new')
+
+    def test_eviction_by_bytes(self):
+        """ The in-process tier evicts its least recently used entries to stay in budget """
+        value = 'x' * 100
+        blobSize = len(self._make_cache()._encode(value))  # pylint: disable=protected-access
+        tiered = self._make_cache(MAX_LOCAL_BYTES=blobSize * 3)
+
+        for i in range(3):
+            tiered.set(f"key{i}", value)
+        tiered.get('key0')
+        tiered.set('key3', value)
+
+        stats = tiered.get_stats()
+        self.assertEqual(stats['localEvictions'], 1)
+        self.assertEqual(stats['localEntries'], 3)
+        self.assertLessEqual(stats['localBytes'], blobSize * 3)
+
+        # key1 was the least recently used: it's only in the shared tier now
+        tiered.reset_stats()
+        self.assertEqual(tiered.get('key0'), value)
+        self.assertEqual(tiered.get('key1'), value)
+        self.assertEqual(tiered.get_stats()['localHits'], 1)
+        self.assertEqual(tiered.get_stats()['sharedHits'], 1)
+
+    def test_compression(self):
+        """ Large entries are stored compressed in both tiers """
+        tiered = self._make_cache(COMPRESS_MIN_BYTES=1000)
+        largeValue = 'abc' * 10000
+        tiered.set('large', largeValue)
+        tiered.set('small', 'abc')
+
+        largeBlob = caches['shared'].get(tiered.make_key('large'))
+        self.assertTrue(largeBlob.startswith(b'z'))
+        self.assertLess(len(largeBlob), len(largeValue) / 10)
+        self.assertLess(tiered.get_stats()['localBytes'], len(largeValue) / 10)
+        self.assertTrue(caches['shared'].get(tiered.make_key('small')).startswith(b'r'))
+
+        self.assertEqual(self._make_cache().get('large'), largeValue)
+        self.assertEqual(tiered.get('small'), 'abc')
+
+
+class PrerenderTests(TestCase):
+    """ Tests for common.prerender """
+
+    def setUp(self):
+        TestHelpers.login(self.client)
+        TestHelpers.setup_host_mocks(self)
+
+    def tearDown(self):
+        TestHelpers.logout(self.client)
+
+    def test_prerender(self):
+        """ The prerender command compiles elections and caches their pages """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        config = TestHelpers.get_latest_upload()
+        electionPage = ElectionPage.objects.create(title="Page", description="", slug="page",
+                                                   date=datetime.date(2020, 1, 1))
+        electionPage.listOfElections.add(config)
+        CompiledElectionData.objects.all().delete()
+        cache.clear()
+
+        with self.assertRaises(CommandError):
+            call_command('prerender', stdout=StringIO())
+
+        out = StringIO()
+        call_command('prerender', '--election-page', 'page', '--workers', '1',
+                     '--host', 'localhost', stdout=out)
+        self.assertIn(f"[1/2] {config.slug}", out.getvalue())
+        self.assertIn("[2/2] /p/page", out.getvalue())
+        self.assertIn("Pre-rendered 1 elections and 1 election pages, 0 pages failed",
+                      out.getvalue())
+        self.assertTrue(is_compiled_election_current(
+            TestHelpers.get_latest_upload().compiledElection))
+
+        # Anonymous visitors get the cached pages
+        anonymousClient = Client(HTTP_HOST='localhost')
+        for url in (reverse('visualize', args=(config.slug,)),
+                    reverse('visualizeEmbedded', args=(config.slug,)),
+                    reverse('electionPage', args=(electionPage.slug,))):
+            response = anonymousClient.get(url, secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(hasattr(response, 'context_data'))
+
+        # Saving pre-renders the election and its pages, if enabled, once the cache is purged
+        with patch('visualizer.tasks.prerender_task.delay') as mockPrerender:
+            with self.captureOnCommitCallbacks(execute=True):
+                config.save()
+            mockPrerender.assert_not_called()
+            with self.settings(PRERENDER_ON_SAVE=True, IS_CACHE_SHARED=False), \
+                    self.captureOnCommitCallbacks(execute=True):
+                config.save()
+            mockPrerender.assert_not_called()
+            with self.settings(PRERENDER_ON_SAVE=True), \
+                    self.captureOnCommitCallbacks(execute=True):
+                config.save()
+            mockPrerender.assert_called_once_with([config.slug], ['/p/page'])
+
+
+class HomepageTests(TestCase):
+    """ Tests for visualizer.homepage """
+
+    def setUp(self):
+        cache.clear()
+        TestHelpers.setup_host_mocks(self)
+        self.numRequests = 0
+
+    def _get_homepage(self, numQueries):
+        """ Each request has its own URL, so it isn't served from the page cache """
+        self.numRequests += 1
+        with self.assertNumQueries(numQueries):
+            response = Client().get(reverse('index') + f'?request={self.numRequests}')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode('utf-8')
+
+    def test_homepage_lists(self):
+        """ The homepage lists are cached until they change, and never query for each link """
+        TestHelpers.login(self.client)
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        config = TestHelpers.get_latest_upload()
+        column = HomepageFeaturedElectionColumn.objects.create(title="Column title", order=0)
+        for i in range(3):
+            HomepageFeaturedElection.objects.create(title=f"Link {i}", order=i, column=column,
+                                                    jsonConfig=config)
+
+        # One query for the most recent uploads, and two for every featured election
+        content = self._get_homepage(3)
+        self.assertIn("Link 2", content)
+        self.assertIn(config.slug, content)
+        self._get_homepage(0)
+
+        # Changing the featured elections only queries them again
+        HomepageFeaturedElection.objects.get(title="Link 2").delete()
+        content = self._get_homepage(2)
+        self.assertNotIn("Link 2", content)
+
+        # A private user's uploads are no longer public
+        profile = config.owner.userprofile
+        profile.isPrivate = True
+        profile.save()
+        content = self._get_homepage(1)
+        self.assertNotIn(f"({config.numCandidates} candidates", content)
+        self.assertFalse(JsonConfig.get_all_public().exists())
+
+        # Nor are their new uploads
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        self.assertFalse(TestHelpers.get_latest_upload().isPublic)
+        self._get_homepage(1)
+
+        profile.isPrivate = False
+        profile.save()
+        self.assertEqual(JsonConfig.get_all_public().count(), 2)
+        self._get_homepage(1)
+        self._get_homepage(0)
+
+        # An upload moved to a private user is no longer public, and vice versa
+        newest = TestHelpers.get_latest_upload()
+        privateUser = get_user_model().objects.create_user(username='private')
+        privateUser.userprofile.isPrivate = True
+        privateUser.userprofile.save()
+        for owner, isPublic in ((privateUser, False), (config.owner, True)):
+            newest.owner = owner
+            newest.save()
+            self.assertEqual(JsonConfig.objects.get(pk=newest.pk).isPublic, isPublic)
+            content = self._get_homepage(1)
+            self.assertEqual(newest.slug in content, isPublic)
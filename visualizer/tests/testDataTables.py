@@ -3,8 +3,10 @@ DataTables tests without a browser.
 """
 
 import json
+from mock import patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rcvformats.schemas import universaltabulator
 
@@ -109,24 +111,49 @@ class DataTablesTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    @override_settings(DATA_ENTRY_VALIDATION_BUDGET=0.000001)
     def test_rate_limit(self):
         """
-        Data validation is CPU-intensive. Rate limit to once per 5 seconds.
+        Data validation is CPU-intensive. Each validation costs the user the time it takes,
+        but re-validating an unchanged table is free.
         """
+        cache.clear()
         TestHelpers.login(self.client)
 
-        # Fail first
+        # Fail first, which spends the whole budget
         response = self.client.post(reverse('validateDataEntry'))
         self.assertEqual(response.json()['message'], 'Error #20: Unknown error')
 
         # Then rate limit
+        formOutput = self._get_simplified_post_data()
         with self.assertLogs("visualizer.views") as logger:
-            response = self.client.post(reverse('validateDataEntry'))
-            self.assertEqual(response.json()['message'],
-                             'Please wait 5 seconds before trying again')
+            response = self.client.post(reverse('validateDataEntry'), formOutput)
+            self._assert_starts_with(response.json()['message'], 'Please wait ')
+            self.assertFalse(response.json()['success'])
             self.assertListEqual(logger.output,
                                  ["WARNING:visualizer.views:User testuser has been rate limited"])
 
+        # But the same table is remembered, so isn't validated again
+        with patch('visualizer.validators.validate_election_data') as mockValidate:
+            response = self.client.post(reverse('validateDataEntry'))
+            self.assertEqual(response.json()['message'], 'Error #20: Unknown error')
+            mockValidate.assert_not_called()
+
+    def test_validation_is_remembered(self):
+        """ Validating an unchanged table reuses the result """
+        cache.clear()
+        formOutput = self._get_simplified_post_data()
+        self._ajax_starts_with(formOutput, 'Data is valid!')
+
+        with patch('visualizer.validators.validate_election_data') as mockValidate:
+            self._ajax_starts_with(formOutput, 'Data is valid!')
+            mockValidate.assert_not_called()
+
+            # But a changed table is validated
+            formOutput['configElectionTitle'] = 'anothertitle'
+            self._ajax_starts_with(formOutput, 'Data is valid!')
+            mockValidate.assert_called_once()
+
     def test_login_required(self):
         """
         Login is required to hit the validation endpoint
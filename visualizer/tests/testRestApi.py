@@ -15,6 +15,8 @@ from rest_framework.test import APITestCase
 from rest_framework_tracking.models import APIRequestLog
 
 from common.testUtils import TestHelpers
+from visualizer.graph.compiledElection import is_compiled_election_current
+from visualizer.models import JsonConfig
 from visualizer.tests import filenames
 
 TestHelpers.silence_logging_spam()
@@ -424,3 +426,91 @@ class RestAPITests(APITestCase):
 
         # Ensure purge is called once edited
         purgeMock.assert_called_once()
+
+    def test_validated_election_is_saved(self):
+        """ The election compiled while validating is saved, rather than compiled again """
+        self._authenticate_as('notadmin')
+
+        with patch('visualizer.graph.compiledElection.compile_election') as mockCompile:
+            response = self._upload_file_for_api(filenames.ONE_ROUND)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            url = f"/api/visualizations/{TestHelpers.get_latest_upload().id}/"
+            with open(filenames.MULTIWINNER, encoding='utf-8') as f:
+                response = self.client.patch(url, data={'jsonFile': f})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            mockCompile.assert_not_called()
+
+        config = TestHelpers.get_latest_upload()
+        self.assertTrue(is_compiled_election_current(config.compiledElection))
+        self.assertEqual(config.compiledElection['summary']['numRounds'], config.numRounds)
+        self.assertEqual(config.title, "City of Eastpointe, Macomb County, MI")
+
+    def _make_visualizations(self, username, num):
+        """ Quickly creates num visualizations owned by the user, without files """
+        owner = get_user_model().objects.get(username=username)
+        for i in range(num):
+            JsonConfig.objects.create(owner=owner, title=f"{username} {i}",
+                                      numRounds=1, numCandidates=2)
+
+    def test_list_pages(self):
+        """ Lists are paged newest first, with the same queries however many there are """
+        self._make_visualizations('admin', 3)
+        self._make_visualizations('notadmin', 12)
+
+        # Checking API access, the page, and logging the request
+        def get_page(url, numQueries=3):
+            self._authenticate_as('admin')
+            with self.assertNumQueries(numQueries):
+                response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return response.json()
+
+        page = get_page('/api/visualizations/')
+        self.assertEqual([r['title'] for r in page['results']],
+                         [f"notadmin {i}" for i in range(11, 1, -1)])
+        page = get_page(page['next'])
+        self.assertEqual([r['title'] for r in page['results']],
+                         ["notadmin 1", "notadmin 0", "admin 2", "admin 1", "admin 0"])
+        self.assertIsNone(page['next'])
+
+        # Page numbers still work, with the count, for older clients
+        page = get_page('/api/visualizations/?page=2', 4)
+        self.assertEqual(page['count'], 15)
+        self.assertEqual([r['title'] for r in page['results']],
+                         ["notadmin 1", "notadmin 0", "admin 2", "admin 1", "admin 0"])
+        self.assertIsNone(page['next'])
+        self.assertEqual(page['previous'], 'http://testserver/api/visualizations/')
+
+        # Larger pages, with only some fields
+        page = get_page('/api/bp/?pageSize=15&fields=slug,title,visualizeUrl')
+        self.assertEqual(len(page['results']), 15)
+        self.assertEqual(set(page['results'][0]), {'slug', 'title', 'visualizeUrl'})
+        response = self.client.get('/api/bp/?fields=slug,nonsense', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Users are listed with their visualizations, prefetched
+        page = get_page('/api/users/', 3)
+        self.assertEqual(len(page['results'][0]['this_users_jsons']), 0)
+        self.assertEqual(len(page['results'][1]['this_users_jsons']), 12)
+        self.assertEqual(len(page['results'][2]['this_users_jsons']), 3)
+
+    def test_list_owners(self):
+        """ Only admins list everyone's visualizations, and anyone can filter by owner """
+        self._make_visualizations('admin', 3)
+        self._make_visualizations('notadmin', 2)
+        notadminId = get_user_model().objects.get(username='notadmin').id
+
+        self._authenticate_as('admin')
+        response = self.client.get(f'/api/visualizations/?owner={notadminId}', format='json')
+        self.assertEqual([r['title'] for r in response.json()['results']],
+                         ["notadmin 1", "notadmin 0"])
+        response = self.client.get('/api/visualizations/?owner=me', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self._authenticate_as('notadmin')
+        response = self.client.get('/api/visualizations/', format='json')
+        self.assertEqual([r['title'] for r in response.json()['results']],
+                         ["notadmin 1", "notadmin 0"])
+        response = self.client.get(f'/api/bp/?owner={notadminId - 1}', format='json')
+        self.assertEqual(response.json()['results'], [])
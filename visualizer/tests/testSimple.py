@@ -2,31 +2,48 @@
 Integration tests without a server
 """
 
+import copy
+import datetime
 from io import StringIO
 import json
+import re
 from mock import patch
 
+from django.core.cache import cache
 from django.core.files import File
+from django.core.files.base import ContentFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rcvformats.schemas.universaltabulator import SchemaV0 as UTSchema
 
 from common.testUtils import TestHelpers
-from common.viewUtils import get_data_for_view
+from common.viewUtils import get_data_for_view, get_data_for_graph, DefaultConfig
 from common.cloudflare import CloudflareAPI
+from common.timing import COUNTERS
+from electionpage.models import ElectionPage
+from visualizer.graph.compactGraph import CompactGraph
+from visualizer.graph.compiledElection import is_compiled_election_current
 from visualizer.graph.graphCreator import BadJSONError
+from visualizer.graph.graphCreator import initialize_graph, load_reader_with_file
 from visualizer.graph.graphCreator import make_graph_with_file
+from visualizer.graph import formatSniffer
+from visualizer.graph import readRCVRCJSON
 from visualizer.graph.readRCVRCJSON import JSONReader
+from visualizer.common import EMBED_VISTYPES
 from visualizer.views import Oembed
-from visualizer.models import JsonConfig, HomepageFeaturedElection, HomepageFeaturedElectionColumn
+from visualizer.models import JsonConfig, HomepageFeaturedElection, \
+    HomepageFeaturedElectionColumn, CompiledElectionData
 from visualizer.forms import UploadForm
 from visualizer.tests import filenames
 from visualizer.wikipedia.wikipedia import WikipediaExport
 
 
-# pylint: disable=too-many-public-methods
+# pylint: disable=too-many-public-methods,too-many-lines
 class SimpleTests(TestCase):
     """ Simple tests that do not require a live browser """
 
@@ -286,6 +303,137 @@ class SimpleTests(TestCase):
         response = self.client.get(visualizeUrl)
         self.assertRedirects(response, expectedBaseURL + 'barchart-interactive', status_code=301)
 
+    def test_single_vistype_embed(self):
+        """ /ve/slug/vistype embeds one vistype, with only the data it uses """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        slug = TestHelpers.get_latest_upload().slug
+
+        for shortVistype, vistype in EMBED_VISTYPES.items():
+            for urlVistype in (shortVistype, vistype):
+                cache.clear()
+                response = self.client.get(
+                    reverse('visualizeEmbeddedVistype', args=(slug, urlVistype)))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context_data['vistype'], vistype)
+                self.assertNotIn('no-such-vistype-message', response.content.decode('utf-8'))
+
+        # The sankey doesn't need the descriptions, so they aren't sent or computed
+        cache.clear()
+        response = self.client.get(reverse('visualizeEmbeddedVistype', args=(slug, 'sankey')))
+        self.assertEqual(response.context_data['humanFriendlySummary'], 'null')
+        self.assertEqual(response.context_data['humanFriendlyEventsPerRound'], 'null')
+        self.assertLess(len(response.content),
+                        len(self.client.get(reverse('visualizeEmbedded', args=(slug,)) +
+                                            '?vistype=sankey').content))
+
+        # The bar chart does
+        response = self.client.get(reverse('visualizeEmbeddedVistype', args=(slug, 'bar')))
+        self.assertNotEqual(response.context_data['humanFriendlySummary'], 'null')
+
+        response = self.client.get(reverse('visualizeEmbeddedVistype', args=(slug, 'nope')))
+        self.assertEqual(response.status_code, 404)
+
+    def test_visualization_data_endpoint(self):
+        """ /api/v1/data/slug returns the data of every visualization, with caching headers """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        config = TestHelpers.get_latest_upload()
+        url = reverse('visualizationData', args=(config.slug,))
+
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(response.content)
+        self.assertEqual(data['slug'], config.slug)
+        self.assertEqual(data['sankey']['numRounds'], 5)
+        self.assertEqual(len(data['bargraph']['humanFriendlyRoundNames']), 5)
+        self.assertEqual(len(data['humanFriendlyEventsPerRound']), 5)
+        self.assertIsNone(data['candidateSidecarData'])
+
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{data["version"]}"')
+        self.assertIn('Last-Modified', response)
+        self.assertIn('s-maxage=31536000', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+        # The versioned URL can be cached forever
+        cache.clear()
+        response = self.client.get(url + '?v=' + data['version'])
+        self.assertIn('immutable', response['Cache-Control'])
+
+        # Revalidating, without reading the compiled election
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any(CompiledElectionData._meta.db_table in q['sql']
+                             for q in queries.captured_queries))
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # Saving the election changes the version
+        config.save()
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.get(reverse('visualizationData', args=('nope',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        """ Visualization pages answer conditional requests without loading the election """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        config = TestHelpers.get_latest_upload()
+        slug = config.slug
+        oembedUrl = reverse('oembed') + '?url=' + reverse('visualize', args=(slug,))
+
+        for url in (reverse('visualize', args=(slug,)),
+                    reverse('visualizeEmbedded', args=(slug,)) + '?vistype=sankey',
+                    reverse('visualizeEmbeddedVistype', args=(slug, 'bar')),
+                    reverse('visualizeBallotpedia', args=(slug,)),
+                    oembedUrl):
+            cache.clear()
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+
+            cache.clear()
+            with patch('common.viewUtils.get_data_for_view') as getDataForView, \
+                    CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                getDataForView.assert_not_called()
+            # Nor its compiled election
+            self.assertFalse(any(CompiledElectionData._meta.db_table in q['sql']
+                                 for q in queries.captured_queries))
+
+            # Even when the page comes from the cache
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Each query string has its own ETag
+        cache.clear()
+        url = reverse('visualizeEmbedded', args=(slug,))
+        barEtag = self.client.get(url + '?vistype=barchart-interactive')['ETag']
+        cache.clear()
+        self.assertNotEqual(self.client.get(url + '?vistype=sankey')['ETag'], barEtag)
+
+        # Saving the election changes the ETag, and If-Modified-Since works too
+        cache.clear()
+        url = reverse('visualize', args=(slug,))
+        response = self.client.get(url)
+        etag = response['ETag']
+        cache.clear()
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        config.save()
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
     @patch('visualizer.wikipedia.wikipedia.WikipediaExport._get_todays_date_string')
     def test_wikicode(self, mockGetDateString):
         """ Validate that the wikicode can be generated and hasn't inadvertently changed """
@@ -355,10 +503,42 @@ class SimpleTests(TestCase):
         self.assertIn(f'1: Successfully loaded {slug}', out.getvalue())
         self.assertIn('Successfully loaded configs', out.getvalue())
 
-        # Load all files in the testData/ directory (one of which raises a TypeError)
+        # Load all files in the testData/ directory: some aren't elections, but the rest load
         out = StringIO()
-        with self.assertRaises(TypeError):
-            call_command('checkLocalFiles', 'testData/', stdout=out)
+        with self.assertRaises(CommandError):
+            call_command('checkLocalFiles', 'testData/', '--workers', '1', stdout=out)
+        self.assertIn('Could not load testData/test-baddata.json while in parse: BadJSONError',
+                      out.getvalue())
+        self.assertIn('Successfully loaded testData/some-xfers.json', out.getvalue())
+
+    def test_purge_only_invalidates_affected_pages(self):
+        """ Saving an election invalidates the cache of its pages, and only its pages """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        configs = JsonConfig.objects.order_by('pk')
+        electionPage = ElectionPage.objects.create(title="Page", description="", slug="page",
+                                                   date=datetime.date(2020, 1, 1))
+        electionPage.listOfElections.add(configs[0])
+
+        urls = [reverse('visualize', args=(configs[0].slug,)),
+                reverse('visualizeEmbedded', args=(configs[0].slug,)) + '?vistype=sankey',
+                reverse('electionPage', args=(electionPage.slug,)),
+                reverse('visualize', args=(configs[1].slug,))]
+
+        def is_cached(url):
+            # Freshly-rendered responses still have their context
+            return not hasattr(self.client.get(url), 'context_data')
+
+        cache.clear()
+        for url in urls:
+            self.assertFalse(is_cached(url))
+            self.assertTrue(is_cached(url))
+
+        configs[0].save()
+        self.assertFalse(is_cached(urls[0]))
+        self.assertFalse(is_cached(urls[1]))
+        self.assertFalse(is_cached(urls[2]))
+        self.assertTrue(is_cached(urls[3]))
 
     @patch('requests.post')
     def test_cloudflare_purge(self, requestPostResponse):
@@ -372,7 +552,7 @@ class SimpleTests(TestCase):
         slug = TestHelpers.get_latest_upload().slug
 
         requestPostResponse.side_effect = TestHelpers.create_request_mock({'a': 0}, 200)
-        expectedLogString = "INFO:common.cloudflare:Cleared cloudflare cache for 8 starting with "\
+        expectedLogString = "INFO:common.cloudflare:Cleared cloudflare cache for 16 starting with "\
                             "/v/city-of-eastpointe-macomb-county-mi: {'a': 0}"
 
         with self.settings(
@@ -397,7 +577,17 @@ class SimpleTests(TestCase):
                 "https://example.com/vo/city-of-eastpointe-macomb-county-mi/barchart-interactive",
                 "https://example.com/vo/city-of-eastpointe-macomb-county-mi/sankey",
                 "https://example.com/vo/city-of-eastpointe-macomb-county-mi/table",
-                "https://example.com/vb/city-of-eastpointe-macomb-county-mi"]}
+                "https://example.com/vb/city-of-eastpointe-macomb-county-mi",
+                "https://example.com/api/v1/data/city-of-eastpointe-macomb-county-mi",
+                "https://example.com/ve/city-of-eastpointe-macomb-county-mi/bar",
+                "https://example.com/ve/city-of-eastpointe-macomb-county-mi/bar-static",
+                "https://example.com/ve/city-of-eastpointe-macomb-county-mi/sankey",
+                "https://example.com/ve/city-of-eastpointe-macomb-county-mi/table",
+                "https://example.com/ve/city-of-eastpointe-macomb-county-mi/table-by-round",
+                "https://example.com/ve/city-of-eastpointe-macomb-county-mi/"
+                "table-by-round-static",
+                "https://example.com/ve/city-of-eastpointe-macomb-county-mi/"
+                "table-by-candidate"]}
         requestPostResponse.assert_called_with(expectedUrl,
                                                headers=expectedHeaders,
                                                data=json.dumps(expectedData),
@@ -558,3 +748,273 @@ class SimpleTests(TestCase):
             self.assertEqual(2, len(summary.rounds[-1].eliminatedNames))
             self.assertEqual('Nicole Speer', summary.rounds[-1].eliminatedNames[0])
             self.assertEqual('Paul Tweedlie', summary.rounds[-1].eliminatedNames[1])
+
+    def test_server_timing(self):
+        """ Stage timings are logged, sent to staff as headers, and counted for metrics """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        slug = TestHelpers.get_latest_upload().slug
+        COUNTERS.reset()
+
+        with self.assertLogs('common.timing') as logs:
+            response = self.client.get(reverse('visualize', args=(slug,)))
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn('request_timing', logs.output[0])
+        self.assertIn('"sankey"', logs.output[0])
+
+        # Only staff can see the timings
+        self.assertEqual(self.client.get(reverse('timingMetrics')).status_code, 302)
+        user = TestHelpers.login(self.client)
+        user.is_staff = True
+        user.save()
+
+        # Cached pages skip every stage
+        cache.clear()
+        response = self.client.get(reverse('visualize', args=(slug,)))
+        for stageName in ('compiled', 'sankey', 'tabular', 'describer', 'wikipedia', 'render',
+                          'total'):
+            self.assertIn(f"{stageName};dur=", response['Server-Timing'])
+        self.assertIn('private', response['Cache-Control'])
+
+        response = self.client.get(reverse('timingMetrics'))
+        stages = json.loads(response.content)['stages']
+        self.assertEqual(stages['sankey']['count'], 2)
+        self.assertGreater(stages['render']['totalSeconds'], 0)
+        self.assertGreater(json.loads(response.content)['cache']['sets'], 0)
+
+    def test_visualization_json(self):
+        """ The sankey and bargraph data is compact JSON, safe to embed in a script tag """
+        with open(filenames.MULTIWINNER, 'r', encoding='utf-8') as f:
+            data = f.read().replace('Larry Edwards', '</script><b>')
+        config = JsonConfig(jsonFile=ContentFile(data, name='script.json'))
+        viewData = get_data_for_view(config)
+
+        for key in ('bargraphjson', 'sankeyjson'):
+            self.assertNotIn('<', viewData[key])
+            self.assertNotIn('\n', viewData[key])
+
+        sankey = json.loads(viewData['sankeyjson'])
+        self.assertEqual(sankey['numRounds'], 5)
+        self.assertIn('</script><b>', [n['name'] for n in sankey['graph']['nodes']])
+        for link in sankey['graph']['links']:
+            self.assertLess(link['target'], len(sankey['graph']['nodes']))
+
+        bargraph = json.loads(viewData['bargraphjson'])
+        self.assertIn('</script><b>', [c['candidate'] for c in bargraph['candidateVoteCounts']])
+        self.assertEqual(len(bargraph['humanFriendlyRoundNames']), 5)
+
+    def test_view_data_is_lazy(self):
+        """ Embedded views only compute the visualization they show """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        slug = TestHelpers.get_latest_upload().slug
+
+        response = self.client.get(reverse('visualizeEmbedded', args=(slug,)) + "?vistype=sankey")
+        data = response.context_data
+        self.assertTrue(data.is_computed('sankeyjson'))
+        self.assertTrue(data.is_computed('humanFriendlySummary'))
+        for key in ('bargraphjson', 'tabularByCandidate', 'tabularByRound', 'faqsPerRound'):
+            self.assertFalse(data.is_computed(key))
+
+        # Reading a value from python computes it
+        self.assertIn('candidateVoteCounts', json.loads(data['bargraphjson']))
+        self.assertTrue(data.is_computed('bargraphjson'))
+
+        # Bar graphs only need the bargraph data, not the tables
+        for vistype in ('bar', 'barchart-interactive'):
+            data = self.client.get(reverse('visualizeEmbeddedVistype', args=(slug, vistype)))\
+                .context_data
+            for key in ('tabularByRound', 'tabularByRoundInteractive', 'sankeyjson'):
+                self.assertFalse(data.is_computed(key), f"{vistype} computed {key}")
+
+        # The full page uses everything
+        response = self.client.get(reverse('visualize', args=(slug,)))
+        for key in response.context_data:
+            self.assertTrue(response.context_data.is_computed(key))
+
+    def test_compiled_election_created_on_upload(self):
+        """ Uploads are compiled on save, and views then never re-read the file """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        config = TestHelpers.get_latest_upload()
+
+        # It's only loaded when it's used
+        with self.assertNumQueries(1):
+            self.assertTrue(is_compiled_election_current(config.compiledElection))
+        self.assertEqual(config.compiledElection['summary']['numRounds'], config.numRounds)
+        self.assertEqual(config.compiledElection['summary']['numCandidates'],
+                         config.numCandidates)
+
+        with patch('common.viewUtils.make_graph_with_file') as mockMakeGraph:
+            response = self.client.get(reverse('visualize', args=(config.slug,)))
+            self.assertEqual(response.status_code, 200)
+            mockMakeGraph.assert_not_called()
+
+        # Saving without changing the file does not recompile
+        with patch('visualizer.graph.compiledElection.compile_election') as mockCompile:
+            config.title = "New title"
+            config.save()
+            mockCompile.assert_not_called()
+
+    def test_compiled_election_matches_files(self):
+        """ Data generated from the compiled election is identical to reading the files """
+        for isExcluding in (True, False):
+            with open(filenames.THREE_ROUND, 'rb') as f, \
+                    open(filenames.THREE_ROUND_SIDECAR, 'rb') as sidecar:
+                config = JsonConfig(jsonFile=File(f), candidateSidecarFile=File(sidecar))
+                config.excludeFinalWinnerAndEliminatedCandidate = isExcluding
+                fromFiles = get_data_for_view(config)
+                config.compile()
+            self.assertTrue(is_compiled_election_current(config.compiledElection))
+
+            fromCompiled = get_data_for_view(config)
+            for key in ('bargraphjson', 'sankeyjson', 'candidateSidecarData',
+                        'humanFriendlyEventsPerRound', 'faqsPerRound'):
+                self.assertEqual(fromFiles[key], fromCompiled[key])
+
+    def test_compile_command(self):
+        """ The compileElections command compiles elections without a current compilation """
+        TestHelpers.get_multiwinner_upload_response(self.client)
+        CompiledElectionData.objects.all().delete()
+
+        out = StringIO()
+        call_command('compileElections', stdout=out)
+        self.assertIn('Compiled 1 elections, 0 failed', out.getvalue())
+        config = TestHelpers.get_latest_upload()
+        self.assertTrue(is_compiled_election_current(config.compiledElection))
+
+    def test_compact_graph_matches_graph(self):
+        """ A CompactGraph renders identically to a Graph """
+        def render(jsonData, isCompact, isExcluding, sidecarOrder):
+            reader = JSONReader(copy.deepcopy(jsonData),
+                                applyMigrations=False,
+                                useCompactGraph=isCompact)
+            graph = initialize_graph(reader, isExcluding)
+            self.assertEqual(isinstance(graph, CompactGraph), isCompact)
+            if sidecarOrder:
+                graph.set_elimination_order(graph.get_items_for_names(sidecarOrder))
+
+            config = DefaultConfig()
+            config.excludeFinalWinnerAndEliminatedCandidate = isExcluding
+            data = get_data_for_graph(graph, config)
+
+            # CompactGraph stores every count as a float
+            return {key: re.sub(r'(\d)\.0\b', r'\1', str(data[key]))
+                    for key in ('bargraphjson', 'sankeyjson', 'humanFriendlyEventsPerRound',
+                                'humanFriendlySummary', 'faqsPerRound')}
+
+        with open(filenames.THREE_ROUND_SIDECAR, 'r', encoding='utf-8') as f:
+            sidecarOrder = json.load(f)['order']
+
+        for fn, order in ((filenames.MULTIWINNER, None),
+                          (filenames.OPAVOTE, None),
+                          (filenames.BATCH_ELIMINATION_TWO_FINAL, None),
+                          (filenames.RESIDUAL_SURPLUS_MAIN, None),
+                          (filenames.BROKEN_RANKIT_1, None),
+                          (filenames.THREE_ROUND, sidecarOrder)):
+            with open(fn, 'rb') as f:
+                _, jsonData = load_reader_with_file(f)
+            for isExcluding in (True, False):
+                self.assertEqual(render(jsonData, False, isExcluding, order),
+                                 render(jsonData, True, isExcluding, order))
+
+    def test_compact_graph_used_for_large_elections(self):
+        """ Large elections are loaded into a CompactGraph by default """
+        with open(filenames.MULTIWINNER, 'r', encoding='utf-8') as f:
+            smallGraph = make_graph_with_file(f, False)
+        self.assertFalse(isinstance(smallGraph, CompactGraph))
+
+        with patch('visualizer.graph.compactGraph.LARGE_ELECTION_NUM_NODES', 10):
+            with open(filenames.MULTIWINNER, 'r', encoding='utf-8') as f:
+                graph = make_graph_with_file(f, False)
+        self.assertTrue(isinstance(graph, CompactGraph))
+        self.assertEqual(graph.summarize().winnerNames, smallGraph.summarize().winnerNames)
+
+    def test_large_election(self):
+        """ A 1,000-candidate election loads, reorders and renders every view """
+        numCandidates = 1000
+        names = [f"Candidate {i}" for i in range(numCandidates)]
+        numLosers = numCandidates - 10
+        firstRound = {
+            'round': 1,
+            'tally': {name: '1' for name in names},
+            'tallyResults': [{'eliminated': name, 'transfers': {names[0]: '1'}}
+                             for name in names[10:]]}
+        secondRound = {
+            'round': 2,
+            'tally': {name: str(1 + numLosers if i == 0 else 1)
+                      for i, name in enumerate(names[:10])},
+            'tallyResults': [{'elected': names[0], 'transfers': {}}]}
+        data = {'config': {'contest': 'Large', 'threshold': '500'},
+                'results': [firstRound, secondRound]}
+
+        config = JsonConfig(jsonFile=ContentFile(json.dumps(data), name='large.json'))
+        graph = get_data_for_view(config)['graph']
+        self.assertTrue(isinstance(graph, CompactGraph))
+        self.assertEqual(graph.summarize().winnerNames, [names[0]])
+        self.assertEqual(len(graph.summarize().rounds[1].eliminatedNames), numLosers)
+
+        # Reordering by name uses every candidate, in order
+        reordered = graph.get_items_for_names(names)
+        self.assertEqual([item.name for item in reordered], list(reversed(names)))
+        with self.assertRaises(ValueError):
+            graph.get_items_for_names(names[1:])
+
+    def test_single_pass_migrations_match_sequential_migrations(self):
+        """ Running every migration in one pass is the same as running them one at a time """
+        for fn in (filenames.MULTIWINNER, filenames.BROKEN_RANKIT_1,
+                   filenames.BROKEN_RANKIT_2, filenames.INACTIVE_BALLOT_RENAME_DATA,
+                   filenames.RESIDUAL_SURPLUS_MAIN, filenames.SOME_MISSING_TRANSFERS):
+            with open(fn, 'r', encoding='utf-8') as f:
+                sequentialData = json.load(f)
+            singlePassData = copy.deepcopy(sequentialData)
+
+            reader = JSONReader(singlePassData)
+            for task in reader.tasks:
+                task(sequentialData).do()
+
+            self.assertTrue(reader.neededMigrations)
+            # Compare the serialized data: the order of candidates matters too
+            self.assertEqual(json.dumps(singlePassData), json.dumps(sequentialData))
+
+    def test_clean_files_skip_migrations(self):
+        """ A file which did not need migrating skips migrations the next time it is loaded """
+        with open(filenames.THREE_ROUND, 'r', encoding='utf-8') as f:
+            _, jsonData = load_reader_with_file(f)
+        cleanFile = StringIO(json.dumps(jsonData))
+        fingerprint = readRCVRCJSON.fingerprint(cleanFile.getvalue())
+        self.assertFalse(readRCVRCJSON.is_fingerprint_clean(fingerprint))
+
+        jsonReader, _ = load_reader_with_file(cleanFile)
+        self.assertFalse(jsonReader.neededMigrations)
+        self.assertTrue(readRCVRCJSON.is_fingerprint_clean(fingerprint))
+
+        cleanFile.seek(0)
+        with patch('visualizer.graph.readRCVRCJSON.MigrationEngine.run') as mockRun:
+            load_reader_with_file(cleanFile)
+            mockRun.assert_not_called()
+
+    def test_format_sniffing(self):
+        """ Each format is detected from its first bytes, and converted without trying others """
+        expectedFormats = {
+            filenames.THREE_ROUND: formatSniffer.UNIVERSAL_TABULATOR,
+            filenames.OPAVOTE: formatSniffer.OPAVOTE,
+            filenames.ELECTIONBUDDY: formatSniffer.ELECTIONBUDDY,
+            filenames.ELECTIONBUDDY_REGRESSION: formatSniffer.ELECTIONBUDDY,
+            filenames.DOMINION: formatSniffer.DOMINION_XLSX,
+            filenames.MULTI_SCRAPE: None,
+        }
+        for fn, expectedFormat in expectedFormats.items():
+            with open(fn, 'rb') as f:
+                self.assertEqual(formatSniffer.sniff_format(f), expectedFormat)
+                self.assertEqual(f.tell(), 0)
+
+        for fn in (filenames.OPAVOTE, filenames.ELECTIONBUDDY, filenames.DOMINION):
+            with open(fn, 'rb') as f, \
+                    patch('visualizer.graph.graphCreator.convert_to_standardized_format') as mock:
+                graph = make_graph_with_file(f, False)
+                mock.assert_not_called()
+            self.assertEqual(graph.fileFormat, expectedFormats[fn])
+
+        # A wrong guess falls back to trying every converter
+        with open(filenames.OPAVOTE, 'rb') as f:
+            graph = make_graph_with_file(f, False, formatSniffer.ELECTIONBUDDY)
+        self.assertIsNone(graph.fileFormat)
+        self.assertEqual(graph.title, 'Rank Your Favorite Debate Performances! (Overall)')
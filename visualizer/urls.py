@@ -24,6 +24,8 @@ urlpatterns = [
     path('index.html', views.Index.as_view(), name='index'),
     path('v/<slug>', views.Visualize.as_view(), name='visualize'),
     path('ve/<slug>', views.VisualizeEmbedded.as_view(), name='visualizeEmbedded'),
+    path('ve/<slug>/<vistype>', views.VisualizeEmbeddedVistype.as_view(),
+         name='visualizeEmbeddedVistype'),
     path('vo/<slug>', views.VisualizeEmbedly.as_view(), name='visualizeEmbedlyDefault'),
     path('vo/<slug>/<vistype>', views.VisualizeEmbedly.as_view(), name='visualizeEmbedly'),
     path('vb/<slug>', views.VisualizeBallotpedia.as_view(), name='visualizeBallotpedia'),
@@ -36,7 +38,11 @@ urlpatterns = [
     # Upload Validation API / AJAX
     path('validateDataEntry', views.ValidateDataEntry.as_view(), name='validateDataEntry'),
 
+    # Metrics for staff
+    path('metrics/timing', views.TimingMetrics.as_view(), name='timingMetrics'),
+
     # REST API
+    path('api/v1/data/<slug>', views.VisualizationData.as_view(), name='visualizationData'),
     path('api/', include(router.urls)),
     # This is used by the rest_framework to create a login button
     path('api/auth/', include('rest_framework.urls')),
@@ -4,10 +4,24 @@ from django.core.files.uploadedfile import UploadedFile
 from rest_framework import serializers
 
 from common import viewUtils
-from visualizer.graph.graphCreator import make_graph_with_file
+from visualizer.graph.compiledElection import compile_graph
+from visualizer.graph.graphCreator import load_reader_with_data, load_reader_with_file, \
+    make_graph_with_reader
 from visualizer.sidecar.reader import SidecarReader
 
 
+class ValidatedElection():  # pylint: disable=too-few-public-methods
+    """
+    The result of validate_election: the graph, and the election compiled from it.
+    Set it as the JsonConfig's validatedElection before saving the files it came from,
+    so they aren't read and compiled again.
+    """
+
+    def __init__(self, graph, compiledElection):
+        self.graph = graph
+        self.compiledElection = compiledElection
+
+
 def ensure_file_is_under_2_mb(jsonFileObj):
     """ Limit file size to 2mb """
     maxFileSize = 1024 * 1024 * 2  # 2MB
@@ -24,16 +38,27 @@ def ensure_title_is_under_256_chars(graph):
             f'Max title length is {maxTitleSize} and your title length is {len(graph.title)}')
 
 
-def try_to_load_jsons(jsonFileObj, sidecarJsonFileObj):
+def _check_graph(graph):
+    """ Checks that the graph renders, and that its title is not too long """
+    # Sanity check that the entire pipeline works
+    # (If not, this could be the source of 500 errors)
+    viewUtils.get_data_for_graph(graph, config=viewUtils.DefaultConfig()).compute_all()
+
+    # Check title length
+    ensure_title_is_under_256_chars(graph)
+
+
+def validate_election(jsonFileObj, sidecarJsonFileObj, fileFormat=None):
     """
     Checks that the JSON can be loaded and is under 2mb.
+    Pass the fileFormat if it is known, to skip detecting it.
     Raises:
     - BadJSONError: Summary JSON cannot be loaded
     - BadSidecarError: Sidecar JSON cannot be loaded
     - ValidationError: 2mb limit is reached
     - Anything else: unknown error
     Returns:
-    - Loaded graph
+    - The ValidatedElection
     """
     # Check filesize before opening a massive file
     if isinstance(jsonFileObj, UploadedFile):
@@ -42,18 +67,40 @@ def try_to_load_jsons(jsonFileObj, sidecarJsonFileObj):
         ensure_file_is_under_2_mb(sidecarJsonFileObj)
 
     # Try to make the graph
-    graph = make_graph_with_file(jsonFileObj, False)
+    jsonReader, jsonData = load_reader_with_file(jsonFileObj, fileFormat)
+    graph = make_graph_with_reader(jsonReader, jsonData, False)
 
-    # Sanity check that the entire pipeline works
-    # (If not, this could be the source of 500 errors)
-    viewUtils.get_data_for_graph(graph, config=viewUtils.DefaultConfig())
-
-    # Check title length
-    ensure_title_is_under_256_chars(graph)
+    _check_graph(graph)
 
     # check sidecar file:
+    sidecarData = None
     if sidecarJsonFileObj is not None:
         reader = SidecarReader(sidecarJsonFileObj)
         reader.assert_valid(graph)
+        sidecarData = reader.data
+
+    # Rewind, since the files may not have been written to storage yet
+    jsonFileObj.seek(0)
+    if sidecarJsonFileObj is not None:
+        sidecarJsonFileObj.seek(0)
+
+    return ValidatedElection(graph, compile_graph(graph, jsonData, sidecarData))
+
 
+def validate_election_data(jsonData):
+    """
+    Validates as validate_election does, but for data already in the universal tabulator
+    format (e.g. from the data entry table), without a file or sidecar.
+    Raises BadJSONError if it cannot be loaded. Returns the graph.
+    """
+    jsonReader = load_reader_with_data(jsonData)
+    graph = make_graph_with_reader(jsonReader, jsonData, False)
+    _check_graph(graph)
     return graph
+
+
+def try_to_load_jsons(jsonFileObj, sidecarJsonFileObj, fileFormat=None):
+    """
+    Validates as validate_election does, but returns just the graph
+    """
+    return validate_election(jsonFileObj, sidecarJsonFileObj, fileFormat).graph
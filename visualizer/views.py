@@ -1,44 +1,58 @@
 """ The django views file """
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import logging
-import tempfile
+import re
 import time
 import traceback
 import urllib.parse
 
 # Django helpers
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.cache import cache
-from django.http import JsonResponse, HttpResponse
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse, HttpResponse
 from django.shortcuts import render
 from django.templatetags.static import static
 from django.urls import resolve
 from django.urls import reverse
 from django.urls import Resolver404
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
 from django.views import View
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.decorators.vary import vary_on_headers
 from django.views.generic.base import TemplateView, RedirectView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView
-from rest_framework import permissions, viewsets
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework_tracking.mixins import LoggingMixin
 
 # rcvis helpers
 from accounts.permissions import IsOwnerOrReadOnly, HasAPIAccess
 from common import viewUtils
-from visualizer import validators
-from visualizer.common import make_complete_url, intify
+from common.cloudflare import CloudflareAPI
+from common.timing import COUNTERS, timed
+from visualizer import homepage, validators
+from visualizer.common import make_complete_url, intify, EMBED_VISTYPES
 from visualizer.forms import UploadForm, UploadByDataTableForm
 from visualizer.graph import readDataTablesResult
 from visualizer.graph.graphCreator import BadJSONError
 from visualizer.serializers import BaseVisualizationSerializer
 from visualizer.sidecar.reader import BadSidecarError
-from visualizer.models import JsonConfig, HomepageFeaturedElectionColumn
+from visualizer.models import JsonConfig
 from visualizer.serializers import JsonOnlySerializer, BallotpediaSerializer, UserSerializer
 from visualizer.wikipedia.wikipedia import WikipediaExport
 
@@ -53,25 +67,8 @@ class Index(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # most recent uploads
-        models = JsonConfig.get_all_public().order_by('-uploadedAt')[:10]
-        context['mostRecent'] = [{'slug': model.slug,
-                                  'title': model.title,
-                                  'numRounds': model.numRounds,
-                                  'numCandidates': model.numCandidates}
-                                 for model in models]
-
-        # featured elections
-        columns = HomepageFeaturedElectionColumn.objects.all()
-        featuredElections = []
-        for column in columns:
-            featuredElections.append({
-                'title': column.title,
-                'links': [{'slug': link.jsonConfig.slug,
-                           'title': link.title}
-                          for link in column.links_in_column.all()]
-            })
-        context['featuredElections'] = featuredElections
+        context['mostRecent'] = homepage.get_most_recent()
+        context['featuredElections'] = homepage.get_featured_elections()
 
         return context
 
@@ -97,13 +94,15 @@ class Upload(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         try:
-            graph = validators.try_to_load_jsons(
+            validatedElection = validators.validate_election(
                 form.cleaned_data['jsonFile'],
                 form.cleaned_data['candidateSidecarFile'])
 
             self.model = form.save(commit=False)
             self.model.owner = self.request.user
-            BaseVisualizationSerializer.populate_model_with_json_data(self.model, graph)
+            self.model.validatedElection = validatedElection
+            BaseVisualizationSerializer.populate_model_with_json_data(self.model,
+                                                                      validatedElection.graph)
             self._actions_before_save(form)
             self.model.save()
         except BadJSONError as exception:
@@ -148,8 +147,32 @@ class UploadByDataTable(Upload):
         self.model.jsonFile.save('datatablesfile.json', form.cleaned_data['jsonFile'])
 
 
+class ConditionalGetMixin:  # pylint: disable=too-few-public-methods
+    """
+    For DetailViews of a JsonConfig: answers If-None-Match and If-Modified-Since
+    with 304 Not Modified before the election is loaded, so revalidating costs
+    one database lookup, which doesn't read the compiled election: that's only read
+    when the page is rendered. See viewUtils.get_page_etag.
+    """
+    queryset = JsonConfig.objects.select_related('owner__userprofile')
+
+    def get(self, request, *args, **kwargs):
+        """ Returns 304 if the client's copy is current, or else renders the page """
+        self.object = self.get_object()  # pylint: disable=attribute-defined-outside-init
+        etag = viewUtils.get_page_etag(request, self.object)
+        lastModified = int(self.object.updatedAt.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=lastModified)
+        if response is None:
+            context = self.get_context_data(object=self.object)
+            response = self.render_to_response(context)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(lastModified)
+        return response
+
+
 @method_decorator(vary_on_headers('increment',), name='get')
-class Visualize(DetailView):
+class Visualize(ConditionalGetMixin, DetailView):
     """ Visualizing a single JsonConfig """
     model = JsonConfig
     template_name = 'visualizer/visualize.html'
@@ -179,7 +202,8 @@ class Visualize(DetailView):
         # wikipedia embedding
         referenceUrl = make_complete_url(self.request, reverse("visualize", args=(slug,)))
         referenceUrl += "#tabular-candidate-by-round"
-        data['wikicodeExport'] = WikipediaExport(data['graph'], referenceUrl).create_wikicode()
+        data.set_lazy('wikicodeExport', timed(
+            'wikipedia', lambda: WikipediaExport(data['graph'], referenceUrl).create_wikicode()))
 
         # iframe height
         data['iframeHeight'] = viewUtils.default_iframe_height(config['jsonconfig'].numCandidates)
@@ -189,7 +213,7 @@ class Visualize(DetailView):
 
 @method_decorator(vary_on_headers('increment',), name='get')
 @method_decorator(xframe_options_exempt, name='dispatch')
-class VisualizeEmbedded(DetailView):
+class VisualizeEmbedded(ConditionalGetMixin, DetailView):
     """
     The embedded visualization, to be used in an iframe.
     """
@@ -213,13 +237,7 @@ class VisualizeEmbedly(RedirectView):
     Since embedly doesn't allow custom arguments, we cannot use ?vistype in oembed.
     We have replaced this with /vo/slug/vistype instead,
 
-    Further, we simplify vistype so it reads more easily. The changed vistypes are:
-    barchart-interactive         --> bar
-    barchart-fixed               --> bar-static
-    tabular-candidate-by-round   --> table
-    tabular-by-round-interactive --> table-by-round
-    tabular-by-round             --> table-by-round-static
-    tabular-by-candidate         --> table-by-candidate
+    Further, we simplify vistype so it reads more easily: see EMBED_VISTYPES.
     """
     permanent = True
     pattern_name = 'visualizeEmbedded'
@@ -231,25 +249,45 @@ class VisualizeEmbedly(RedirectView):
         # Simplifying translations:
         if not vistype:
             vistype = 'barchart-interactive'
-        elif vistype == 'bar':
-            vistype = 'barchart-interactive'
-        elif vistype == 'bar-static':
-            vistype = 'barchart-fixed'
-        elif vistype == 'table':
-            vistype = 'tabular-candidate-by-round'
-        elif vistype == 'table-by-round':
-            vistype = 'tabular-by-round-interactive'
-        elif vistype == 'table-by-round-static':
-            vistype = 'tabular-by-round'
-        elif vistype == 'table-by-candidate':
-            vistype = 'tabular-by-candidate'
+        else:
+            vistype = EMBED_VISTYPES.get(vistype, vistype)
 
         return super().get_redirect_url(slug) + "?vistype=" + vistype
 
 
 @method_decorator(vary_on_headers('increment',), name='get')
 @method_decorator(xframe_options_exempt, name='dispatch')
-class VisualizeBallotpedia(DetailView):
+class VisualizeEmbeddedVistype(VisualizeEmbedded):
+    """
+    The embedded visualization of a single vistype, given in the URL: /ve/slug/bar.
+    The vistype is either a short vistype (see EMBED_VISTYPES) or the vistype it stands for.
+    Unlike VisualizeEmbedded, the page does not include the data shared between
+    visualizations (descriptions, candidate info) unless this vistype uses it.
+    """
+
+    # The shared data, and the vistypes which use it. Other vistypes get null.
+    sharedData = {
+        'humanFriendlyEventsPerRound': ('barchart-interactive', 'tabular-by-round-interactive'),
+        'humanFriendlySummary': ('barchart-interactive',),
+        'candidateSidecarData': ('barchart-interactive', 'barchart-fixed'),
+    }
+
+    def get_context_data(self, **kwargs):
+        vistype = EMBED_VISTYPES.get(self.kwargs['vistype'], self.kwargs['vistype'])
+        if vistype not in EMBED_VISTYPES.values():
+            raise Http404(f"No such vistype: {self.kwargs['vistype']}")
+
+        data = super().get_context_data(**kwargs)
+        data['vistype'] = vistype
+        for key, vistypesUsingData in self.sharedData.items():
+            if vistype not in vistypesUsingData:
+                data[key] = 'null'
+        return data
+
+
+@method_decorator(vary_on_headers('increment',), name='get')
+@method_decorator(xframe_options_exempt, name='dispatch')
+class VisualizeBallotpedia(ConditionalGetMixin, DetailView):
     """ The embedded ballotpedia visualization """
     model = JsonConfig
     template_name = 'visualizer/visualize-ballotpedia.html'
@@ -267,6 +305,46 @@ class VisualizeBallotpedia(DetailView):
         return data
 
 
+class VisualizationData(View):
+    """
+    The data for every visualization of an election, as JSON: /api/v1/data/slug.
+    Responses have a strong ETag and a Last-Modified date, so clients and the CDN can
+    revalidate cheaply. Requests with ?v=<the current version> may be cached forever,
+    since that URL changes whenever the data does. Other requests are cached by the CDN
+    until the election is updated and its cache purged.
+    """
+    # Cache-Control for ?v=<current version>, and for every other request
+    immutableCacheControl = {'public': True, 'max_age': 60 * 60 * 24 * 365, 'immutable': True}
+    sharedCacheControl = {'public': True, 'max_age': 0, 's_maxage': 60 * 60 * 24 * 365}
+
+    def get(self, request, slug):
+        """
+        Returns the data, or 304 Not Modified if the client's copy is current:
+        the compiled election is only read to build the data
+        """
+        config = JsonConfig.objects.filter(slug=slug).first()
+        if config is None:
+            raise Http404(f"No election with slug {slug}")
+
+        version = viewUtils.get_data_version(config)
+        etag = quote_etag(version)
+        lastModified = int(config.updatedAt.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=lastModified)
+        if response is None:
+            # The data is already serialized, so don't use a JsonResponse
+            # pylint: disable=http-response-with-content-type-json
+            response = HttpResponse(viewUtils.get_json_data_for_view(config),
+                                    content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(lastModified)
+        if request.GET.get('v') == version:
+            patch_cache_control(response, **self.immutableCacheControl)
+        else:
+            patch_cache_control(response, **self.sharedCacheControl)
+        return response
+
+
 class DownloadRawData(LoginRequiredMixin, DetailView):
     """
     Download raw data - don't just share the presigned AWS URL, we want a fresh URL
@@ -317,6 +395,14 @@ class Oembed(View):
         maxheight = int(requestData.get('maxheight', 1080))
         returnType = str(requestData.get('type', 'json'))
 
+        # The response depends only on the request, so revalidating needs no work at all
+        etag = viewUtils.make_etag(settings.RELEASE_VERSION,
+                                   make_complete_url(request, request.get_full_path()))
+        notModifiedResponse = get_conditional_response(request, etag=etag)
+        if notModifiedResponse is not None:
+            notModifiedResponse['ETag'] = etag
+            return notModifiedResponse
+
         if returnType == 'xml':
             # not implemented
             return HttpResponse(status=501)
@@ -347,79 +433,332 @@ class Oembed(View):
         jsonData['url'] = url
         jsonData['html'] = html
 
-        return JsonResponse(jsonData)
+        response = JsonResponse(jsonData)
+        response['ETag'] = etag
+        return response
 
 
 class ValidateDataEntry(LoginRequiredMixin, View):
-    """ Validation AJAX view: would the current input succeed in creating a graph? """
+    """
+    Validation AJAX view: would the current input succeed in creating a graph?
+
+    Each result is cached by a hash of the submitted table, so re-validating an unchanged
+    table is free. Otherwise, validating costs the user the seconds it took, from a budget
+    of DATA_ENTRY_VALIDATION_BUDGET seconds which refills over
+    DATA_ENTRY_VALIDATION_BUDGET_WINDOW seconds: a small table can be validated often,
+    while a huge one can't tie up the server.
+    """
+
+    # The fields of the data entry form which are validated
+    fieldsToValidate = ('dataEntry', 'configElectionTitle', 'configElectionDate',
+                        'configThreshold')
+
+    # How long to remember each result, in seconds
+    resultTimeout = 60 * 60
 
     @classmethod
     def _make_failure(cls, errNum, message):
-        return JsonResponse({  # lgtm [py/stack-trace-exposure]
+        return {  # lgtm [py/stack-trace-exposure]
             'message': f'Error #{errNum}: {message}',
             'success': False
-        })
+        }
+
+    @classmethod
+    def _get_result_cache_key(cls, jsonData):
+        """ The cache key of the result of validating this table with this release """
+        table = {field: jsonData.get(field) for field in cls.fieldsToValidate}
+        table['releaseVersion'] = settings.RELEASE_VERSION
+        tableHash = hashlib.sha256(json.dumps(table, sort_keys=True).encode('utf-8'))
+        return 'validate_data_entry.' + tableHash.hexdigest()
+
+    def _get_budget_cache_key(self):
+        return 'validate_data_entry_budget.' + str(self.request.user.id)
+
+    def _get_budget(self, now):
+        """ The seconds of validation the user has left, which is negative if overspent """
+        budget = settings.DATA_ENTRY_VALIDATION_BUDGET
+        remaining, lastUpdated = cache.get(self._get_budget_cache_key(), (budget, now))
+        refillPerSecond = budget / settings.DATA_ENTRY_VALIDATION_BUDGET_WINDOW
+        return min(budget, remaining + (now - lastUpdated) * refillPerSecond)
 
     def _check_rate_limit(self):
         """
-        Returns the number of ms the user must wait before trying again.
+        Returns the number of seconds the user must wait before trying again.
         If 0 is returned, the user is not rate limited.
         """
         if not settings.RATE_LIMIT_AJAX:
             # Rate limiting disabled - should only happen in tests
             return 0
 
-        user = self.request.user
-        cacheKey = 'last_req_' + str(user.id)
-        lastRequest = cache.get(cacheKey, 0)
-        now = time.time()
-        secsSinceLastReq = now - lastRequest
-        secsToWaitBeforeRateLimit = 5
-        if secsSinceLastReq > secsToWaitBeforeRateLimit:
-            cache.set(cacheKey, now)
+        remaining = self._get_budget(time.time())
+        if remaining > 0:
             return 0
 
         # lgtm [py/clear-text-logging-sensitive-data]
         logger.warning("User %s has been rate limited", self.request.user.username)
-        return secsToWaitBeforeRateLimit - secsSinceLastReq
+        refillPerSecond = settings.DATA_ENTRY_VALIDATION_BUDGET / \
+            settings.DATA_ENTRY_VALIDATION_BUDGET_WINDOW
+        return -remaining / refillPerSecond
+
+    def _spend_budget(self, seconds):
+        """ Takes the seconds spent validating from the user's budget """
+        if not settings.RATE_LIMIT_AJAX:
+            return
+
+        now = time.time()
+        remaining = self._get_budget(now) - seconds
+        cache.set(self._get_budget_cache_key(), (remaining, now),
+                  settings.DATA_ENTRY_VALIDATION_BUDGET_WINDOW)
+
+    @classmethod
+    def _validate(cls, jsonData):
+        """ Returns the result (a dict with the message and success) of validating the table """
+        try:
+            reader = readDataTablesResult.ReadDataTableJSON(jsonData)
+            urcvtData = reader.convert_to_urcvt()
+        except readDataTablesResult.InvalidDataTableInput as exc:
+            return cls._make_failure(10, 'Data is not valid: ' + str(exc))
+        except BaseException as exc:  # pylint: disable=broad-except
+            logger.warning(exc)
+            return cls._make_failure(20, 'Unknown error')
+
+        try:
+            validators.validate_election_data(urcvtData)
+        except BadJSONError as exc:
+            logger.warning(exc)
+            return cls._make_failure(30, 'Could not generate a visualization: ' + str(exc))
+        except BaseException as exc:  # pylint: disable=broad-except
+            logger.warning(exc)
+            return cls._make_failure(40, 'Unknown error')
+        return {'message': "Data is valid!", 'success': True}
 
     def post(self, request):
         """ Doesn't render a webpage - just text """
+        cacheKey = self._get_result_cache_key(request.POST)
+        result = cache.get(cacheKey)
+        if result is not None:
+            return JsonResponse(result)
+
         secsToWait = self._check_rate_limit()
         if secsToWait > 0:
             secsToWait = int(secsToWait) + 1
             message = f"Please wait {secsToWait} seconds before trying again"
             return JsonResponse({'message': message, 'success': False})
 
-        jsonData = request.POST
-        try:
-            reader = readDataTablesResult.ReadDataTableJSON(jsonData)
-            urcvtData = reader.convert_to_urcvt()
-        except readDataTablesResult.InvalidDataTableInput as exc:
-            return self._make_failure(10, 'Data is not valid: ' + str(exc))
-        except BaseException as exc:  # pylint: disable=broad-except
-            logger.warning(exc)
-            return self._make_failure(20, 'Unknown error')
+        startTime = time.perf_counter()
+        result = self._validate(request.POST)
+        self._spend_budget(time.perf_counter() - startTime)
+
+        cache.set(cacheKey, result, self.resultTimeout)
+        return JsonResponse(result)
 
-        with tempfile.TemporaryFile(mode='w+') as tf:
-            json.dump(urcvtData, tf)
-            try:
-                validators.try_to_load_jsons(tf, None)
-            except BadJSONError as exc:
-                logger.warning(exc)
-                return self._make_failure(30, 'Could not generate a visualization: ' + str(exc))
-            except BaseException as exc:  # pylint: disable=broad-except
-                logger.warning(exc)
-                return self._make_failure(40, 'Unknown error')
-            return JsonResponse({'message': "Data is valid!", 'success': True})
+
+@method_decorator(staff_member_required, name='dispatch')
+class TimingMetrics(View):
+    """ The timing counters of each stage of page generation, and the cache's counters,
+        for this process """
+
+    def get(self, request):  # pylint: disable=unused-argument
+        """ Returns the counters as JSON. See common.timing and common.tieredCache. """
+        cacheStats = cache.get_stats() if hasattr(cache, 'get_stats') else None
+        return JsonResponse({'stages': COUNTERS.snapshot(), 'cache': cacheStats})
 
 
 # For django REST
 
 
-class JsonOnlyViewSet(LoggingMixin, viewsets.ModelViewSet):
+class BatchMixin:  # pylint: disable=too-few-public-methods
+    """
+    Adds a batch endpoint to a visualization ViewSet: POST to <endpoint>/batch/ to create or
+    update many visualizations in one request. Each field of the nth item is named
+    items-<n>-<field>, e.g. items-0-resultsSummaryFile, with items-<n>-id to update
+    that visualization rather than create one.
+
+    The files are validated concurrently, slugs are allocated with one query, and every
+    valid item is saved in one transaction. Invalid items are not saved, but don't stop the
+    rest: the response has the status and data (or errors) of each item, in order.
+    """
+
+    # The most items in one request
+    maxBatchSize = 100
+
+    # How many items to validate at once
+    numValidationWorkers = 4
+
+    itemFieldRegex = re.compile(r'^items-([0-9]+)-(.+)$')
+
+    @classmethod
+    def _get_batch_items(cls, data):
+        """ Groups the request's fields into a list of dicts of each item's fields """
+        itemsByIndex = {}
+        for key in data:
+            match = cls.itemFieldRegex.match(key)
+            if match is None:
+                raise ValidationError({key: ["Each field must be named items-<n>-<field>"]})
+            itemsByIndex.setdefault(int(match.group(1)), {})[match.group(2)] = data[key]
+        return [itemsByIndex[index] for index in sorted(itemsByIndex)]
+
+    def _get_instances(self, items):
+        """ The visualizations being updated, by id, with one query """
+        ids = [item['id'] for item in items if 'id' in item]
+        return {str(instance.id): instance for instance in
+                self.get_queryset().filter(id__in=[i for i in ids if str(i).isdigit()])}
+
+    def _make_serializer(self, item, instances):
+        """
+        Returns the serializer for one item, or raises the ValidationError, NotFound or
+        PermissionDenied which fails it
+        """
+        if 'id' not in item:
+            return self.get_serializer(data=item)
+
+        itemId = str(item.pop('id'))
+        if itemId not in instances:
+            raise NotFound(f"No visualization with id {itemId}")
+        instance = instances[itemId]
+        if instance.owner != self.request.user:
+            raise PermissionDenied(IsOwnerOrReadOnly.message)
+        return self.get_serializer(instance, data=item, partial=True)
+
+    @classmethod
+    def _validate_files(cls, serializer, item):
+        """ Validates the files the item would save, returning the ValidatedElection """
+        renamedItem = serializer.rename_fields(dict(item))
+        return serializer.validate_election_or_errors(
+            *serializer.get_files_to_validate(renamedItem))
+
+    @classmethod
+    def _make_failure(cls, exc):
+        return {'status': exc.status_code, 'errors': exc.detail}
+
+    def _validate_items(self, items, results):
+        """
+        Returns the serializer of each valid item, by index. Records the failure of each
+        invalid item in results.
+        """
+        serializersByIndex = {}
+        instances = self._get_instances(items)
+        for index, item in enumerate(items):
+            try:
+                serializersByIndex[index] = self._make_serializer(item, instances)
+            except APIException as exc:
+                results[index] = self._make_failure(exc)
+
+        # Validating the files is the slow part, so do it concurrently
+        with ThreadPoolExecutor(max_workers=self.numValidationWorkers) as executor:
+            futures = {index: executor.submit(self._validate_files, serializer, items[index])
+                       for index, serializer in serializersByIndex.items()}
+        for index, future in futures.items():
+            try:
+                serializersByIndex[index].context['validatedElection'] = future.result()
+                serializersByIndex[index].is_valid(raise_exception=True)
+            except ValidationError as exc:
+                results[index] = self._make_failure(exc)
+                del serializersByIndex[index]
+        return serializersByIndex
+
+    def _save_items(self, serializersByIndex, results):
+        """ Saves every valid item in one transaction, recording each in results """
+        newIndices = [index for index, serializer in serializersByIndex.items()
+                      if serializer.instance is None]
+        slugs = JsonConfig.get_unique_slugs(
+            [serializersByIndex[index].validated_data['title'] for index in newIndices])
+        slugsByIndex = dict(zip(newIndices, slugs))
+
+        with transaction.atomic(), CloudflareAPI.coalesce_purges():
+            for index, serializer in serializersByIndex.items():
+                if index in slugsByIndex:
+                    serializer.save(owner=self.request.user, slug=slugsByIndex[index])
+                    results[index] = {'status': status.HTTP_201_CREATED}
+                else:
+                    serializer.save()
+                    results[index] = {'status': status.HTTP_200_OK}
+                results[index]['data'] = serializer.data
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """ Creates or updates each item, returning the result of each. See BatchMixin. """
+        items = self._get_batch_items(request.data)
+        if not items:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: ["No items were given"]})
+        if len(items) > self.maxBatchSize:
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                f"At most {self.maxBatchSize} items may be sent at once"]})
+
+        results = [None] * len(items)
+        serializersByIndex = self._validate_items(items, results)
+        self._save_items(serializersByIndex, results)
+        return Response({'results': results}, status=status.HTTP_207_MULTI_STATUS)
+
+
+class CursorPaginationWithPageNumbers(CursorPagination):
+    """
+    Pages with cursors: follow the next and previous links. Still answers ?page=<n>
+    as PageNumberPagination did, with the count, for clients written before the lists used
+    cursors: that's deprecated, as it counts every row and deep pages are slow.
+    """
+    page_size_query_param = 'pageSize'
+    max_page_size = 100
+
+    # Set if the request asked for a page number
+    pageNumberPagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if PageNumberPagination.page_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.pageNumberPagination = PageNumberPagination()
+        ordering = self.get_ordering(request, queryset, view)
+        return self.pageNumberPagination.paginate_queryset(
+            queryset.order_by(*ordering), request, view)
+
+    def get_paginated_response(self, data):
+        if self.pageNumberPagination is not None:
+            return self.pageNumberPagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class NewestFirstPagination(CursorPaginationWithPageNumbers):
+    """
+    Pages through visualizations, newest first. Each page is one range query on an index
+    (see JsonConfig.Meta), however deep, and nothing counts every row.
+    """
+    ordering = ('-uploadedAt', '-id')
+
+
+class UserPagination(CursorPaginationWithPageNumbers):
+    """ Pages through users, newest first """
+    ordering = '-id'
+
+
+class VisualizationListMixin:  # pylint: disable=too-few-public-methods
+    """
+    Lists visualizations a page at a time. Only admins may list everyone's:
+    others list their own. Filter by owner with ?owner=<user id>.
+    """
+    queryset = JsonConfig.objects.all()
+    pagination_class = NewestFirstPagination
+
+    def get_queryset(self):
+        """ Filters the list: other actions get each visualization with its owner """
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            # With the owner, to check their permission
+            return queryset.select_related('owner')
+
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(owner=self.request.user)
+
+        ownerId = self.request.query_params.get('owner')
+        if ownerId is not None:
+            if not ownerId.isdigit():
+                raise ValidationError({'owner': ["Must be the id of a user"]})
+            queryset = queryset.filter(owner_id=int(ownerId))
+        return queryset
+
+
+class JsonOnlyViewSet(LoggingMixin, VisualizationListMixin, BatchMixin, viewsets.ModelViewSet):
     """ API endpoint that allows tabulated JSONs to be viewed or edited. """
-    queryset = JsonConfig.objects.all().order_by('-uploadedAt')
     serializer_class = JsonOnlySerializer
     permission_classes = [HasAPIAccess, IsOwnerOrReadOnly]
 
@@ -427,9 +766,9 @@ class JsonOnlyViewSet(LoggingMixin, viewsets.ModelViewSet):
         serializer.save(owner=self.request.user)
 
 
-class BallotpediaViewSet(LoggingMixin, viewsets.ModelViewSet):
+class BallotpediaViewSet(LoggingMixin, VisualizationListMixin, BatchMixin,
+                         viewsets.ModelViewSet):
     """ API endpoint with all ballotpedia fields """
-    queryset = JsonConfig.objects.all().order_by('-uploadedAt')
     serializer_class = BallotpediaSerializer
     permission_classes = [HasAPIAccess, IsOwnerOrReadOnly]
 
@@ -439,6 +778,8 @@ class BallotpediaViewSet(LoggingMixin, viewsets.ModelViewSet):
 
 class UserViewSet(LoggingMixin, viewsets.ReadOnlyModelViewSet):
     """ API endpoint that allows you to view but not edit Users. """
-    queryset = get_user_model().objects.all().order_by('-id')
+    queryset = get_user_model().objects.prefetch_related(
+        Prefetch('this_users_jsons', queryset=JsonConfig.objects.only('id', 'owner')))
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = UserPagination